@@ -0,0 +1,110 @@
+import os
+import time
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from candle_store import CandleStore, OHLCV_COLUMNS
+from pattern_detector import PatternDetector
+from preprocessing import load_atr, update_atr
+from reporting import REPORT_COLUMNS, report_entry
+
+# start/end may be None for an open-ended range
+ScanJob = namedtuple('ScanJob', ['symbol', 'interval', 'start', 'end'])
+
+JOB_STATS_COLUMNS = ['symbol', 'interval', 'start', 'end', 'bars', 'patterns', 'seconds', 'bars_per_sec']
+
+
+def _run_job(store_root, job, detector_kwargs):
+    """
+    Loads one dataset with its range of the full-series ATR, scans it and
+    returns (report rows, job stats); runs in a worker and only reads the
+    store (see preprocessing.load_atr).
+    """
+    t0 = time.perf_counter()
+    store = CandleStore(store_root)
+    df = store.load(job.symbol, job.interval, job.start, job.end, columns=OHLCV_COLUMNS)
+    patterns = []
+    if len(df):
+        _, atr = load_atr(store, job.symbol, job.interval, job.start, job.end)
+        patterns = PatternDetector(df, atr=atr, **detector_kwargs).detect_patterns()
+    rows = []
+    for n, pattern in enumerate(patterns, start=1):
+        pattern['pattern_id'] = f"{n:02d}"
+        rows.append(dict(symbol=job.symbol, interval=job.interval, **report_entry(pattern)))
+    seconds = time.perf_counter() - t0
+    stats = dict(job._asdict(), bars=len(df), patterns=len(patterns), seconds=seconds,
+                 bars_per_sec=len(df) / seconds if seconds > 0 else 0.0)
+    return rows, stats
+
+
+def run_batch(jobs, store, report_file=None, n_workers=None, pattern_db=None, **detector_kwargs):
+    """
+    Scans every (symbol, interval, start, end) job from the candle store.
+
+    Jobs run in a process pool sized to the machine; each worker loads only its
+    own dataset when the job starts, so at most n_workers datasets are in memory
+    at once and only report rows travel back. Returns (report, job_stats)
+    DataFrames, writes the consolidated report when report_file is given and
+    adds the patterns to the pattern_store database at pattern_db.
+    """
+    jobs = [ScanJob(*job) for job in jobs]
+    # ATR comes from each whole stored series, as in main.py; brought up to date here so workers only read it
+    for symbol, interval in dict.fromkeys((job.symbol, job.interval) for job in jobs):
+        update_atr(store, symbol, interval)
+    n_workers = min(n_workers or os.cpu_count() or 1, max(1, len(jobs)))
+    rows = []
+    stats = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(_run_job, store.root, job, detector_kwargs) for job in jobs]
+        for future in futures:
+            job_rows, job_stats = future.result()
+            rows.extend(job_rows)
+            stats.append(job_stats)
+            print(f"{job_stats['symbol']} {job_stats['interval']}: {job_stats['patterns']} patterns in "
+                  f"{job_stats['bars']} bars, {job_stats['seconds']:.2f}s ({job_stats['bars_per_sec']:.0f} bars/s)")
+    elapsed = time.perf_counter() - t0
+
+    report_df = pd.DataFrame(rows, columns=['symbol', 'interval'] + REPORT_COLUMNS)
+    stats_df = pd.DataFrame(stats, columns=JOB_STATS_COLUMNS)
+    total_bars = stats_df['bars'].sum()
+    print(f"Scanned {len(jobs)} jobs, {total_bars} bars in {elapsed:.2f}s "
+          f"({total_bars / elapsed if elapsed > 0 else 0:.0f} bars/s) with {n_workers} workers")
+    if report_file is not None:
+        report_df.to_csv(report_file, index=False)
+        print(f"Consolidated report saved to {report_file}")
+    if pattern_db is not None:
+        from pattern_store import PatternStore
+        with PatternStore(pattern_db) as db:
+            db.upsert(report_df)
+            print(f"{len(report_df)} patterns stored in {pattern_db} ({len(db)} in total)")
+    return report_df, stats_df
+
+
+def _parse_job(text):
+    """Parses SYMBOL,INTERVAL[,START[,END]], e.g. BTCUSDT,1m,2024-01-01,2024-02-01."""
+    parts = text.split(',', 3)
+    if len(parts) < 2:
+        raise argparse.ArgumentTypeError(f"Expected SYMBOL,INTERVAL[,START[,END]], got {text!r}")
+    symbol, interval = parts[0], parts[1]
+    start = parts[2] or None if len(parts) > 2 else None
+    end = parts[3] or None if len(parts) > 3 else None
+    return ScanJob(symbol, interval, start, end)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan many symbols/intervals from the candle store.")
+    parser.add_argument('jobs', nargs='+', type=_parse_job, help="SYMBOL,INTERVAL[,START[,END]]")
+    parser.add_argument('--store', default=os.path.join('data', 'store'))
+    parser.add_argument('--report', default='batch_report.csv')
+    parser.add_argument('--jobs-report', default=None, help="Optional CSV of per-job timings")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--pattern-db', default=os.path.join('data', 'patterns.db'),
+                        help="SQLite database accumulating the patterns of every run")
+    parser.add_argument('--no-pattern-db', action='store_true')
+    args = parser.parse_args()
+    _, job_stats = run_batch(args.jobs, CandleStore(args.store), args.report, args.workers,
+                             None if args.no_pattern_db else args.pattern_db)
+    if args.jobs_report:
+        job_stats.to_csv(args.jobs_report, index=False)
@@ -0,0 +1,59 @@
+"""
+Memory benchmark of the chunked scan: peak traced allocations (NumPy
+arrays included) and wall time of chunked_scan.scan_store against loading
+the whole history and scanning it with PatternDetector, as main.py does,
+for growing history lengths. The chunked peak should stay flat.
+
+Run from the repository root:
+    python benchmarks/bench_chunked_scan.py
+    python benchmarks/bench_chunked_scan.py --bars 250000 1000000 4000000 --block-size 50000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from candle_store import CandleStore, OHLCV_COLUMNS
+from chunked_scan import scan_store
+from pattern_detector import PatternDetector
+from synthetic_data import generate_ohlcv
+
+
+def measure(fn):
+    """(result, peak traced MB, seconds) of fn(); timed in a separate untraced run, as tracing slows Python code."""
+    t0 = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - t0
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 2 ** 20, seconds
+
+
+def main(bar_counts=(250000, 1000000, 2000000), block_size=100_000):
+    print(f"{'bars':>9} {'whole MB':>9} {'whole s':>8} {'chunked MB':>11} {'chunked s':>10} {'patterns':>9}")
+    for bars in bar_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CandleStore(tmp)
+            df, _ = generate_ohlcv(bars, seed=0)
+            df.index.name = 'open_time'
+            store.append('BTCUSDT', '1m', df)
+            del df
+            whole, whole_mb, whole_s = measure(lambda: PatternDetector(
+                store.load('BTCUSDT', '1m', columns=OHLCV_COLUMNS), use_jit=True).detect_records())
+            chunked, chunked_mb, chunked_s = measure(lambda: sum(
+                1 for _ in scan_store(store, 'BTCUSDT', '1m', block_size=block_size)))
+            assert chunked == len(whole), (chunked, len(whole))
+            print(f"{bars:>9} {whole_mb:>9.1f} {whole_s:>8.2f} {chunked_mb:>11.1f} {chunked_s:>10.2f} {chunked:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bars', type=int, nargs='+', default=[250000, 1000000, 2000000])
+    parser.add_argument('--block-size', type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.bars, args.block_size)
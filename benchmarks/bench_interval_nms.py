@@ -0,0 +1,47 @@
+"""
+Benchmark of interval non-maximum suppression: time per candidate of
+interval_nms.suppress_overlaps on disjoint intervals (all kept, the worst
+case for the kept set) at growing candidate counts. With O(log m) work per
+candidate the time per candidate should stay nearly flat.
+
+Run from the repository root:
+    python benchmarks/bench_interval_nms.py
+    python benchmarks/bench_interval_nms.py --candidates 1000 100000 1000000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from interval_nms import suppress_overlaps
+
+
+def seconds_per_candidate(m, repeat=3):
+    """Best time per candidate of repeat suppressions of m disjoint intervals."""
+    starts = np.arange(m) * 10
+    scores = np.random.default_rng(m).random(m)
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        suppress_overlaps(starts, starts + 5, scores)
+        best = min(best, time.perf_counter() - t0)
+    return best / m
+
+
+def main(candidate_counts=(1_000, 10_000, 100_000)):
+    seconds_per_candidate(candidate_counts[0])  # Warm up
+    base = None
+    print(f"{'candidates':>10} {'us/candidate':>13} {'ratio':>6}")
+    for m in candidate_counts:
+        per = seconds_per_candidate(m)
+        base = base or per
+        print(f"{m:>10} {per * 1e6:>13.2f} {per / base:>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candidates', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    main(args.candidates)
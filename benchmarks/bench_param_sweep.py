@@ -0,0 +1,50 @@
+"""
+Benchmark of the parameter sweep: wall time of a 100-point grid against a
+single configuration spanning the same bounds. Grid points only slice the
+shared cup/handle grid (see param_sweep.ParameterSweep), so the 100-point
+sweep should cost a few times the single one, not 100 times.
+
+Run from the repository root:
+    python benchmarks/bench_param_sweep.py
+    python benchmarks/bench_param_sweep.py --bars 20000 --repeat 5
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from param_sweep import ParameterSweep, expand_grid
+from synthetic_data import generate_ohlcv
+
+GRID = {'min_cup_duration': [20, 30, 40, 50, 60], 'max_cup_duration': [60, 80],
+        'max_handle_duration': [10, 20], 'min_r2': [0.6, 0.7, 0.8, 0.9, 0.95]}
+WIDEST = [dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.6)]
+
+
+def seconds(df, configs, repeat):
+    """Best wall time of repeat sweeps of configs over df."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ParameterSweep(df, configs).run()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(bars=10_000, repeat=3):
+    df, _ = generate_ohlcv(bars, seed=0)
+    grid = expand_grid(GRID)
+    one = seconds(df, WIDEST, repeat)
+    many = seconds(df, grid, repeat)
+    print(f"Sweep over {bars} bars")
+    print(f"  1 configuration:   {one:8.3f} s")
+    print(f"  {len(grid)} configurations: {many:8.3f} s ({many / one:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bars', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args.bars, args.repeat)
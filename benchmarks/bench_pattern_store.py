@@ -0,0 +1,84 @@
+"""
+Benchmark of the pattern database: bulk upsert of millions of generated
+patterns over several symbols and intervals, an idempotent re-upsert of a
+slice, and typical range queries such as "valid patterns on BTCUSDT 1m in
+March with R² > 0.9" (best of --repeat).
+
+Run from the repository root:
+    python benchmarks/bench_pattern_store.py
+    python benchmarks/bench_pattern_store.py --rows 5000000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pattern_store import PatternStore
+from reporting import REPORT_COLUMNS
+
+SERIES = [(symbol, interval) for symbol in ('BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'BNBUSDT')
+          for interval in ('1m', '5m')]
+
+
+def make_report(n, seed):
+    """n patterns with cup starts spread over 2020-2024."""
+    rng = np.random.default_rng(seed)
+    starts = pd.Timestamp('2020-01-01') + pd.to_timedelta(np.sort(rng.choice(5 * 525600, n, replace=False)), unit='min')
+    durations = rng.integers(30, 300, n)
+    ends = starts + pd.to_timedelta(durations + 10, unit='min')
+    return pd.DataFrame({
+        'pattern_id': '', 'start_time': starts, 'end_time': ends,
+        'cup_depth': rng.uniform(10, 500, n), 'cup_duration': durations,
+        'handle_depth': rng.uniform(1, 50, n), 'handle_duration': rng.integers(5, 50, n),
+        'r_squared_cup': rng.uniform(0.85, 1.0, n), 'breakout_candle_timestamp': ends,
+        'status': np.where(rng.random(n) < 0.9, 'Valid', 'Invalid'), 'reason': '',
+    }, columns=REPORT_COLUMNS)
+
+
+def best_of(repeat, fn):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(rows=2000000, repeat=5):
+    with tempfile.TemporaryDirectory() as tmp, PatternStore(os.path.join(tmp, 'patterns.db')) as db:
+        per_series = rows // len(SERIES)
+        t0 = time.perf_counter()
+        reports = []
+        for n, (symbol, interval) in enumerate(SERIES):
+            reports.append(make_report(per_series, n))
+            db.upsert(reports[-1], symbol, interval)
+        elapsed = time.perf_counter() - t0
+        print(f"Upserted {len(db)} patterns in {elapsed:.1f}s ({len(db) / elapsed:.0f} rows/s)")
+
+        t0 = time.perf_counter()
+        db.upsert(reports[0].iloc[:100000], *SERIES[0])
+        print(f"Re-upserted 100000 existing patterns in {time.perf_counter() - t0:.2f}s; {len(db)} rows")
+
+        queries = {
+            'BTCUSDT 1m, March 2023, Valid, R² >= 0.9':
+                dict(symbol='BTCUSDT', interval='1m', start='2023-03-01', end='2023-04-01', status='Valid', min_r2=0.9),
+            'ETHUSDT 5m, breakouts on 2022-06-01':
+                dict(symbol='ETHUSDT', interval='5m', breakout_start='2022-06-01', breakout_end='2022-06-02'),
+            'BTCUSDT 1m, whole 2021':
+                dict(symbol='BTCUSDT', interval='1m', start='2021-01-01', end='2022-01-01'),
+        }
+        for name, query in queries.items():
+            seconds, result = best_of(repeat, lambda: db.query(**query))
+            print(f"  {name}: {len(result)} rows in {seconds * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,73 @@
+"""
+Microbenchmark: handle high/low and breakout lookups via DataFrame slicing
+(the old inner-loop path) versus the precomputed sparse tables.
+
+Run from the repository root: python benchmarks/bench_range_query.py
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from range_query import SparseTable
+
+def make_data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 42000 + np.cumsum(rng.normal(0, 10, n))
+    spread = rng.uniform(1, 20, n)
+    return pd.DataFrame({
+        'high': close + spread,
+        'low': close - spread,
+        'close': close,
+        'ATR': np.full(n, 15.0),
+    }, index=pd.date_range('2024-01-01', periods=n, freq='1min'))
+
+def slicing_path(data, queries):
+    out = 0.0
+    for i, k in queries:
+        handle_segment = data.iloc[i:k+1]
+        handle_high = handle_segment['high'].max()
+        handle_low = handle_segment['low'].min()
+        breakout_segment = data.iloc[k+1:k+11]
+        cond = breakout_segment['close'] > handle_high + 1.5 * breakout_segment['ATR']
+        out += handle_high - handle_low + cond.any()
+    return out
+
+def sparse_table_path(high_max, low_min, breakout_max, queries):
+    out = 0.0
+    for i, k in queries:
+        handle_high = high_max.query(i, k)
+        handle_low = low_min.query(i, k)
+        out += handle_high - handle_low + (breakout_max.query(k + 1, k + 10) > handle_high)
+    return out
+
+def main(n=50000, n_queries=20000):
+    data = make_data(n)
+    rng = np.random.default_rng(1)
+    starts = rng.integers(0, n - 62, n_queries)
+    queries = [(int(i), int(i + d)) for i, d in zip(starts, rng.integers(5, 51, n_queries))]
+
+    t0 = time.perf_counter()
+    high_max = SparseTable(data['high'].values, 'max', 51)
+    low_min = SparseTable(data['low'].values, 'min', 51)
+    breakout_max = SparseTable(data['close'].values - 1.5 * data['ATR'].values, 'max', 10)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = sparse_table_path(high_max, low_min, breakout_max, queries)
+    fast_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    slow = slicing_path(data, queries)
+    slow_time = time.perf_counter() - t0
+
+    assert np.isclose(fast, slow), (fast, slow)
+    print(f"{n_queries} handle/breakout queries over {n} bars")
+    print(f"  DataFrame slicing: {slow_time:8.3f} s ({slow_time / n_queries * 1e6:8.1f} us/query)")
+    print(f"  Sparse table:      {fast_time:8.3f} s ({fast_time / n_queries * 1e6:8.1f} us/query), build {build * 1e3:.1f} ms")
+    print(f"  Speedup:           {slow_time / fast_time:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Startup benchmark for the main.py command line: wall time of whole
+processes, which is what a user waits for, on a generated candle store.
+
+Cases, each the best of --repeat fresh processes:
+- help: `main.py --help` (argument parsing only)
+- first run: `main.py --no-plots --no-cache` (ATR, scan and report)
+- cached run: `main.py --no-plots` once the feature cache is warm
+- cached range: the cached run over --start/--end (a month of bars)
+
+For every case the heavy modules the process imported are listed, so an
+eager import creeping back into the CLI shows up here.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --bars 500000 --output startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ['numpy', 'pandas', 'talib', 'numba', 'scipy', 'plotly', 'pattern_detector']
+
+# Runs main.py as a script, then prints which heavy modules it loaded
+_RUNNER = """
+import sys, json, runpy
+sys.argv = ['main.py'] + sys.argv[1:]
+try:
+    runpy.run_path('main.py', run_name='__main__')
+except SystemExit:
+    pass
+print(json.dumps(sorted(m for m in %r if m in sys.modules)))
+""" % (HEAVY_MODULES,)
+
+
+def make_store(root, bars, seed):
+    from candle_store import CandleStore
+    from synthetic_data import generate_ohlcv
+    df, _ = generate_ohlcv(bars, seed=seed)
+    df.index.name = 'open_time'
+    CandleStore(root).append('BTCUSDT', '1m', df)
+
+
+def run_case(args, repeat):
+    """Best wall time of repeat runs of main.py with args, and the heavy modules loaded."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', _RUNNER] + args, cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return {'seconds': round(best, 4), 'imported': json.loads(result.stdout.splitlines()[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process wall time of the main.py command line.")
+    parser.add_argument('--bars', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help="Also save the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_store(os.path.join(tmp, 'store'), args.bars, args.seed)
+        common = ['--store', os.path.join(tmp, 'store'), '--cache-dir', os.path.join(tmp, 'cache'),
+                  '--report', os.path.join(tmp, 'report.csv'), '--patterns-dir', os.path.join(tmp, 'patterns')]
+        cases = {
+            'help': ['--help'],
+            'first run': common + ['--no-plots', '--no-cache'],
+            'cached run': common + ['--no-plots'],
+            'cached range': common + ['--no-plots', '--start', '2024-01-15', '--end', '2024-02-15'],
+        }
+        # Warm the cache (and the stored ATR) before timing the cached runs
+        run_case(common + ['--no-plots'], 1)
+        run_case(cases['cached range'], 1)
+        results = {'bars': args.bars, 'python': sys.version.split()[0], 'cases': {}}
+        for name, case_args in cases.items():
+            results['cases'][name] = stats = run_case(case_args, args.repeat)
+            print(f"{name:20s} {stats['seconds']:7.3f}s  imports: {', '.join(stats['imported']) or '-'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Synthetic benchmark suite: end-to-end detection and per-stage throughput on
+generated OHLCV random walks with planted cup-and-handle patterns.
+
+Each scale runs in a fresh process and reports, per stage, wall time,
+bars/sec (or calls/sec) and peak RSS; the end-to-end stage also reports
+recall of all planted patterns and of those the scan's skip-ahead leaves
+reachable. Results are written as JSON so runs of different versions can
+be diffed, or compared directly with --compare.
+
+Run from the repository root:
+    python benchmarks/bench_suite.py                      # 10k and 100k bars
+    python benchmarks/bench_suite.py --scales 10k,100k,1M,10M --output full.json
+    python benchmarks/bench_suite.py --compare old.json
+
+The 1M and 10M scales take a long time end to end; per-stage benchmarks
+sample --stage-bars cup end bars (at most a tenth of the series) and time
+at most --stage-calls handle and breakout searches at every scale, so
+they report per-call rates at a bounded cost.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pattern_detector import PatternDetector
+import scan_kernel
+from synthetic_data import generate_ohlcv, match_planted
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+
+
+def _reset_peak_rss():
+    """Resets the kernel's peak RSS counter; returns False where unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux, bytes on macOS, and never resets
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+class _Stage:
+    """Times a block and records its peak RSS into the results dict."""
+
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+
+    def __enter__(self):
+        self.stats = self.results.setdefault(self.name, {})
+        self.stats['peak_rss_scope'] = 'stage' if _reset_peak_rss() else 'process'
+        self.t0 = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *exc):
+        self.stats['seconds'] = time.perf_counter() - self.t0
+        self.stats['peak_rss_mb'] = _peak_rss_mb()
+
+
+def _sample_bars(detector, n_sample):
+    """Evenly spread blocks of cup end bars, n_sample in total."""
+    first = detector.max_cup_duration
+    last = len(detector.close) - detector.max_handle_duration - 11
+    if last <= first:
+        return np.zeros(0, dtype=np.int64)
+    n_blocks = max(1, min(10, n_sample // 100))
+    block = max(1, min(n_sample, last - first) // n_blocks)
+    starts = np.linspace(first, last - block, n_blocks).astype(np.int64)
+    return np.unique(np.concatenate([np.arange(s, s + block) for s in starts]))
+
+
+def _reachable(detector, patterns, planted):
+    """
+    Marks planted patterns the scan could have reported: after each pattern
+    the scan skips to _resume_index, and a planted pattern is shadowed when
+    every cup end that could report it falls inside one of those skips.
+    """
+    skips = [(p['cup_end_idx'], detector._resume_index(p['handle_end_idx'], p['breakout_candle_idx']))
+             for p in patterns]
+    reachable = np.ones(len(planted), dtype=bool)
+    for n, row in enumerate(planted.itertuples()):
+        lo = row.cup_start_idx + detector.min_cup_duration
+        hi = row.breakout_candle_idx - 1 - detector.min_handle_duration
+        reachable[n] = not any(s < lo and hi < e for s, e in skips)
+    return reachable
+
+
+def _cup_inputs(detector, bars, limit, seed=0):
+    """
+    (i, rim_price, cup_bottom_price, cup_depth) of up to limit cups passing
+    the R², rim and depth checks, from cup end bars taken in random order.
+    """
+    cups = []
+    for i in np.random.default_rng(seed).permutation(bars).tolist():
+        j = np.arange(i - detector.min_cup_duration, max(i - detector.max_cup_duration, 0) - 1, -1)
+        left, right = detector.high[j], detector.high[i]
+        # Cup bottoms from the shortest cup to the longest
+        bottom = np.minimum.accumulate(detector.close[j[-1]:i + 1][::-1])[detector.min_cup_duration:]
+        rim = np.maximum(left, right)
+        ok = ((detector.fit_engine.r_squared_at(i)[:len(j)] >= detector.min_r2)
+              & ~(np.abs(left - right) / ((left + right) / 2) > 0.10)
+              & (rim - bottom >= 2 * detector.avg_candle_size))
+        cups.extend((i, r, b, r - b) for r, b in zip(rim[ok].tolist(), bottom[ok].tolist()))
+        if len(cups) >= limit:
+            break
+    return cups[:limit]
+
+
+def run_scale(label, n_bars, seed=0, stage_bars=20_000, stage_calls=2_000, plot_charts=50, png=False,
+              detector_kwargs=None):
+    """Runs every stage at one scale and returns its results."""
+    detector_kwargs = detector_kwargs or {}
+    stages = {}
+
+    with _Stage(stages, 'generate') as stats:
+        data, planted = generate_ohlcv(n_bars, seed=seed)
+    stats['bars_per_sec'] = n_bars / stats['seconds']
+
+    with _Stage(stages, 'detect') as stats:
+        detector = PatternDetector(data, **detector_kwargs)
+        patterns = detector.detect_patterns()
+    found = match_planted(patterns, planted)
+    reachable = _reachable(detector, patterns, planted)
+    stats.update(
+        bars_per_sec=n_bars / stats['seconds'],
+        # The compiled kernel (see scan_kernel) does not count its fits
+        compiled=bool(detector.use_jit and scan_kernel.available()),
+        parabola_fits=detector.fit_engine.fits,
+        patterns=len(patterns),
+        planted=len(planted),
+        reachable=int(reachable.sum()),
+        found=int(found.sum()),
+        recall=float(found.mean()) if len(planted) else None,
+        # Found patterns are reachable by definition; shadowed ones are not
+        # counted against the detector here
+        reachable_recall=float(found[reachable].mean()) if reachable.any() else None,
+    )
+    print(f"[{label}] detect: {len(patterns)} patterns, {stats['found']}/{len(planted)} planted found, "
+          f"{stats['found']}/{stats['reachable']} of those reachable, {stats['bars_per_sec']:.0f} bars/s", flush=True)
+
+    bars = _sample_bars(detector, min(stage_bars, n_bars // 10))
+    with _Stage(stages, 'fit') as stats:
+        fit_engine = detector.fit_engine
+        fit_engine.reset(detector.close)
+        for i in bars:
+            fit_engine.r_squared_at(int(i))
+    stats.update(bars=len(bars), windows=len(bars) * len(fit_engine.spans),
+                 bars_per_sec=len(bars) / stats['seconds'])
+
+    cups = _cup_inputs(detector, bars, stage_calls, seed)
+    with _Stage(stages, 'handle_search') as stats:
+        for cup in cups:
+            detector._find_handle(*cup)
+    stats.update(calls=len(cups), calls_per_sec=len(cups) / stats['seconds'] if cups else None)
+
+    # Random handle ends, each with the high of a short handle before it
+    rng = np.random.default_rng(seed)
+    ks = rng.integers(detector.min_cup_duration, len(detector.close) - 11, size=stage_calls)
+    handle_highs = [detector.high_max.query(k - 5, k) for k in ks.tolist()]
+    with _Stage(stages, 'breakout') as stats:
+        for k, handle_high in zip(ks.tolist(), handle_highs):
+            detector._find_breakout(k, handle_high)
+    stats.update(calls=len(ks), calls_per_sec=len(ks) / stats['seconds'])
+
+    from plot_utils import ChartRenderer, build_pattern_figure
+    charts = patterns[:plot_charts]
+    with _Stage(stages, 'plot') as stats:
+        for n, pattern in enumerate(charts, start=1):
+            build_pattern_figure(data, pattern, f"{n:02d}").to_json()
+    stats.update(charts=len(charts), charts_per_sec=len(charts) / stats['seconds'] if charts else None)
+    if png and charts:
+        with _Stage(stages, 'plot_png') as stats:
+            try:
+                with tempfile.TemporaryDirectory() as out:
+                    with ChartRenderer(skip_unchanged=False) as renderer:
+                        renderer.render(data, [dict(p, pattern_id=f"{n:02d}") for n, p in enumerate(charts, 1)], out)
+                stats.update(charts=len(charts), charts_per_sec=len(charts) / stats['seconds'])
+            except Exception as e:  # e.g. no Chrome for kaleido
+                stats['error'] = f"{type(e).__name__}: {e}"
+
+    for name, stats in stages.items():
+        rate = stats.get('bars_per_sec') or stats.get('calls_per_sec') or stats.get('charts_per_sec')
+        print(f"[{label}] {name:14s} {stats['seconds']:9.3f} s  {rate or 0:14.0f} /s  "
+              f"peak RSS {stats['peak_rss_mb']:.0f} MB", flush=True)
+    return {'bars': n_bars, 'seed': seed, 'stages': stages}
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'created': pd.Timestamp.now(tz='UTC').isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline):
+    """Prints per-stage throughput ratios (new / baseline) and recall changes."""
+    print(f"Compared with {baseline.get('git_commit') or 'baseline'}:")
+    for label, scale in results['scales'].items():
+        old = baseline.get('scales', {}).get(label)
+        if old is None:
+            continue
+        for name, stats in scale['stages'].items():
+            old_stats = old['stages'].get(name, {})
+            for key in ('bars_per_sec', 'calls_per_sec', 'charts_per_sec'):
+                if stats.get(key) and old_stats.get(key):
+                    print(f"  {label:5s} {name:14s} {key:15s} {stats[key] / old_stats[key]:6.2f}x")
+        for key in ('recall', 'reachable_recall'):
+            recall, old_recall = scale['stages']['detect'].get(key), old['stages'].get('detect', {}).get(key)
+            if recall != old_recall:
+                print(f"  {label:5s} detect {key} {old_recall} -> {recall}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic benchmark suite for the pattern detector.")
+    parser.add_argument('--scales', default='10k,100k', help=f"Comma-separated subset of {','.join(SCALES)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stage-bars', type=int, default=20_000,
+                        help="Cup end bars sampled by per-stage benchmarks (at most a tenth of the bars)")
+    parser.add_argument('--stage-calls', type=int, default=2_000,
+                        help="Handle and breakout searches timed by per-stage benchmarks")
+    parser.add_argument('--plot-charts', type=int, default=50)
+    parser.add_argument('--png', action='store_true', help="Also export PNGs through kaleido")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = dict(_environment(), suite='synthetic', seed=args.seed, scales={})
+    # A fresh process per scale keeps peak RSS and allocator state independent
+    ctx = multiprocessing.get_context('spawn')
+    for label in args.scales.split(','):
+        with ctx.Pool(1) as pool:
+            results['scales'][label] = pool.apply(
+                run_scale, (label, SCALES[label], args.seed, args.stage_bars, args.stage_calls, args.plot_charts,
+                             args.png))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+TIME_COLUMN = 'open_time'
+
+
+class CandleStore:
+    """
+    Binary columnar store for candles, partitioned by symbol, interval and day.
+
+    Layout: <root>/<symbol>/<interval>/<YYYY-MM-DD>/<column>.bin, one raw
+    little-endian array per column (open_time as int64 UTC nanoseconds, every
+    other column float64), plus columns.json listing the columns of the dataset.
+    Partitions are memory-mapped on read, so loading a time range touches only
+    the days it covers and parses no text. Appends write to the end of the
+    column files and never rewrite earlier rows; open_time is written last and
+    defines the committed row count, so an interrupted append is trimmed away.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dataset_dir(self, symbol, interval):
+        return os.path.join(self.root, symbol, interval)
+
+    def _column_path(self, symbol, interval, day, column):
+        return os.path.join(self._dataset_dir(symbol, interval), day, f"{column}.bin")
+
+    @staticmethod
+    def _dtype(column):
+        return np.dtype('<i8') if column == TIME_COLUMN else np.dtype('<f8')
+
+    def columns(self, symbol, interval):
+        """Returns the stored value columns (excluding open_time), or [] if absent."""
+        path = os.path.join(self._dataset_dir(symbol, interval), 'columns.json')
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_columns(self, symbol, interval, columns):
+        os.makedirs(self._dataset_dir(symbol, interval), exist_ok=True)
+        path = os.path.join(self._dataset_dir(symbol, interval), 'columns.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(columns, f)
+        os.replace(path + '.tmp', path)
+
+    def partitions(self, symbol, interval, start=None, end=None):
+        """Returns the sorted day partitions overlapping [start, end)."""
+        dataset_dir = self._dataset_dir(symbol, interval)
+        if not os.path.isdir(dataset_dir):
+            return []
+        days = sorted(d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d)))
+        if start is not None:
+            first = _to_utc(pd.Timestamp(start)).strftime('%Y-%m-%d')
+            days = [d for d in days if d >= first]
+        if end is not None:
+            last = _to_utc(pd.Timestamp(end))
+            days = [d for d in days if pd.Timestamp(d) < last]
+        return days
+
+    def _rows(self, symbol, interval, day):
+        path = self._column_path(symbol, interval, day, TIME_COLUMN)
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // 8
+
+    def _map(self, symbol, interval, day, column, rows):
+        path = self._column_path(symbol, interval, day, column)
+        if rows == 0 or not os.path.exists(path):
+            return np.full(rows, np.nan) if column != TIME_COLUMN else np.zeros(0, dtype='<i8')
+        available = os.path.getsize(path) // 8
+        if available < rows:
+            # Column added after this partition was written
+            values = np.full(rows, np.nan)
+            values[:available] = np.memmap(path, dtype=self._dtype(column), mode='r', shape=(available,))
+            return values
+        return np.memmap(path, dtype=self._dtype(column), mode='r', shape=(rows,))
+
+    def read_partition(self, symbol, interval, day, columns=None):
+        """Returns {column: memory-mapped array} for one day, including open_time."""
+        rows = self._rows(symbol, interval, day)
+        columns = self.columns(symbol, interval) if columns is None else columns
+        arrays = {TIME_COLUMN: self._map(symbol, interval, day, TIME_COLUMN, rows)}
+        for column in columns:
+            arrays[column] = self._map(symbol, interval, day, column, rows)
+        return arrays
+
+    def last_timestamp(self, symbol, interval):
+        """Returns the open time of the last stored bar, or None."""
+        days = self.partitions(symbol, interval)
+        while days:
+            times = self.read_partition(symbol, interval, days.pop(), columns=[])[TIME_COLUMN]
+            if len(times):
+                return pd.Timestamp(int(times[-1]))
+        return None
+
+    def load_arrays(self, symbol, interval, start=None, end=None, columns=None):
+        """
+        Returns {column: array} for bars with start <= open_time < end, with
+        open_time as int64 UTC nanoseconds. A range within one day partition
+        stays memory-mapped; otherwise each column is concatenated once.
+        """
+        columns = self.columns(symbol, interval) if columns is None else columns
+        lo = None if start is None else _to_utc(pd.Timestamp(start)).value
+        hi = None if end is None else _to_utc(pd.Timestamp(end)).value
+        parts = {col: [] for col in [TIME_COLUMN] + columns}
+        for day in self.partitions(symbol, interval, start, end):
+            arrays = self.read_partition(symbol, interval, day, columns)
+            times = arrays[TIME_COLUMN]
+            a = 0 if lo is None else np.searchsorted(times, lo, side='left')
+            b = len(times) if hi is None else np.searchsorted(times, hi, side='left')
+            for col, values in arrays.items():
+                parts[col].append(values[a:b])
+        values = {}
+        for col, chunks in parts.items():
+            if len(chunks) == 1:
+                values[col] = chunks[0]  # Still memory-mapped
+            else:
+                values[col] = np.concatenate(chunks) if chunks else np.zeros(0, dtype=self._dtype(col))
+        return values
+
+    def load(self, symbol, interval, start=None, end=None, columns=None):
+        """Loads bars with start <= open_time < end into a DataFrame indexed by open_time."""
+        columns = self.columns(symbol, interval) if columns is None else columns
+        values = self.load_arrays(symbol, interval, start, end, columns)
+        index = pd.DatetimeIndex(values.pop(TIME_COLUMN).astype('datetime64[ns]'), name=TIME_COLUMN)
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    def append(self, symbol, interval, df):
+        """
+        Appends bars newer than the last stored bar; returns the number written.
+
+        The first append defines the dataset's columns; later frames may omit
+        some (stored as NaN) but may not introduce new ones, use write_column.
+        """
+        if df.empty:
+            return 0
+        columns = self.columns(symbol, interval)
+        if not columns:
+            columns = list(df.columns)
+            self._write_columns(symbol, interval, columns)
+        unknown = set(df.columns) - set(columns)
+        if unknown:
+            raise ValueError(f"Columns {sorted(unknown)} are not in the store; add them with write_column")
+
+        times = _to_utc_index(df.index).asi8
+        last = self.last_timestamp(symbol, interval)
+        keep = np.ones(len(df), dtype=bool) if last is None else times > last.value
+        if not np.all(np.diff(times[keep]) > 0):
+            raise ValueError("Bars must be sorted by open_time without duplicates")
+        times = times[keep]
+        if len(times) == 0:
+            return 0
+
+        new_values = {column: df[column].values[keep] for column in columns if column in df}
+        days = times.astype('datetime64[ns]').astype('datetime64[D]')
+        bounds = np.flatnonzero(np.diff(days.astype(np.int64))) + 1
+        for a, b in zip(np.r_[0, bounds], np.r_[bounds, len(times)]):
+            day = str(days[a])
+            os.makedirs(os.path.join(self._dataset_dir(symbol, interval), day), exist_ok=True)
+            rows = self._rows(symbol, interval, day)
+            for column in columns:
+                values = new_values[column][a:b] if column in new_values else np.full(b - a, np.nan)
+                self._append_values(symbol, interval, day, column, rows, values)
+            # Committing open_time last makes the rows visible
+            self._append_values(symbol, interval, day, TIME_COLUMN, rows, times[a:b])
+        return len(times)
+
+    def _append_values(self, symbol, interval, day, column, rows, values):
+        path = self._column_path(symbol, interval, day, column)
+        with open(path, 'ab') as f:
+            # Drop rows left behind by an interrupted append, and pad columns
+            # added after this partition was started
+            size = f.seek(0, os.SEEK_END)
+            if size > rows * 8:
+                f.truncate(rows * 8)
+            elif size < rows * 8:
+                f.write(np.full(rows - size // 8, np.nan).astype('<f8').tobytes())
+            f.write(np.asarray(values, dtype=self._dtype(column)).tobytes())
+
+    def write_column(self, symbol, interval, column, values, start=None):
+        """
+        Stores a derived column (e.g. ATR) aligned with the stored bars,
+        replacing it if present. With start, values are those of the bars
+        from open time start on: only the partitions holding them are
+        rewritten, and earlier bars keep their values.
+        """
+        if column == TIME_COLUMN or column in OHLCV_COLUMNS:
+            raise ValueError(f"{column} is a base column and cannot be overwritten")
+        values = np.asarray(values, dtype=np.float64)
+        days = self.partitions(symbol, interval, start)
+        rows_per_day = [self._rows(symbol, interval, day) for day in days]
+        # Rows of the first partition before start keep their stored values
+        kept = np.zeros(0)
+        if start is not None and days:
+            times = self.read_partition(symbol, interval, days[0], columns=[])[TIME_COLUMN]
+            a = int(np.searchsorted(times, _to_utc(pd.Timestamp(start)).value))
+            kept = np.array(self._map(symbol, interval, days[0], column, rows_per_day[0])[:a])
+        if sum(rows_per_day) - len(kept) != len(values):
+            raise ValueError(f"Expected {sum(rows_per_day) - len(kept)} values for {column}, got {len(values)}")
+        values = np.concatenate([kept, values])
+        offset = 0
+        for day, rows in zip(days, rows_per_day):
+            path = self._column_path(symbol, interval, day, column)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(values[offset:offset + rows].astype('<f8').tobytes())
+            os.replace(path + '.tmp', path)
+            offset += rows
+        columns = self.columns(symbol, interval)
+        if column not in columns:
+            self._write_columns(symbol, interval, columns + [column])
+
+    def import_csv(self, path, symbol, interval, chunksize=100_000):
+        """One-off import of a CSV with an open_time column (e.g. data/raw_data.csv)."""
+        total = 0
+        for chunk in pd.read_csv(path, index_col=TIME_COLUMN, parse_dates=True, chunksize=chunksize):
+            total += self.append(symbol, interval, chunk)
+        return total
+
+
+def _to_utc(ts):
+    """Naive timestamps are taken as UTC; aware ones are converted."""
+    return ts if ts.tz is None else ts.tz_convert('UTC').tz_localize(None)
+
+
+def _to_utc_index(index):
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ns')
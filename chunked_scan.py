@@ -0,0 +1,265 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import scan_kernel
+from candle_store import TIME_COLUMN, _to_utc
+from pattern_detector import PatternDetector, patterns_from_records
+
+# Pattern record fields holding bar indices, shifted from block to series positions
+_INDEX_FIELDS = ['cup_start_idx', 'cup_end_idx', 'handle_end_idx', 'breakout_candle_idx']
+
+
+class WilderATR:
+    """
+    ATR over consecutive blocks of bars. Only the previous close and the
+    recurrence state are carried between blocks, so the first `period` bars
+    are the only warm-up; values agree with talib.ATR over the whole series
+    to rounding (its summation order differs in the last bits).
+    """
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.tr_sum = 0.0
+        self.tr_count = 0
+        self.atr = np.nan
+
+    @classmethod
+    def resume(cls, atr, close, period=14):
+        """Continues a series whose last bar had this ATR (past the warm-up) and close."""
+        state = cls(period)
+        state.prev_close = float(close)
+        state.tr_count = period
+        state.atr = float(atr)
+        return state
+
+    def update(self, high, low, close):
+        """Returns the ATR of each bar of the block, continuing from the previous blocks."""
+        out = np.full(len(close), np.nan)
+        if not len(close):
+            return out
+        first = 0
+        if self.prev_close is None:
+            first = 1  # No true range for the first candle
+            self.prev_close = close[0]
+        prev_close = np.concatenate([[self.prev_close], close[:-1]])
+        true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+        period, tr_sum, tr_count, atr = self.period, self.tr_sum, self.tr_count, self.atr
+        # The recurrence is sequential; plain floats keep the loop cheap
+        for t, tr in enumerate(true_range[first:].tolist(), start=first):
+            if tr_count < period:
+                tr_sum += tr
+                tr_count += 1
+                if tr_count == period:
+                    atr = tr_sum / period
+            else:
+                atr = (atr * (period - 1) + tr) / period
+            out[t] = atr
+        self.tr_sum, self.tr_count, self.atr = tr_sum, tr_count, atr
+        self.prev_close = float(close[-1])
+        return out
+
+
+def _block_arrays(block, columns):
+    """{column: float64 array} of a block, with open_time as int64 UTC nanoseconds."""
+    times = np.asarray(block[TIME_COLUMN])
+    if times.dtype.kind == 'M':
+        times = times.astype('M8[ns]').view(np.int64)
+    arrays = {TIME_COLUMN: np.asarray(times, dtype=np.int64)}
+    for column in columns:
+        arrays[column] = np.asarray(block[column], dtype=np.float64)
+    return arrays
+
+
+def scan_blocks(blocks, min_cup_duration=30, max_cup_duration=300, max_handle_duration=50,
+                skip_days_after_pattern=1, one_pattern_per_day=True, avg_candle_size=None,
+                volume_confirmation=False, **detector_params):
+    """
+    Greedy pattern scan over consecutive blocks of bars; yields pattern dicts
+    (as PatternDetector.detect_patterns) as soon as the block completing
+    them has been read, with bar indices counted from the first block.
+
+    blocks are mappings of 1-D arrays: 'open_time' (naive UTC), 'high',
+    'low', 'close', 'volume' with volume_confirmation, and optionally 'ATR'
+    (then every block must have it; otherwise ATR(14) is computed across the
+    blocks, see WilderATR). Between blocks only the bars the next cup ends
+    can still reach are kept: max_cup_duration bars before the next cup end
+    to evaluate, which itself waits for max_handle_duration + 11 bars of
+    handle and breakout. The scan's skip-ahead and last-pattern day carry
+    over too, so with the whole series' ATR and avg_candle_size the patterns
+    are those of a scan of all bars at once, whatever the block size; memory
+    is bounded by the block size. Without avg_candle_size the mean candle
+    size of the bars read so far is used.
+    """
+    if detector_params.get('exhaustive') or detector_params.get('instrument') \
+            or detector_params.get('record_near_misses'):
+        raise ValueError("Blocks are scanned greedily and uninstrumented")
+    columns = ['high', 'low', 'close'] + (['volume'] if volume_confirmation else [])
+    params = dict(detector_params, min_cup_duration=min_cup_duration, max_cup_duration=max_cup_duration,
+                  max_handle_duration=max_handle_duration, skip_days_after_pattern=skip_days_after_pattern,
+                  one_pattern_per_day=one_pattern_per_day, volume_confirmation=volume_confirmation)
+    skip_ns = pd.Timedelta(days=skip_days_after_pattern).value
+    atr_state = WilderATR()
+    range_sum, range_count = 0.0, 0
+
+    buffer = None
+    offset = 0  # Series position of the first buffered bar
+    # Next cup end to evaluate: at least resume_bar, and not before resume_time
+    resume_bar, resume_time = min_cup_duration, None
+    last_detected_day = None
+    for block in blocks:
+        arrays = _block_arrays(block, columns + (['ATR'] if 'ATR' in block else []))
+        if 'ATR' not in arrays:
+            arrays['ATR'] = atr_state.update(arrays['high'], arrays['low'], arrays['close'])
+        if avg_candle_size is None:
+            ranges = arrays['high'] - arrays['low']
+            range_sum += np.nansum(ranges)
+            range_count += np.count_nonzero(~np.isnan(ranges))
+        buffer = arrays if buffer is None else {c: np.concatenate([buffer[c], arrays[c]]) for c in arrays}
+
+        times = buffer[TIME_COLUMN]
+        n = len(times)
+        start = resume_bar - offset
+        if resume_time is not None:
+            start = max(start, int(np.searchsorted(times, resume_time)))
+        # Cup ends before stop have all their handle and breakout bars
+        stop = n - max_handle_duration - 11
+        if start < stop:
+            detector = PatternDetector(buffer, atr=buffer['ATR'], avg_candle_size=(
+                avg_candle_size if avg_candle_size is not None else range_sum / max(range_count, 1)), **params)
+            if detector._kernel_usable():
+                rows = scan_kernel.scan_patterns(detector, start=start, last_detected_day=last_detected_day)
+            else:
+                rows = detector._scan(start, last_detected_day)
+            if rows:
+                j, _, k, breakout_idx, _ = rows[-1]
+                last_detected_day = detector.day_ids[j]
+                resume_bar = offset + k + 1
+                resume_time = times[breakout_idx] + skip_ns
+                records = detector._make_records(rows)
+                for field in _INDEX_FIELDS:
+                    records[field] += offset
+                yield from patterns_from_records(records)
+            resume_bar = max(resume_bar, offset + stop)
+
+        # Keep the bars the next cup ends can start from
+        next_cup_end = resume_bar
+        if resume_time is not None:
+            next_cup_end = max(next_cup_end, offset + int(np.searchsorted(times, resume_time)))
+        keep = min(max(next_cup_end - max_cup_duration - offset, 0), n)
+        buffer = {c: values[keep:] for c, values in buffer.items()}
+        offset += keep
+
+
+def store_blocks(store, symbol, interval, start=None, end=None, block_size=100_000, columns=None):
+    """
+    Yields {column: array} blocks of block_size bars (the last one may be
+    shorter) of a CandleStore dataset with start <= open_time < end,
+    reading one memory-mapped day partition at a time.
+    """
+    columns = store.columns(symbol, interval) if columns is None else columns
+    lo = None if start is None else _to_utc(pd.Timestamp(start)).value
+    hi = None if end is None else _to_utc(pd.Timestamp(end)).value
+    pending, count = [], 0
+    for day in store.partitions(symbol, interval, start, end):
+        arrays = store.read_partition(symbol, interval, day, columns)
+        times = arrays[TIME_COLUMN]
+        a = 0 if lo is None else np.searchsorted(times, lo, side='left')
+        b = len(times) if hi is None else np.searchsorted(times, hi, side='left')
+        while a < b:
+            take = min(block_size - count, b - a)
+            pending.append({c: values[a:a + take] for c, values in arrays.items()})
+            count += take
+            a += take
+            if count == block_size:
+                yield {c: np.concatenate([part[c] for part in pending]) for c in pending[0]}
+                pending, count = [], 0
+    if pending:
+        yield {c: np.concatenate([part[c] for part in pending]) for c in pending[0]}
+
+
+def scan_store(store, symbol, interval, start=None, end=None, block_size=100_000, avg_candle_size=None,
+               volume_confirmation=False, **detector_params):
+    """
+    Scans a CandleStore dataset block by block (see scan_blocks); yields the
+    patterns PatternDetector finds on the whole range loaded at once, as
+    main.py scans it.
+
+    A first pass over the high, low and stored ATR columns, one block at a
+    time, gives the range's mean candle size (unless avg_candle_size is
+    given) and checks the ATR column saved by main.py: it is used when it
+    covers every bar, otherwise ATR is computed across the blocks.
+    """
+    stored = store.columns(symbol, interval)
+    use_atr = 'ATR' in stored
+    if avg_candle_size is None or use_atr:
+        range_sum, range_count, position = 0.0, 0, 0
+        for block in store_blocks(store, symbol, interval, start, end, block_size,
+                                  ['high', 'low'] + (['ATR'] if use_atr else [])):
+            ranges = block['high'] - block['low']
+            range_sum += np.nansum(ranges)
+            range_count += np.count_nonzero(~np.isnan(ranges))
+            if use_atr:
+                # talib leaves the first 14 bars NaN; bars appended since it was saved are NaN too
+                missing = np.flatnonzero(np.isnan(block['ATR'])) + position
+                use_atr = not (missing >= 14).any()
+            position += len(ranges)
+        if avg_candle_size is None:
+            avg_candle_size = range_sum / range_count if range_count else np.nan
+    columns = ['high', 'low', 'close'] + (['volume'] if volume_confirmation else []) + (['ATR'] if use_atr else [])
+    yield from scan_blocks(store_blocks(store, symbol, interval, start, end, block_size, columns),
+                           avg_candle_size=avg_candle_size, volume_confirmation=volume_confirmation,
+                           **detector_params)
+
+
+if __name__ == "__main__":
+    from preprocessing import DETECTOR_OPTIONS
+    from candle_store import CandleStore
+    from reporting import build_report
+
+    parser = argparse.ArgumentParser(description="Scan a long candle history block by block in bounded memory.")
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--interval', default='1m')
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--store', default=os.path.join('data', 'store'))
+    parser.add_argument('--block-size', type=int, default=100_000, help="Bars read and scanned at a time")
+    parser.add_argument('--report', default='chunked_report.csv')
+    parser.add_argument('--pattern-db', default=os.path.join('data', 'patterns.db'))
+    parser.add_argument('--no-pattern-db', action='store_true')
+    for name, default in DETECTOR_OPTIONS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=type(default), default=default)
+    parser.add_argument('--all-per-day', action='store_true')
+    parser.add_argument('--volume-confirmation', action='store_true')
+    args = parser.parse_args()
+
+    db = None
+    if not args.no_pattern_db:
+        from pattern_store import PatternStore
+        db = PatternStore(args.pattern_db)
+    t0 = time.perf_counter()
+    count = 0
+    batch = []
+    with open(args.report, 'w') as report:
+        build_report([]).to_csv(report, index=False)
+        patterns = scan_store(CandleStore(args.store), args.symbol, args.interval, args.start, args.end,
+                              args.block_size, one_pattern_per_day=not args.all_per_day,
+                              volume_confirmation=args.volume_confirmation,
+                              **{name: getattr(args, name) for name in DETECTOR_OPTIONS})
+        # Report rows are written, and stored, as the patterns arrive
+        for pattern in patterns:
+            count += 1
+            pattern['pattern_id'] = f"{count:02d}"
+            batch.append(pattern)
+            if len(batch) == 1000:
+                build_report(batch).to_csv(report, header=False, index=False)
+                if db is not None:
+                    db.upsert(build_report(batch), args.symbol, args.interval)
+                batch = []
+        build_report(batch).to_csv(report, header=False, index=False)
+        if db is not None:
+            db.upsert(build_report(batch), args.symbol, args.interval)
+            db.close()
+    print(f"{count} patterns in {time.perf_counter() - t0:.1f}s, saved to {args.report}")
@@ -0,0 +1,435 @@
+import os
+import json
+import asyncio
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import scan_kernel
+from candle_store import CandleStore, TIME_COLUMN, _to_utc
+from chunked_scan import WilderATR
+from pattern_detector import PatternDetector, patterns_from_records, DAY_NS
+from stream_detector import StreamingPatternDetector
+from preprocessing import update_atr
+from reporting import report_entry
+
+
+class _Dataset:
+    """
+    The stored bars of one (symbol, interval) held in memory with their
+    ATR(14) over the whole series (see preprocessing.update_atr). Appended bars
+    continue the ATR recurrence from its last state and are written past the
+    end of the columns, whose capacity grows geometrically; arrays are views
+    of the bars so far, which appending never changes, so scans running over
+    earlier views are unaffected.
+    """
+
+    def __init__(self, store, symbol, interval):
+        update_atr(store, symbol, interval)
+        columns = [c for c in ('high', 'low', 'close', 'volume', 'ATR') if c in store.columns(symbol, interval)]
+        arrays = store.load_arrays(symbol, interval, columns=columns)
+        buffers = {c: np.array(arrays[c]) for c in arrays}
+        buffers[TIME_COLUMN] = buffers[TIME_COLUMN].astype('M8[ns]').view(np.int64)
+        # Buffers and bar count are replaced together so readers never pair them wrongly
+        self._columns = (buffers, len(buffers[TIME_COLUMN]))
+        high, low, close, atr = (buffers[c] for c in ('high', 'low', 'close', 'ATR'))
+        if len(atr) and not np.isnan(atr[-1]):
+            self.atr_state = WilderATR.resume(atr[-1], close[-1])
+        else:
+            self.atr_state = WilderATR()  # Still within the first 14 bars
+            self.atr_state.update(high, low, close)
+
+    @property
+    def arrays(self):
+        buffers, bars = self._columns
+        return {c: values[:bars] for c, values in buffers.items()}
+
+    @property
+    def bars(self):
+        return self._columns[1]
+
+    def extend(self, bars):
+        """Appends bars (indexed by naive UTC open time); returns their ATR."""
+        buffers, n = self._columns
+        new = {TIME_COLUMN: bars.index.as_unit('ns').asi8}
+        for column in buffers:
+            if column not in (TIME_COLUMN, 'ATR'):
+                # Columns a frame omits are stored as NaN
+                new[column] = bars[column].to_numpy(dtype=np.float64) if column in bars else np.full(len(bars), np.nan)
+        new['ATR'] = self.atr_state.update(new['high'], new['low'], new['close'])
+        size = n + len(bars)
+        if size > len(buffers[TIME_COLUMN]):
+            capacity = max(size, 2 * len(buffers[TIME_COLUMN]))
+            grown = {}
+            for column, values in buffers.items():
+                grown[column] = np.empty(capacity, dtype=values.dtype)
+                grown[column][:n] = values[:n]
+            buffers = grown
+        for column, values in buffers.items():
+            values[n:size] = new[column]
+        self._columns = (buffers, size)
+        return new['ATR']
+
+    @staticmethod
+    def bounds(arrays, start=None, end=None):
+        """Positions [a, b) of the bars of arrays with start <= open_time < end."""
+        times = arrays[TIME_COLUMN]
+        a = 0 if start is None else int(np.searchsorted(times, _to_utc(pd.Timestamp(start)).value))
+        b = len(times) if end is None else int(np.searchsorted(times, _to_utc(pd.Timestamp(end)).value))
+        return a, max(a, b)
+
+
+class _ResidentScan:
+    """
+    The detector of one scan request (range and parameters) kept over a
+    resident dataset, with the patterns found so far.
+
+    When bars were appended, the detector is pointed at the extended range
+    (as StreamingPatternDetector re-points its buffers). If the mean candle
+    size is unchanged (avg_candle_size is given, or no bar joined the range)
+    the greedy scan continues from where it stopped, as chunked_scan does
+    between blocks: earlier cup ends read only bars and ATR values that
+    appending leaves unchanged. Otherwise the range is scanned again. Either
+    way the rows are those of batch_scan's job on the whole stored range.
+    """
+
+    def __init__(self, symbol, interval, start, end, params):
+        self.symbol, self.interval, self.start, self.end = symbol, interval, start, end
+        self.params = params
+        self.lock = threading.Lock()  # Updates of one scan run one at a time
+        self.detector = None
+        self.first = None  # Dataset position of the range's first bar
+        self.bars = None  # Dataset bars the rows were found over
+        self.stop = 0  # First cup end the scan has not reached
+        self.rows = []  # (j, i, k, breakout_idx, r_squared) of the patterns so far
+        self.report = []
+
+    def _point(self, view):
+        detector = self.detector
+        times = view[TIME_COLUMN]
+        detector.data = view
+        detector.timestamps_int = times
+        detector.day_ids = times - times % DAY_NS
+        detector.atr = view['ATR']
+        detector._index_arrays(view['high'], view['low'], view['close'], view['ATR'])
+        if detector.volume_confirmation:
+            detector.volume = view['volume']
+            detector.volume_sums = np.concatenate([[0.0], np.cumsum(detector.volume)])
+
+    def _greedy(self, start=None, last_detected_day=None):
+        detector = self.detector
+        if detector._kernel_usable():
+            return scan_kernel.scan_patterns(detector, start=start, last_detected_day=last_detected_day)
+        return detector._scan(start, last_detected_day)
+
+    def update(self, dataset):
+        """Brings the scan up to the dataset's bars; returns its report rows."""
+        with self.lock:
+            arrays = dataset.arrays
+            bars = len(arrays[TIME_COLUMN])
+            if bars == self.bars:
+                return list(self.report)
+            a, b = dataset.bounds(arrays, self.start, self.end)
+            view = {c: values[a:b] for c, values in arrays.items()}
+            avg = self.params.get('avg_candle_size')
+            if avg is None:
+                ranges = view['high'] - view['low']
+                avg = np.nanmean(ranges) if len(ranges) else np.nan  # As PatternDetector computes it
+            if self.detector is None:
+                self.detector = PatternDetector(view, atr=view['ATR'], **self.params)
+                resume = False
+            else:
+                resume = a == self.first and avg == self.detector.avg_candle_size and not self.detector.exhaustive
+                self._point(view)
+                self.detector.avg_candle_size = avg
+            detector = self.detector
+            if not resume:
+                self.rows, self.report = [], []
+                rows = detector._exhaustive_scan() if detector.exhaustive else self._greedy()
+            else:
+                start, last_detected_day = max(self.stop, detector.min_cup_duration), None
+                if self.rows:
+                    j, _, k, breakout_idx, _ = self.rows[-1]
+                    start = max(start, detector._resume_index(k, breakout_idx))
+                    last_detected_day = detector.day_ids[j]
+                rows = self._greedy(start, last_detected_day)
+            self.rows.extend(rows)
+            for pattern in patterns_from_records(detector._make_records(rows), detector.tz):
+                pattern['pattern_id'] = f"{len(self.report) + 1:02d}"
+                self.report.append(dict(symbol=self.symbol, interval=self.interval, **report_entry(pattern)))
+            self.first = a
+            self.stop = b - a - detector.max_handle_duration - 11
+            self.bars = bars
+            return list(self.report)
+
+
+class DetectionService:
+    """
+    Long-running detection server holding candle stores and detectors warm.
+
+    Clients send one JSON request per line ({"id": ..., "op": ..., ...}) over
+    TCP or a Unix socket and get one JSON response per line with the same id,
+    in completion order, so a slow scan never holds up other requests. Ops:
+
+    - ping: liveness check.
+    - scan: symbol, interval, optional start/end and detector params; returns
+      the report rows of batch_scan's job over that range. The dataset's bars
+      and ATR stay in memory after its first scan, and so does the detector of
+      each scan (see _ResidentScan), so repeating a scan returns its rows and
+      a scan after appends only extends it. Scans run in a thread pool;
+      identical scans in flight are shared.
+    - append: symbol, interval and bars (dicts with open_time and OHLCV);
+      appends the new bars to the store and to the resident dataset, whose
+      ATR is extended and saved for the new bars only. On a watched dataset
+      they are also pushed to its live detector, and the patterns they
+      complete are returned.
+    - watch: symbol, interval, optional start and detector params; replays the
+      stored bars from start into a StreamingPatternDetector kept in memory.
+    - patterns: the live patterns of a watched dataset.
+    - stats: request counters.
+    """
+
+    def __init__(self, store_root, n_workers=None, max_results=256):
+        self.store = CandleStore(store_root)
+        self.pool = ThreadPoolExecutor(max_workers=n_workers or os.cpu_count() or 1)
+        self.max_results = max_results
+        self._datasets = {}  # (symbol, interval) -> _Dataset
+        self._results = OrderedDict()  # Resident scans, least recently used first
+        self._inflight = {}
+        self._locks = {}  # Per-dataset lock serialising appends and watch replays
+        self._live = {}  # (symbol, interval) -> (StreamingPatternDetector, patterns)
+        self.stats = {'requests': 0, 'errors': 0, 'scans': 0, 'cached_scans': 0, 'appended': 0}
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=0, path=None):
+        """Starts listening on a Unix socket at path, or on host:port; returns the server."""
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._client, path=path)
+        else:
+            self._server = await asyncio.start_server(self._client, host, port)
+        return self._server
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.pool.shutdown(cancel_futures=True)
+
+    async def _client(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._respond(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def _respond(self, line, writer, write_lock):
+        self.stats['requests'] += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.pop('id', None)
+            response = {'id': request_id, 'ok': True, 'result': await self.handle(request)}
+        except Exception as e:  # Reported to the client; the server keeps running
+            self.stats['errors'] += 1
+            response = {'id': request_id, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        async with write_lock:
+            writer.write(json.dumps(response, default=str).encode() + b'\n')
+            await writer.drain()
+
+    async def handle(self, request):
+        """Runs one request ({'op': ..., ...}) and returns its result."""
+        request = dict(request)
+        op = request.pop('op', None)
+        handler = {
+            'ping': self._ping,
+            'scan': self._scan,
+            'append': self._append,
+            'watch': self._watch,
+            'patterns': self._patterns,
+            'stats': self._stats,
+        }.get(op)
+        if handler is None:
+            raise ValueError(f"Unknown op {op!r}")
+        return await handler(**request)
+
+    def _lock(self, symbol, interval):
+        return self._locks.setdefault((symbol, interval), asyncio.Lock())
+
+    async def _ping(self):
+        return 'pong'
+
+    async def _stats(self):
+        return dict(self.stats, watched=[f"{s} {i}" for s, i in self._live],
+                    resident=[f"{s} {i}" for s, i in self._datasets], memoized=len(self._results))
+
+    async def _dataset(self, symbol, interval):
+        async with self._lock(symbol, interval):
+            dataset = self._datasets.get((symbol, interval))
+            if dataset is None:
+                dataset = await asyncio.to_thread(_Dataset, self.store, symbol, interval)
+                self._datasets[(symbol, interval)] = dataset
+        return dataset
+
+    async def _scan(self, symbol, interval, start=None, end=None, params=None):
+        params = params or {}
+        dataset = await self._dataset(symbol, interval)
+        key = (symbol, interval, start, end, json.dumps(params, sort_keys=True))
+        scan = self._results.get(key)
+        if scan is None:
+            scan = self._results[key] = _ResidentScan(symbol, interval, start, end, params)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        self._results.move_to_end(key)
+        # A scan is current until the dataset gets new bars; while an update
+        # holds its lock the rows may be half rebuilt, so it is awaited instead
+        if scan.lock.acquire(blocking=False):
+            try:
+                if scan.bars == dataset.bars:
+                    self.stats['cached_scans'] += 1
+                    return list(scan.report)
+            finally:
+                scan.lock.release()
+        inflight = (key, dataset.bars)
+        if inflight not in self._inflight:
+            self.stats['scans'] += 1
+            self._inflight[inflight] = asyncio.get_running_loop().run_in_executor(self.pool, scan.update, dataset)
+        try:
+            return await asyncio.shield(self._inflight[inflight])
+        finally:
+            self._inflight.pop(inflight, None)
+
+    async def _append(self, symbol, interval, bars):
+        df = pd.DataFrame(bars)
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.pop(TIME_COLUMN)), name=TIME_COLUMN)
+        df.index = df.index.tz_localize(None) if df.index.tz is None else df.index.tz_convert(None)
+        async with self._lock(symbol, interval):
+            last = await asyncio.to_thread(self.store.last_timestamp, symbol, interval)
+            appended = await asyncio.to_thread(self.store.append, symbol, interval, df)
+            self.stats['appended'] += appended
+            new_patterns = []
+            if appended:
+                new_bars = df[df.index > last] if last is not None else df
+                dataset = self._datasets.get((symbol, interval))
+                if dataset is not None:
+                    atr = await asyncio.to_thread(dataset.extend, new_bars)
+                    await asyncio.to_thread(self.store.write_column, symbol, interval, 'ATR', atr,
+                                            start=new_bars.index[0])
+                live = self._live.get((symbol, interval))
+                if live is not None:
+                    new_patterns = await asyncio.to_thread(self._push, live, new_bars)
+        return {'appended': appended, 'patterns': new_patterns}
+
+    @staticmethod
+    def _push(live, bars):
+        """Pushes bars to a live detector; returns report rows of the patterns they complete."""
+        detector, patterns = live
+        times = bars.index
+        rows = []
+        for t, high, low, close in zip(times, bars['high'].values, bars['low'].values, bars['close'].values):
+            for pattern in detector.push({'high': high, 'low': low, 'close': close}, timestamp=t):
+                patterns.append(pattern)
+                pattern['pattern_id'] = f"{len(patterns):02d}"
+                rows.append(report_entry(pattern))
+        return rows
+
+    async def _watch(self, symbol, interval, start=None, params=None):
+        async with self._lock(symbol, interval):
+            arrays = await asyncio.to_thread(
+                self.store.load_arrays, symbol, interval, start, None, ['high', 'low', 'close'])
+            bars = pd.DataFrame({col: np.asarray(arrays[col]) for col in ('high', 'low', 'close')},
+                                index=pd.DatetimeIndex(arrays[TIME_COLUMN].astype('datetime64[ns]')))
+            live = (StreamingPatternDetector(**(params or {})), [])
+            await asyncio.to_thread(self._push, live, bars)
+            self._live[(symbol, interval)] = live
+        return {'bars': len(bars), 'patterns': len(live[1])}
+
+    async def _patterns(self, symbol, interval):
+        live = self._live.get((symbol, interval))
+        if live is None:
+            raise KeyError(f"{symbol} {interval} is not watched")
+        return [report_entry(p) for p in live[1]]
+
+
+class DetectionClient:
+    """Minimal client for DetectionService: one connection, requests matched by id."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._pending = {}
+        self._listener = asyncio.create_task(self._listen())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=None, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self._pending.pop(response['id'], None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self._pending.values():
+            future.set_exception(ConnectionError("Service closed the connection"))
+
+    async def call(self, op, **kwargs):
+        """Sends one request; returns its result or raises RuntimeError with the service's error."""
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self._writer.write(json.dumps(dict(kwargs, op=op, id=self._next_id), default=str).encode() + b'\n')
+        await self._writer.drain()
+        response = await future
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    async def close(self):
+        self._writer.close()
+        await self._listener
+
+
+async def _serve(args):
+    service = DetectionService(args.store, args.workers)
+    await service.start(args.host, args.port, args.socket)
+    print(f"Detection service listening on {args.socket or service.address}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve pattern scans over the candle store from a warm process.")
+    parser.add_argument('--store', default=os.path.join('data', 'store'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import numpy as np
+
+INDEX_FILE = 'index.json'
+
+
+def fingerprint(columns, rows=None):
+    """Content hash of the first rows values of each array (all of them by default)."""
+    h = hashlib.blake2b(digest_size=20)
+    for values in columns:
+        values = np.ascontiguousarray(values[:rows])
+        h.update(f"{values.dtype.str}{values.shape}".encode())
+        h.update(values.view(np.uint8).reshape(-1))
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """
+    Disk-backed cache of derived arrays and results, keyed by the content of
+    the input columns they were computed from and the parameters used.
+
+    Each entry is one pickle file under root, listed in index.json with its
+    kind, parameters, row count, input fingerprint, size and last use. When
+    the files exceed max_bytes, the least recently used entries are evicted.
+    Lookups with prefix=True also match an entry computed from the first rows
+    of the inputs, so callers can reuse it for appended data and compute only
+    what depends on the new bars.
+    """
+
+    def __init__(self, root, max_bytes=512 * 2 ** 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self._index = self._read_index()
+
+    def _read_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except ValueError:
+            return {}  # A corrupt index only costs a recompute
+
+    def _write_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._index, f, indent=1, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _params(params):
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, kind, params, columns, prefix=False):
+        """
+        Returns (value, rows) of the entry for these inputs, or (None, 0).
+
+        With prefix=True the entry may cover only the first rows of the
+        inputs; the longest such entry is returned.
+        """
+        n = len(columns[0])
+        params = self._params(params)
+        matches = sorted(((entry['rows'], key) for key, entry in self._index.items()
+                          if entry['kind'] == kind and entry['params'] == params
+                          and (entry['rows'] <= n if prefix else entry['rows'] == n)), reverse=True)
+        digests = {}
+        for rows, key in matches:
+            if rows not in digests:
+                digests[rows] = fingerprint(columns, rows)
+            if digests[rows] != self._index[key]['digest']:
+                continue
+            try:
+                with open(os.path.join(self.root, key), 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self._drop(key)
+                continue
+            self._index[key]['used'] = time.time()
+            self._write_index()
+            return value, rows
+        return None, 0
+
+    def put(self, kind, params, columns, value):
+        """Stores value for these inputs, replacing entries for a prefix of them; returns its key."""
+        n = len(columns[0])
+        digest = fingerprint(columns)
+        params = self._params(params)
+        key = hashlib.blake2b(f"{kind}:{params}:{digest}".encode(), digest_size=20).hexdigest() + '.pkl'
+        # An entry for the first rows of these inputs is superseded by this one
+        for old_key, entry in list(self._index.items()):
+            if (old_key != key and entry['kind'] == kind and entry['params'] == params and entry['rows'] < n
+                    and entry['digest'] == fingerprint(columns, entry['rows'])):
+                self._drop(old_key)
+        path = os.path.join(self.root, key)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        self._index[key] = {'kind': kind, 'params': params, 'rows': n, 'digest': digest,
+                            'bytes': os.path.getsize(path), 'used': time.time()}
+        self._evict(keep=key)
+        self._write_index()
+        return key
+
+    def _drop(self, key):
+        self._index.pop(key, None)
+        try:
+            os.remove(os.path.join(self.root, key))
+        except OSError:
+            pass
+
+    def _evict(self, keep=None):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        total = sum(entry['bytes'] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._index[key]['bytes']
+            self._drop(key)
+
+    def size(self):
+        """Total bytes of the cached entries."""
+        return sum(entry['bytes'] for entry in self._index.values())
+
+    def clear(self):
+        for key in list(self._index):
+            self._drop(key)
+        self._write_index()
@@ -47,67 +47,226 @@
 #         df.to_csv(file_path)
 #         print(f"Raw data saved to {file_path}")
 
-import pandas as pd
-from binance.client import Client
 import os
-from datetime import datetime, timedelta
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from candle_store import CandleStore
 
 API_KEY = os.getenv('BINANCE_API_KEY', 'your_api_key')
 API_SECRET = os.getenv('BINANCE_API_SECRET', 'your_api_secret')
 
-client = Client(API_KEY, API_SECRET)
+# Binance serves at most 1500 futures klines per request
+MAX_KLINES_PER_REQUEST = 1500
 
-def fetch_binance_futures_klines(symbol, interval, start_str, end_str=None):
-    """
-    Fetches historical klines (OHLCV) data from Binance Futures with pagination.
-    """
-    print(f"Fetching {symbol} {interval} data from {start_str} to {end_str or 'now'}...")
-    klines = []
-    start_time = datetime.strptime(start_str, '%Y-%m-%d')
-    end_time = datetime.strptime(end_str, '%Y-%m-%d') if end_str else datetime.now()
-
-    while start_time < end_time:
-        chunk_end_time = min(start_time + timedelta(minutes=500), end_time)
-        try:
-            chunk_klines = client.futures_historical_klines(
-                symbol=symbol,
-                interval=interval,
-                start_str=start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                end_str=chunk_end_time.strftime('%Y-%m-%d %H:%M:%S')
-            )
-            klines.extend(chunk_klines)
-            print(f"Fetched {len(chunk_klines)} candles up to {chunk_end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            start_time = chunk_end_time
-        except Exception as e:
-            print(f"Error fetching data: {e}")
-            break
-
-    if not klines:
-        print("No data fetched.")
-        return None
-
-    df = pd.DataFrame(klines, columns=[
-        'open_time', 'open', 'high', 'low', 'close', 'volume',
-        'close_time', 'quote_asset_volume', 'number_of_trades',
-        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-    ])
-    df['open_time'] = pd.to_datetime(df['open_time'], unit='ms')
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000,
+}
+
+KLINE_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_asset_volume', 'number_of_trades',
+    'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
+]
+
+# HTTP statuses Binance uses for request-weight limits (418 = IP banned for a while)
+RATE_LIMIT_STATUSES = (418, 429)
+
+
+def klines_to_frame(klines):
+    """Converts raw kline rows to an OHLCV DataFrame indexed by open_time."""
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+    df['open_time'] = pd.to_datetime(df['open_time'].astype('int64'), unit='ms')
     df[['open', 'high', 'low', 'close', 'volume']] = df[['open', 'high', 'low', 'close', 'volume']].astype(float)
     df = df[['open_time', 'open', 'high', 'low', 'close', 'volume']]
     df.set_index('open_time', inplace=True)
-    print(f"Total fetched {len(df)} candles.")
     return df
 
+
+def _status_code(error):
+    """HTTP status of a client error (python-binance or requests style), or None."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+
+def is_retryable(error):
+    """
+    True for errors worth retrying: rate limits, server errors (5xx) and
+    network failures or timeouts (OSError, which requests' connection and
+    timeout errors derive from). Other HTTP errors (e.g. 400 for an unknown
+    symbol) and everything else, such as parse errors, are not.
+    """
+    status = _status_code(error)
+    if status is not None:
+        return status in RATE_LIMIT_STATUSES or 500 <= status < 600
+    return isinstance(error, (OSError, TimeoutError))
+
+
+def _to_ms(value):
+    return pd.Timestamp(value).value // 1_000_000
+
+
+class KlineFetcher:
+    """
+    Downloads futures klines into a CandleStore with bounded concurrency.
+
+    The range is split into pages of page_size bars, one request each. Up to
+    max_workers pages are in flight; finished pages are appended to the store
+    strictly in order as soon as their predecessors are written, so memory holds
+    only the pages in flight. The store's last bar is the resume point, and a
+    checkpoint file records the requested range so an interrupted download can
+    be resumed with resume(). Rate-limit responses pause all workers for the
+    server's Retry-After (or an exponential backoff) before retrying. Network
+    and server errors are retried with backoff; any other error (see
+    is_retryable) is raised at once.
+
+    client is anything with a python-binance style futures_klines(**params).
+    """
+
+    def __init__(self, client, store, symbol, interval,
+                 max_workers=4,
+                 page_size=MAX_KLINES_PER_REQUEST,
+                 max_retries=5,
+                 backoff=1.0,
+                 sleep=time.sleep):
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Unsupported interval {interval!r}")
+        self.client = client
+        self.store = store
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.max_workers = max_workers
+        self.page_size = min(page_size, MAX_KLINES_PER_REQUEST)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.store.root, self.symbol, self.interval, 'fetch_checkpoint.json')
+
+    def _write_checkpoint(self, start_ms, end_ms):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        with open(self.checkpoint_path + '.tmp', 'w') as f:
+            json.dump({'start_ms': start_ms, 'end_ms': end_ms}, f)
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+
+    def _wait_for_rate_limit(self):
+        with self._lock:
+            delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            self.sleep(delay)
+
+    def _fetch_page(self, start_ms, end_ms):
+        """Fetches one page, retrying with backoff; returns raw kline rows."""
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+            try:
+                return self.client.futures_klines(
+                    symbol=self.symbol,
+                    interval=self.interval,
+                    startTime=start_ms,
+                    endTime=end_ms,
+                    limit=self.page_size
+                )
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff * 2 ** attempt
+                if _status_code(e) in RATE_LIMIT_STATUSES:
+                    headers = getattr(getattr(e, 'response', None), 'headers', None) or {}
+                    delay = max(delay, float(headers.get('Retry-After', 0)))
+                    # Back off every worker, not just the one that hit the limit
+                    with self._lock:
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    print(f"Rate limited, pausing {delay:.1f}s")
+                else:
+                    print(f"Error fetching page at {pd.Timestamp(start_ms, unit='ms')}: {e}; retrying in {delay:.1f}s")
+                    self.sleep(delay)
+
+    def fetch(self, start, end=None):
+        """
+        Fetches [start, end) (end defaults to now), skipping bars already stored.
+
+        Returns the number of new bars appended.
+        """
+        start_ms = _to_ms(start)
+        end_ms = _to_ms(end) if end is not None else int(time.time() * 1000)
+        last = self.store.last_timestamp(self.symbol, self.interval)
+        if last is not None:
+            start_ms = max(start_ms, last.value // 1_000_000 + self.interval_ms)
+        if start_ms >= end_ms:
+            print(f"{self.symbol} {self.interval} is up to date.")
+            return 0
+
+        self._write_checkpoint(start_ms, end_ms)
+        page_ms = self.page_size * self.interval_ms
+        pages = [(s, min(s + page_ms, end_ms) - 1) for s in range(start_ms, end_ms, page_ms)]
+        print(f"Fetching {self.symbol} {self.interval} from {pd.Timestamp(start_ms, unit='ms')} "
+              f"to {pd.Timestamp(end_ms, unit='ms')} in {len(pages)} pages...")
+
+        appended = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight = {}
+            next_submit = 0
+            try:
+                for p in range(len(pages)):
+                    # Keep a bounded window of pages in flight ahead of the writer
+                    while next_submit < len(pages) and next_submit < p + self.max_workers:
+                        in_flight[next_submit] = pool.submit(self._fetch_page, *pages[next_submit])
+                        next_submit += 1
+                    klines = in_flight.pop(p).result()
+                    if klines:
+                        df = klines_to_frame(klines)
+                        appended += self.store.append(self.symbol, self.interval, df[df.index < pd.Timestamp(end_ms, unit='ms')])
+                    print(f"Stored page {p + 1}/{len(pages)} ({len(klines)} candles)")
+            except BaseException:
+                for future in in_flight.values():
+                    future.cancel()
+                raise
+
+        os.remove(self.checkpoint_path)
+        print(f"Total fetched {appended} candles.")
+        return appended
+
+    def resume(self):
+        """Continues an interrupted fetch from its checkpoint; returns bars appended."""
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        return self.fetch(pd.Timestamp(checkpoint['start_ms'], unit='ms'), pd.Timestamp(checkpoint['end_ms'], unit='ms'))
+
+    def fetch_missing(self, end=None, default_start=None):
+        """Fetches only the bars after the last stored one (from default_start if empty)."""
+        last = self.store.last_timestamp(self.symbol, self.interval)
+        if last is None:
+            if default_start is None:
+                raise ValueError(f"No stored {self.symbol} {self.interval} data; pass default_start")
+            return self.fetch(default_start, end)
+        return self.fetch(last + pd.Timedelta(milliseconds=self.interval_ms), end)
+
+
 if __name__ == "__main__":
+    from binance.client import Client
+
     symbol = 'BTCUSDT'
     interval = '1m'
     start_date = '2024-01-01'
     end_date = '2024-01-30'
     data_dir = 'data'
-    os.makedirs(data_dir, exist_ok=True)
-    file_path = os.path.join(data_dir, 'raw_data.csv')
-    df = fetch_binance_futures_klines(symbol, interval, start_date, end_date)
-    if df is not None:
-        df.to_csv(file_path)
-        print(f"Raw data saved to {file_path}")
-
+    store = CandleStore(os.path.join(data_dir, 'store'))
+    fetcher = KlineFetcher(Client(API_KEY, API_SECRET), store, symbol, interval)
+    # Finish an interrupted download first, then top up anything missing
+    fetcher.resume()
+    appended = fetcher.fetch(start_date, end_date)
+    print(f"Appended {appended} new candles to {store.root}")
@@ -0,0 +1,97 @@
+import json
+import time
+
+# Detection stages in the order a cup candidate goes through them, with the
+# reason recorded when a candidate is rejected there
+STAGES = [
+    ('fit', "Cup R² below threshold"),
+    ('skip_day', "Cup starts on a day that already has a pattern"),
+    ('rim', "Cup rims differ by more than 10%"),
+    ('depth', "Cup shallower than 2 average candles"),
+    ('cup_volume', "Volume does not decline into the cup bottom"),
+    ('handle_high', "Handle rises above the cup rim"),
+    ('retrace', "Handle retraces more than 40% of cup depth"),
+    ('handle_low', "Handle drops below the cup bottom"),
+    ('handle_volume', "Handle volume above the cup's right side"),
+    ('breakout', "No breakout above handle high + 1.5 ATR within 10 candles"),
+    ('breakout_close', "Breakout candle closes below the handle high"),
+    ('breakout_volume', "Breakout volume below the surge over the cup average"),
+]
+STAGE_NAMES = [name for name, _ in STAGES]
+STAGE_RANK = {name: rank for rank, name in enumerate(STAGE_NAMES)}
+REJECT_REASONS = dict(STAGES)
+# Handle checks run once per handle end k; the stages before them once per cup
+HANDLE_STAGES = STAGE_NAMES[STAGE_NAMES.index('handle_high'):]
+
+
+class ScanFunnel:
+    """
+    Counters and timings of one detection run, attached to a detector with
+    PatternDetector(..., instrument=True).
+
+    Cup candidates enter at 'fit' and handle candidates (one per handle end
+    tried) at 'handle_high'; each stage counts the candidates it rejects, so
+    the number reaching a stage is what the previous stage passed on. With
+    record_near_misses, every scanned cup end that yields no pattern leaves
+    one record: the cup that got furthest through the stages, with the
+    reason it was rejected.
+    """
+
+    def __init__(self, record_near_misses=False):
+        self.record_near_misses = record_near_misses
+        self.cups = 0
+        self.handles = 0
+        self.rejected = dict.fromkeys(STAGE_NAMES, 0)
+        self.seconds = {'fit': 0.0, 'handle_search': 0.0, 'breakout': 0.0, 'total': 0.0}
+        self.cup_ends = 0
+        self.fits = 0
+        self.patterns = 0
+        self.near_misses = []
+        # (j, R²) of the cup whose handles are being searched, and the
+        # furthest rejection seen at the current cup end
+        self.cup = None
+        self.best = None
+
+    @staticmethod
+    def clock():
+        return time.perf_counter()
+
+    def reject(self, stage, j=None, k=None, r_squared=None):
+        """Counts a rejection; handle stages (k given) belong to the cup in self.cup."""
+        self.rejected[stage] += 1
+        rank = STAGE_RANK[stage]
+        # Cups from an excluded day are not near-misses
+        if self.record_near_misses and stage != 'skip_day' and (self.best is None or rank > self.best[0]):
+            if k is not None:
+                j, r_squared = self.cup
+            self.best = (rank, stage, j, k, r_squared)
+
+    def stages(self):
+        """Returns one row per stage with the candidates reaching, rejected at and passing it."""
+        rows = []
+        reached = self.cups
+        for name, reason in STAGES:
+            if name == HANDLE_STAGES[0]:
+                reached = self.handles
+            rejected = self.rejected[name]
+            rows.append({'stage': name, 'reason': reason, 'reached': reached,
+                         'rejected': rejected, 'passed': reached - rejected})
+            reached -= rejected
+        return rows
+
+    def summary(self):
+        """Structured summary of the run (JSON-serialisable)."""
+        return {
+            'cup_ends_scanned': self.cup_ends,
+            'cups_evaluated': self.cups,
+            'handles_evaluated': self.handles,
+            'parabola_fits': self.fits,
+            'patterns': self.patterns,
+            'near_misses': len(self.near_misses),
+            'seconds': dict(self.seconds),
+            'stages': self.stages(),
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
@@ -1,90 +1,173 @@
-import pandas as pd
 import os
-from pattern_detector import PatternDetector
-from plot_utils import plot_pattern
-import numpy as np
-import talib
-
-def preprocess_data(df):
-    """
-    Adds necessary indicators to the DataFrame.
-    """
-    df['avg_candle_size'] = (df['high'] - df['low']).mean()
-    df['ATR'] = talib.ATR(df['high'], df['low'], df['close'], timeperiod=14)
-    return df
-
-def main():
-    data_dir = 'data'
-    raw_data_path = os.path.join(data_dir, 'raw_data.csv')
-    preprocessed_data_path = os.path.join(data_dir, 'preprocessed_data.csv')
-    patterns_dir = 'patterns'
-    report_file = 'report.csv'
-
-    # Load data
-    if not os.path.exists(raw_data_path):
-        print(f"Error: {raw_data_path} not found. Please run fetch_data.py first.")
-        return
+import json
+import argparse
+from preprocessing import DETECTOR_OPTIONS, preprocess_data
+
+# Heavy dependencies (NumPy and pandas, talib, Numba, plotly) are imported by
+# the stage that needs them, so `--help`, `--no-plots` and cached runs skip them
 
-    df = pd.read_csv(raw_data_path, index_col='open_time', parse_dates=True)
-    print(f"Loaded {len(df)} records from {raw_data_path}")
+def main(instrument=False, record_near_misses=False, use_cache=True, exhaustive=False, rank_by='r_squared',
+         max_patterns=30, symbol='BTCUSDT', interval='1m', start=None, end=None,
+         store_dir=os.path.join('data', 'store'), raw_data_path=os.path.join('data', 'raw_data.csv'),
+         cache_dir=os.path.join('data', 'cache'), report_file='report.csv', report_format='csv',
+         patterns_dir='patterns', plots=True, gallery_file=None, pattern_db=os.path.join('data', 'patterns.db'),
+         one_pattern_per_day=True,
+         volume_confirmation=False, horizons=(5, 15, 60, 240), target_multiple=1.0, **detector_params):
+    import numpy as np
+    from candle_store import CandleStore, OHLCV_COLUMNS
+    store = CandleStore(store_dir)
 
-    # Preprocess data
-    df = preprocess_data(df)
-    df.to_csv(preprocessed_data_path)
-    print(f"Preprocessed data saved to {preprocessed_data_path}")
+    # Load data, importing the legacy CSV into the candle store on first use
+    if not store.partitions(symbol, interval):
+        if not os.path.exists(raw_data_path):
+            print(f"Error: no {symbol} {interval} data in {store.root} and {raw_data_path} not found. Please run fetch_data.py first.")
+            return
+        imported = store.import_csv(raw_data_path, symbol, interval)
+        print(f"Imported {imported} records from {raw_data_path} into {store.root}")
+
+    df = store.load(symbol, interval, start, end, columns=OHLCV_COLUMNS)
+    print(f"Loaded {len(df)} records from {store.root}")
+    if df.empty:
+        print("Error: no bars in the requested range.")
+        return
 
-    # Initialize pattern detector
-    detector = PatternDetector(df)
+    # ATR of the whole series, so a range scans as it would within a full scan
+    _, atr = preprocess_data(store, symbol, interval, start, end)
 
-    # Detect patterns
+    # Initialize pattern detector with the ATR computed above; cup fits and
+    # patterns of earlier runs are reused from the cache
+    from pattern_detector import PatternDetector, patterns_from_records
+    cache = None
+    if use_cache:
+        from feature_cache import FeatureCache
+        cache = FeatureCache(cache_dir)
+    detector = PatternDetector(df, atr=atr, instrument=instrument,
+                               record_near_misses=record_near_misses, cache=cache,
+                               exhaustive=exhaustive, rank_by=rank_by,
+                               one_pattern_per_day=one_pattern_per_day, volume_confirmation=volume_confirmation,
+                               **detector_params)
+
+    # Detect patterns; records stay compact until the reported ones become dicts
     print("Starting pattern detection...")
-    detected_patterns = detector.detect_patterns()
-    print(f"Detected {len(detected_patterns)} potential patterns.")
-
-    # Filter for valid patterns and generate report
-    valid_patterns = []
-    report_data = []
-
-    pattern_count = 0
-    for i, pattern in enumerate(detected_patterns):
-        # The detection logic within PatternDetector.detect_patterns already incorporates
-        # most validation and invalidation rules directly.
-        # We just need to add a 'pattern_id' for reporting and plotting.
-        
-        # Ensure we only process and save up to 30 valid patterns
-        if pattern_count >= 30:
-            break
-
-        pattern_id = f"{pattern_count + 1:02d}"
-        pattern['pattern_id'] = pattern_id
-        valid_patterns.append(pattern)
-
-        # Plot and save image
-        print(f"Plotting and saving pattern {pattern_id}...")
-        plot_pattern(df, pattern, pattern_id, output_dir=patterns_dir, interactive=False)
-        pattern_count += 1
-
-        # Prepare report entry
-        report_entry = {
-            'pattern_id': pattern['pattern_id'],
-            'start_time': pattern['start_time'],
-            'end_time': pattern['end_time'],
-            'cup_depth': pattern['cup_depth'],
-            'cup_duration': pattern['cup_duration'],
-            'handle_depth': pattern['handle_depth'],
-            'handle_duration': pattern['handle_duration'],
-            'r_squared_cup': pattern['r_squared_cup'],
-            'breakout_candle_timestamp': pattern['breakout_candle_timestamp'],
-            'status': pattern['status'],
-            'reason': pattern['reason']
-        }
-        report_data.append(report_entry)
+    records = detector.detect_records()
+    near_misses = detector.funnel.near_misses if record_near_misses else []
+    print(f"Detected {len(records)} potential patterns.")
+
+    # The detection logic within PatternDetector.detect_records already incorporates
+    # most validation and invalidation rules directly. We only save up to max_patterns
+    # valid patterns and add a 'pattern_id' for reporting and plotting.
+    valid_patterns = patterns_from_records(records[:max_patterns], detector.tz)
+    for n, pattern in enumerate(valid_patterns, start=1):
+        pattern['pattern_id'] = f"{n:02d}"
+    pattern_count = len(valid_patterns)
+
+    # Plot and save images; charts unchanged since the last run are skipped
+    if plots:
+        from plot_utils import render_patterns
+        print(f"Plotting and saving {pattern_count} patterns...")
+        render_patterns(df, valid_patterns, output_dir=patterns_dir)
+
+    # Post-breakout outcomes of all reported patterns in one batched pass
+    outcomes = None
+    if horizons:
+        from outcome_evaluator import evaluate_outcomes
+        outcomes = evaluate_outcomes(records[:max_patterns], detector.high, detector.low, detector.close,
+                                     horizons=horizons, target_multiple=target_multiple)
 
     # Generate validation summary report
-    report_df = pd.DataFrame(report_data)
-    report_df.to_csv(report_file, index=False)
+    from reporting import build_report, build_near_miss_report
+    report_df = build_report(valid_patterns, outcomes)
+    if report_format == 'json':
+        # Same values as the CSV: full float precision, times as written there
+        with open(report_file, 'w') as f:
+            rows = report_df.astype(object).where(report_df.notna(), None).to_dict(orient='records')  # NaN/NA -> null
+            json.dump(rows, f, indent=1, default=str)
+    else:
+        report_df.to_csv(report_file, index=False)
     print(f"Validation summary report saved to {report_file}")
+    if gallery_file:
+        from report_gallery import build_gallery
+        build_gallery(report_df, df, gallery_file, title=f"Cup and Handle patterns: {symbol} {interval}")
+        print(f"Interactive gallery saved to {gallery_file}")
     print(f"Successfully identified and saved {pattern_count} valid patterns.")
 
+    # Every detected pattern, not only the reported ones, accumulates in the
+    # pattern database; patterns found by earlier runs are updated in place
+    if pattern_db:
+        from pattern_store import PatternStore
+        unreported = patterns_from_records(records[max_patterns:], detector.tz)
+        for n, pattern in enumerate(unreported, start=pattern_count + 1):
+            pattern['pattern_id'] = f"{n:02d}"
+        with PatternStore(pattern_db) as db:
+            db.upsert(build_report(valid_patterns + unreported), symbol, interval)
+            print(f"{len(records)} patterns stored in {pattern_db} ({len(db)} in total)")
+
+    # Detection funnel summary (and near-misses) alongside the report
+    if detector.funnel is not None:
+        report_base = os.path.splitext(report_file)[0]
+        detector.funnel.save(f"{report_base}_funnel.json")
+        print(f"Detection funnel summary saved to {report_base}_funnel.json")
+        if record_near_misses:
+            build_near_miss_report(near_misses).to_csv(f"{report_base}_near_misses.csv", index=False)
+            print(f"{len(near_misses)} near-misses saved to {report_base}_near_misses.csv")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Detect cup and handle patterns in the stored candles.")
+    data = parser.add_argument_group('data')
+    data.add_argument('--symbol', default='BTCUSDT')
+    data.add_argument('--interval', default='1m')
+    data.add_argument('--start', default=None, help="First bar time to scan, e.g. 2024-03-01")
+    data.add_argument('--end', default=None, help="Scan bars before this time")
+    data.add_argument('--store', default=os.path.join('data', 'store'), help="Candle store directory")
+    data.add_argument('--raw-data', default=os.path.join('data', 'raw_data.csv'),
+                      help="CSV imported into an empty store")
+    data.add_argument('--cache-dir', default=os.path.join('data', 'cache'))
+    data.add_argument('--no-cache', action='store_true',
+                      help="Recompute everything instead of reusing the cache from earlier runs")
+
+    output = parser.add_argument_group('output')
+    output.add_argument('--report', default=None, help="Report path (default report.csv or report.json)")
+    output.add_argument('--format', choices=['csv', 'json'], default='csv', help="Report format")
+    output.add_argument('--patterns-dir', default='patterns', help="Directory of the pattern charts")
+    output.add_argument('--no-plots', action='store_true', help="Write the report only; skips plotly and kaleido")
+    output.add_argument('--gallery', default=None,
+                        help="Also write a single-file interactive HTML gallery of the reported patterns")
+    output.add_argument('--pattern-db', default=os.path.join('data', 'patterns.db'),
+                        help="SQLite database accumulating the detected patterns of every run (see pattern_store.py)")
+    output.add_argument('--no-pattern-db', action='store_true', help="Do not store the patterns in the database")
+    output.add_argument('--max-patterns', type=int, default=30, help="Patterns to report and plot")
+    output.add_argument('--instrument', action='store_true',
+                        help="Count candidates and time each detection stage; writes report_funnel.json")
+    output.add_argument('--horizons', default='5,15,60,240',
+                        help="Comma-separated forward return horizons in bars after the breakout; '' skips outcomes")
+    output.add_argument('--target-multiple', type=float, default=1.0,
+                        help="Outcome target above the breakout close, in cup depths (the stop is the handle low)")
+    output.add_argument('--near-misses', action='store_true',
+                        help="Also record rejected near-misses with their reason; writes report_near_misses.csv")
+
+    detector = parser.add_argument_group('detector')
+    for name, default in DETECTOR_OPTIONS.items():
+        detector.add_argument('--' + name.replace('_', '-'), type=type(default), default=default)
+    detector.add_argument('--all-per-day', action='store_true',
+                          help="Allow several patterns whose cups start on the same day")
+    detector.add_argument('--volume-confirmation', action='store_true',
+                          help="Require volume to decline into the cup bottom, stay quiet in the handle and surge "
+                               "on the breakout (the --*-volume-ratio options)")
+    detector.add_argument('--exhaustive', action='store_true',
+                          help="Report every valid cup, keeping the best-ranked of overlapping ones")
+    detector.add_argument('--rank-by', choices=['r_squared', 'depth'], default='r_squared',
+                          help="Score that decides between overlapping patterns with --exhaustive")
+    return parser
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = build_parser().parse_args()
+    main(instrument=args.instrument, record_near_misses=args.near_misses, use_cache=not args.no_cache,
+         exhaustive=args.exhaustive, rank_by=args.rank_by, max_patterns=args.max_patterns,
+         symbol=args.symbol, interval=args.interval, start=args.start, end=args.end,
+         store_dir=args.store, raw_data_path=args.raw_data, cache_dir=args.cache_dir,
+         report_file=args.report or f"report.{args.format}", report_format=args.format,
+         patterns_dir=args.patterns_dir, plots=not args.no_plots, gallery_file=args.gallery,
+         pattern_db=None if args.no_pattern_db else args.pattern_db, one_pattern_per_day=not args.all_per_day,
+         volume_confirmation=args.volume_confirmation,
+         horizons=[int(h) for h in args.horizons.split(',') if h], target_multiple=args.target_multiple,
+         **{name: getattr(args, name) for name in DETECTOR_OPTIONS})
@@ -0,0 +1,251 @@
+import os
+import math
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import talib
+from candle_store import CandleStore, OHLCV_COLUMNS
+from pattern_detector import PatternDetector
+from reporting import REPORT_COLUMNS, report_entry
+
+# Bar length in minutes of every interval the pyramid can build
+INTERVAL_MINUTES = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60, '4h': 240}
+
+def _aggregate(data, minutes):
+    """Aggregates bars into buckets of `minutes` aligned to UTC midnight."""
+    times = data.index.as_unit('ns').asi8
+    buckets = times // (minutes * 60 * 10 ** 9)
+    starts = np.r_[0, np.flatnonzero(np.diff(buckets)) + 1]
+    ends = np.r_[starts[1:], len(times)] - 1
+    columns = {
+        'open': data['open'].values[starts],
+        'high': np.maximum.reduceat(data['high'].values, starts),
+        'low': np.minimum.reduceat(data['low'].values, starts),
+        'close': data['close'].values[ends],
+    }
+    if 'volume' in data:
+        columns['volume'] = np.add.reduceat(data['volume'].values, starts)
+    if 'ATR' in data:
+        columns['ATR'] = data['ATR'].values[ends]  # Base-interval ATR at the bucket's last bar
+    index = pd.DatetimeIndex(buckets[starts] * (minutes * 60 * 10 ** 9), tz='UTC')
+    if data.index.tz is None:
+        index = index.tz_localize(None)
+    else:
+        index = index.tz_convert(data.index.tz)
+    frame = pd.DataFrame(columns, index=index.as_unit(data.index.unit))
+    frame.index.name = data.index.name
+    # First and last base bar of every bucket
+    frame['first_bar'] = starts
+    frame['last_bar'] = ends
+    return frame
+
+
+def resample_pyramid(data, intervals=('5m', '15m', '1h'), base='1m'):
+    """
+    Returns {interval: frame} for the base frame and each coarser interval.
+
+    Every level is aggregated from the finest level it is a multiple of, so
+    the base bars are read once and each further level costs only the bars
+    of the one below. Coarse frames carry 'first_bar'/'last_bar', the range
+    of base bars each coarse bar covers, and the base ATR at their last bar.
+    """
+    base_minutes = INTERVAL_MINUTES[base]
+    if 'ATR' not in data:
+        # A new frame sharing the base columns (copy-on-write), not a copy of them
+        data = data.assign(ATR=talib.ATR(data['high'], data['low'], data['close'], timeperiod=14))
+    pyramid = {base: data}
+    levels = [(base_minutes, base)]
+    for interval in sorted(intervals, key=INTERVAL_MINUTES.get):
+        minutes = INTERVAL_MINUTES[interval]
+        if minutes % base_minutes:
+            raise ValueError(f"{interval} is not a multiple of {base}")
+        src_minutes, src = max((m, label) for m, label in levels if minutes % m == 0)
+        frame = _aggregate(pyramid[src], minutes)
+        if src != base:
+            # Map bucket bounds from the source level down to base bars
+            frame['first_bar'] = pyramid[src]['first_bar'].values[frame['first_bar'].values]
+            frame['last_bar'] = pyramid[src]['last_bar'].values[frame['last_bar'].values]
+        pyramid[interval] = frame
+        levels.append((minutes, interval))
+    return pyramid
+
+
+def _detector_params(params):
+    defaults = {'min_cup_duration': 30, 'max_cup_duration': 300,
+                'min_handle_duration': 5, 'max_handle_duration': 50, 'min_r2': 0.85}
+    return dict(defaults, **params)
+
+
+def _plausible_cup_ends(detector, min_r2, block_size=1024):
+    """
+    Flags the bars ending at least one cup whose rims and depth pass the
+    scan's checks and whose R² reaches min_r2; handles are not looked at.
+    Cup ends are vetted a block at a time, every cup of a block at once.
+    """
+    high, close = detector.high, detector.close
+    n = len(close)
+    min_cup, max_cup = detector.min_cup_duration, detector.max_cup_duration
+    spans = np.arange(min_cup, max_cup + 1)
+    # Padded so row r of a window view holds bars i - max_cup .. i; cups reaching before bar 0 get no R²
+    padded_high = np.concatenate([np.full(max_cup, np.nan), high])
+    padded_close = np.concatenate([np.full(max_cup, np.inf), close])
+    flags = np.zeros(n, dtype=bool)
+    for start in range(min_cup, n, block_size):
+        stop = min(start + block_size, n)
+        # Column c is the cup [i - spans[c], i], shortest to longest as in PatternDetector._handle_grid
+        highs = np.lib.stride_tricks.sliding_window_view(padded_high[start:stop + max_cup], max_cup + 1)[:, ::-1]
+        closes = np.lib.stride_tricks.sliding_window_view(padded_close[start:stop + max_cup], max_cup + 1)[:, ::-1]
+        left_rim_price = highs[:, spans]
+        cup_bottom_price = np.minimum.accumulate(closes, axis=1)[:, spans]
+        right_rim_price = high[start:stop, None]
+        rim_price = np.where(right_rim_price > left_rim_price, right_rim_price, left_rim_price)
+        cup_ok = ~(np.abs(left_rim_price - right_rim_price) / ((left_rim_price + right_rim_price) / 2) > 0.10)
+        cup_ok &= ~(rim_price - cup_bottom_price < 2 * detector.avg_candle_size)
+        flags[start:stop] = (cup_ok & (detector.fit_engine.r_squared_block(start, stop) >= min_r2)).any(axis=1)
+    return flags
+
+
+def _breakout_possible(high, close, atr, min_handle_duration, max_handle_duration, bars=None):
+    """
+    Flags the bars i (all, or those in bars) followed, within the handle and
+    breakout window, by a close above high[i] + 1.5 * ATR. Every handle of a
+    cup ending at i holds bar i, so its breakout must clear that too (the
+    scan's own first check).
+    """
+    n = len(close)
+    bars = np.arange(n) if bars is None else bars
+    level = high[bars]
+    flags = np.zeros(len(bars), dtype=bool)
+    for d in range(min_handle_duration + 1, max_handle_duration + 11):
+        later = np.minimum(bars + d, n - 1)
+        flags |= (bars + d < n) & (close[later] > level + 1.5 * atr[later])
+    return flags
+
+
+def candidate_regions(pyramid, interval, base='1m', r2_slack=0.1, **params):
+    """
+    Returns merged [start, stop) ranges of base cup end bars worth refining.
+
+    A base bar is kept when the coarse bar holding it ends a plausible cup
+    (see _plausible_cup_ends: durations scaled down to coarse bars, the base
+    candle size, R² threshold lowered by r2_slack) and a breakout can follow
+    it at base resolution (see _breakout_possible). The coarse bars only vet
+    cup shapes: a coarse bar can hold both the handle end and the breakout of
+    a base pattern, and its close is only the last of its bucket, so coarse
+    handle and breakout checks drop patterns the full scan reports. The
+    breakout test is exact; a base cup is only missed when its R² on coarse
+    closes falls more than r2_slack below the threshold.
+    """
+    params = _detector_params(params)
+    factor = INTERVAL_MINUTES[interval] // INTERVAL_MINUTES[base]
+    coarse = pyramid[interval]
+    fine = pyramid[base]
+    detector = PatternDetector(coarse[['open', 'high', 'low', 'close']], atr=coarse['ATR'].values,
+                               avg_candle_size=(fine['high'] - fine['low']).mean(),
+                               min_cup_duration=max(3, params['min_cup_duration'] // factor),
+                               max_cup_duration=max(4, math.ceil(params['max_cup_duration'] / factor) + 1))
+    # Base bars of the plausible coarse bars; only those are tested for a breakout
+    plausible = np.flatnonzero(_plausible_cup_ends(detector, params['min_r2'] - r2_slack))
+    first, last = coarse['first_bar'].values[plausible], coarse['last_bar'].values[plausible]
+    bars = np.repeat(first - np.cumsum(np.r_[0, (last - first + 1)[:-1]]), last - first + 1)
+    bars += np.arange(len(bars))
+    keep = np.zeros(len(fine), dtype=bool)
+    keep[bars] = _breakout_possible(fine['high'].to_numpy(dtype=np.float64), fine['close'].to_numpy(dtype=np.float64),
+                                    fine['ATR'].to_numpy(dtype=np.float64),
+                                    params['min_handle_duration'], params['max_handle_duration'], bars)
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], keep, [False]])))
+    return [(int(start), int(stop)) for start, stop in zip(edges[::2], edges[1::2])]
+
+
+def refine_regions(detector, regions):
+    """
+    Runs the detector's scan over the cup end bars in regions only.
+
+    The skip-ahead and one-pattern-per-day rules carry over from one region
+    to the next as in a full scan, so the result is what the full scan would
+    report if no cup ended outside the regions.
+    """
+    patterns = []
+    last_detected_day = None
+    i = 0
+    for start, stop in regions:
+        i = max(i, start)
+        stop = min(stop, len(detector.close) - detector.max_handle_duration - 11)
+        while i < stop:
+            skip_days = (last_detected_day,) if detector.one_pattern_per_day else ()
+            candidate = next(detector._cup_candidates(i, skip_days), None)
+            if candidate is None:
+                i += 1
+                continue
+            j, k, breakout_idx, r_squared = candidate
+            patterns.append(detector._make_pattern(j, i, k, breakout_idx, r_squared))
+            last_detected_day = detector.day_ids[j]
+            i = detector._resume_index(k, breakout_idx)
+    return patterns
+
+
+def detect_multi_timeframe(data, intervals=('5m', '15m', '1h'), base='1m', refine_from='5m', **params):
+    """
+    Detects patterns across a timeframe pyramid built from base bars.
+
+    Returns (patterns, stats). Native patterns are found by scanning every
+    coarse interval in intervals with the usual parameters in coarse bars;
+    base patterns are found by refining, at full resolution, only the regions
+    flagged by a cheap scan of refine_from (see candidate_regions). Each
+    pattern carries 'timeframe' and 'source' ('native' or 'refined'); bar
+    indices refer to the frame of its own timeframe.
+    """
+    t0 = time.perf_counter()
+    pyramid = resample_pyramid(data, set(intervals) | {refine_from}, base)
+    stats = {'resample_seconds': time.perf_counter() - t0}
+
+    patterns = []
+    for interval in intervals:
+        coarse = pyramid[interval][['open', 'high', 'low', 'close']]
+        found = PatternDetector(coarse, **params).detect_patterns() if len(coarse) else []
+        for pattern in found:
+            pattern.update(timeframe=interval, source='native')
+        patterns.extend(found)
+        stats[f'{interval}_bars'] = len(coarse)
+
+    t0 = time.perf_counter()
+    regions = candidate_regions(pyramid, refine_from, base, **params)
+    fine = pyramid[base]
+    # Building the detector is a few vectorised passes; only the regions are scanned
+    detector = PatternDetector(fine[['open', 'high', 'low', 'close']], atr=fine['ATR'].values, **params)
+    refined = refine_regions(detector, regions)
+    for pattern in refined:
+        pattern.update(timeframe=base, source='refined')
+    patterns.extend(refined)
+    stats.update(regions=len(regions), refined_bars=sum(stop - start for start, stop in regions),
+                 base_bars=len(fine), refine_seconds=time.perf_counter() - t0)
+    return patterns, stats
+
+
+def build_timeframe_report(patterns):
+    """Report rows tagged with each pattern's timeframe, numbered per timeframe."""
+    rows = []
+    counts = {}
+    for pattern in sorted(patterns, key=lambda p: (INTERVAL_MINUTES[p['timeframe']], p['start_time'])):
+        counts[pattern['timeframe']] = counts.get(pattern['timeframe'], 0) + 1
+        pattern['pattern_id'] = f"{pattern['timeframe']}-{counts[pattern['timeframe']]:02d}"
+        rows.append(dict(timeframe=pattern['timeframe'], source=pattern['source'], **report_entry(pattern)))
+    return pd.DataFrame(rows, columns=['timeframe', 'source'] + REPORT_COLUMNS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect patterns on a timeframe pyramid built from stored 1m candles.")
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--store', default=os.path.join('data', 'store'))
+    parser.add_argument('--intervals', default='5m,15m,1h', help="Comma-separated coarse intervals")
+    parser.add_argument('--refine-from', default='5m', help="Interval whose candidates are refined at 1m")
+    parser.add_argument('--report', default='mtf_report.csv')
+    args = parser.parse_args()
+    data = CandleStore(args.store).load(args.symbol, '1m', columns=OHLCV_COLUMNS)
+    patterns, stats = detect_multi_timeframe(data, args.intervals.split(','), refine_from=args.refine_from)
+    report_df = build_timeframe_report(patterns)
+    report_df.to_csv(args.report, index=False)
+    print(report_df.groupby('timeframe', sort=False).size().to_string())
+    print(f"Refined {stats['regions']} regions ({stats['refined_bars']} of {stats['base_bars']} 1m bars); "
+          f"report saved to {args.report}")
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# Forward return horizons, in bars after the breakout candle
+DEFAULT_HORIZONS = (5, 15, 60, 240)
+
+# Patterns per batch times the window: bounds the (patterns x window) arrays
+_BATCH_ELEMENTS = 1 << 22
+
+
+def outcome_columns(horizons=DEFAULT_HORIZONS):
+    """Columns of evaluate_outcomes' result, in order."""
+    return [f"return_{h}" for h in horizons] + [
+        'mfe', 'mae', 'target_price', 'stop_price', 'outcome', 'exit_bars']
+
+
+def _field(patterns, name, dtype):
+    # Pattern dicts (detect_patterns) or PATTERN_DTYPE records (detect_records)
+    if isinstance(patterns, np.ndarray):
+        return patterns[name].astype(dtype)
+    return np.array([p[name] for p in patterns], dtype=dtype)
+
+
+def evaluate_outcomes(patterns, high, low, close, horizons=DEFAULT_HORIZONS, window=None, target_multiple=1.0):
+    """
+    Measures what happened after each pattern's breakout candle b, entering
+    at its close (breakout_price):
+
+    - return_<h>: close[b + h] / entry - 1 for every horizon h (NaN past the data)
+    - mfe / mae: highest high / lowest low of bars b+1 .. b+window relative
+      to the entry (maximum favorable and adverse excursion)
+    - target_price: entry + target_multiple * cup_depth (the measured move);
+      stop_price: the handle low
+    - outcome: 'target' or 'stop', whichever the bars after the breakout
+      reach first within the window ('stop' if both on the same bar, as the
+      order within a bar is unknown), else 'open'; exit_bars: bars to it
+
+    window defaults to the longest horizon and is cut short at the end of
+    the data. high/low/close are the arrays the patterns' bar indices refer
+    to. All patterns are evaluated together on (patterns x window) arrays of
+    the bars after their breakouts, in batches of bounded size. Returns a
+    DataFrame with one row per pattern and outcome_columns(horizons).
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    horizons = tuple(int(h) for h in horizons)
+    window = int(window or max(horizons))
+    n = len(close)
+
+    breakout = _field(patterns, 'breakout_candle_idx', np.int64)
+    entry = _field(patterns, 'breakout_price', np.float64)
+    target = entry + target_multiple * _field(patterns, 'cup_depth', np.float64)
+    stop = _field(patterns, 'handle_high_price', np.float64) - _field(patterns, 'handle_depth', np.float64)
+
+    columns = {}
+    for h in horizons:
+        at = breakout + h
+        columns[f"return_{h}"] = np.where(at < n, close[np.minimum(at, n - 1)] / entry - 1, np.nan)
+
+    mfe = np.full(len(breakout), np.nan)
+    mae = np.full(len(breakout), np.nan)
+    first_target = np.full(len(breakout), window)
+    first_stop = np.full(len(breakout), window)
+    offsets = np.arange(1, window + 1)
+    batch = max(1, _BATCH_ELEMENTS // window)
+    for a in range(0, len(breakout), batch):
+        rows = slice(a, a + batch)
+        bars = breakout[rows, None] + offsets
+        after = bars < n
+        bars = np.minimum(bars, n - 1)
+        highs = np.where(after, high[bars], -np.inf)
+        lows = np.where(after, low[bars], np.inf)
+        has_bars = after[:, 0]
+        mfe[rows] = np.where(has_bars, highs.max(axis=1) / entry[rows] - 1, np.nan)
+        mae[rows] = np.where(has_bars, lows.min(axis=1) / entry[rows] - 1, np.nan)
+        # argmax finds the first True; rows without one keep window
+        hit = highs >= target[rows, None]
+        first_target[rows] = np.where(hit.any(axis=1), hit.argmax(axis=1), window)
+        hit = lows <= stop[rows, None]
+        first_stop[rows] = np.where(hit.any(axis=1), hit.argmax(axis=1), window)
+
+    columns['mfe'] = mfe
+    columns['mae'] = mae
+    columns['target_price'] = target
+    columns['stop_price'] = stop
+    first_exit = np.minimum(first_target, first_stop)
+    columns['outcome'] = np.where(first_exit == window, 'open',
+                                  np.where(first_stop <= first_target, 'stop', 'target'))
+    exit_bars = pd.array(first_exit + 1, dtype='Int64')
+    exit_bars[first_exit == window] = pd.NA
+    columns['exit_bars'] = exit_bars
+    return pd.DataFrame(columns, columns=outcome_columns(horizons))
@@ -0,0 +1,147 @@
+import numpy as np
+
+
+class ParabolaFitEngine:
+    """
+    Closed-form least-squares parabola fits for every cup window ending at a bar.
+
+    A window [j, i] is expressed in a local coordinate t = i - x running backwards
+    from its last bar, with prices centred on the price at i. Prefix sums of
+    t^k * y (k = 0, 1, 2) and y^2 along t then give the normal equations of every
+    window ending at i, so each window costs O(1) once the sums are built. The
+    normal matrices depend only on the window length and are inverted once up front.
+    Keeping the coordinates local avoids the catastrophic cancellation that global
+    prefix sums of x^4 would suffer on long series.
+    """
+
+    def __init__(self, prices, min_span, max_span, block_size=1024):
+        self.min_span = min_span
+        self.max_span = max_span
+        self.block_size = block_size
+        self.spans = np.arange(min_span, max_span + 1)
+        self.fits = 0  # Windows fitted so far
+        # Optional {i: (R² row, fitted mask)} of windows fitted by r_squared_cols,
+        # so repeated requests (and runs, via a cache) fit each window once
+        self.memo = None
+
+        # Inverse normal matrices in the scaled coordinate u = t / span (u in [0, 1])
+        t = np.arange(max_span + 1, dtype=np.float64)
+        power_sums = np.cumsum(t[None, :] ** np.arange(5)[:, None], axis=1)
+        self._inv_normal = np.full((len(self.spans), 3, 3), np.nan)
+        for col, span in enumerate(self.spans):
+            if span < 2:
+                continue  # A parabola needs at least three points
+            s = power_sums[:, span] / float(span) ** np.arange(5)
+            normal = np.array([[s[0], s[1], s[2]],
+                               [s[1], s[2], s[3]],
+                               [s[2], s[3], s[4]]])
+            self._inv_normal[col] = np.linalg.inv(normal)
+
+        self.reset(prices)
+
+    def reset(self, prices):
+        """Points the engine at a new price array and drops cached blocks."""
+        self.prices = np.asarray(prices, dtype=np.float64)
+        if self.memo is not None:
+            self.memo = {}
+        self._block_start = None
+        self._block_stop = None
+        self._block = None
+
+    def _moments(self, start, stop, cols):
+        """Returns the centred prefix sums for windows ending at bars start..stop-1."""
+        lo = start - self.max_span
+        padded = np.concatenate([np.zeros(max(0, -lo)), self.prices[max(0, lo):stop]])
+        # Row r holds prices i - max_span .. i for i = start + r, reversed so column t is bar i - t
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.max_span + 1)[:, ::-1]
+        y = windows - self.prices[start:stop, None]
+        t = np.arange(self.max_span + 1, dtype=np.float64)
+        spans = self.spans[cols]
+        t0 = np.cumsum(y, axis=1)[:, spans]
+        t1 = np.cumsum(y * t, axis=1)[:, spans]
+        t2 = np.cumsum(y * (t * t), axis=1)[:, spans]
+        q = np.cumsum(y * y, axis=1)[:, spans]
+        return t0, t1, t2, q
+
+    def _solve(self, cols, t0, t1, t2, q):
+        """Solves the normal equations; returns (R², scaled coefficients)."""
+        spans = self.spans[cols]
+        scale = 1.0 / np.maximum(spans, 1)
+        m0, m1, m2 = t0, t1 * scale, t2 * (scale * scale)
+        # Sums are spelled out (not einsum) so their order is fixed; scan_kernel repeats it
+        inv = self._inv_normal[cols]
+        beta = np.stack([inv[:, k, 0] * m0 + inv[:, k, 1] * m1 + inv[:, k, 2] * m2 for k in range(3)], axis=-1)
+        ss_res = np.maximum(q - (beta[..., 0] * m0 + beta[..., 1] * m1 + beta[..., 2] * m2), 0.0)
+        ss_tot = q - t0 ** 2 / (spans + 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_squared = 1 - ss_res / ss_tot
+        # Flat windows and windows too short to fit count as failed fits
+        r_squared = np.where((ss_tot > 0) & (spans >= 2), r_squared, -1.0)
+        return r_squared, beta
+
+    def r_squared_block(self, start, stop):
+        """
+        Returns R² for all windows ending at bars start..stop-1.
+
+        Column c of the result is the window [i - spans[c], i]. Windows reaching
+        before the first bar are NaN.
+        """
+        cols = slice(None)
+        r_squared, _ = self._solve(cols, *self._moments(start, stop, cols))
+        self.fits += (stop - start) * len(self.spans)
+        rows = np.arange(start, stop)[:, None]
+        return np.where(rows - self.spans[None, :] >= 0, r_squared, np.nan)
+
+    def r_squared_at(self, i):
+        """Returns the R² row for bar i, computing blocks of bars on demand."""
+        if self._block is None or not (self._block_start <= i < self._block_stop):
+            self._block_start = i
+            self._block_stop = min(i + self.block_size, len(self.prices))
+            self._block = self.r_squared_block(self._block_start, self._block_stop)
+        return self._block[i - self._block_start]
+
+    def r_squared_cols(self, i, cols):
+        """
+        Returns R² for only the windows ending at bar i in columns cols
+        (window [i - spans[c], i]), bit for bit as r_squared_block computes them.
+        """
+        cols = np.asarray(cols, dtype=np.intp)
+        if len(cols) == 0:
+            return np.zeros(0)
+        if self.memo is None:
+            return self._fit_cols(i, cols)
+        if i not in self.memo:
+            self.memo[i] = (np.full(len(self.spans), np.nan), np.zeros(len(self.spans), dtype=bool))
+        row, fitted = self.memo[i]
+        missing = cols[~fitted[cols]]
+        if len(missing):
+            row[missing] = self._fit_cols(i, missing)
+            fitted[missing] = True
+        return row[cols]
+
+    def _fit_cols(self, i, cols):
+        r_squared, _ = self._solve(cols, *self._moments(i, i + 1, cols))
+        self.fits += len(cols)
+        return np.where(i - self.spans[cols] >= 0, r_squared[0], np.nan)
+
+    def fit(self, j, i):
+        """Returns (R², (a, b, c)) for window [j, i] with x = 0 at bar j."""
+        span = i - j
+        if span < 2:
+            return -1.0, None
+        cols = slice(span - self.min_span, span - self.min_span + 1)
+        r_squared, beta = self._solve(cols, *self._moments(i, i + 1, cols))
+        self.fits += 1
+        b0, b1, b2 = beta[0, 0]
+        s = 1.0 / span
+        coeffs = np.array([b2 * s * s, -(b1 + 2 * b2) * s, b0 + b1 + b2 + self.prices[i]])
+        return float(r_squared[0, 0]), coeffs
+
+
+def fit_parabola(prices):
+    """Fits a parabola to prices in closed form and returns (R², (a, b, c))."""
+    prices = np.asarray(prices, dtype=np.float64)
+    span = len(prices) - 1
+    if span < 2:
+        return -1.0, None
+    return ParabolaFitEngine(prices, span, span).fit(0, span)
@@ -0,0 +1,198 @@
+import os
+import bisect
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pattern_detector import PatternDetector
+
+# Column order of the memory-mapped price matrix shared with the workers;
+# volume follows when the scan confirms volume
+_PRICE_COLUMNS = ['high', 'low', 'close', 'atr']
+
+_shared = {}
+
+# Detector options whose results the greedy merge cannot reproduce
+_UNSUPPORTED_OPTIONS = ['exhaustive', 'instrument', 'record_near_misses', 'cache']
+
+
+def _attach(shared_dir, tz):
+    """Pool initializer: maps the shared arrays once per worker process."""
+    _shared['prices'] = np.load(os.path.join(shared_dir, 'prices.npy'), mmap_mode='r')
+    _shared['timestamps'] = np.load(os.path.join(shared_dir, 'timestamps.npy'), mmap_mode='r')
+    _shared['tz'] = tz
+
+
+def _day_candidates(detector, i, offset=0):
+    """
+    Returns (i, day, j, k, breakout_idx, r_squared) rows for cups ending at bar i.
+
+    Only the first candidate of every distinct cup-start day is kept, which is
+    all that is needed to pick the serial scan's choice under any last-detected
+    day. Indices are shifted by offset to make them global.
+    """
+    rows = []
+    seen_days = set()
+    for j, k, breakout_idx, r_squared in detector._cup_candidates(i, seen_days):
+        day = detector.day_ids[j]
+        rows.append((i + offset, day, j + offset, k + offset, breakout_idx + offset, r_squared))
+        if not detector.one_pattern_per_day:
+            break
+        seen_days.add(day)  # Later candidates from this day can never be chosen
+    return rows
+
+
+def _choose(detector, rows, last_detected_day):
+    """Returns the row the serial scan would accept, or None."""
+    for row in rows:
+        if not (detector.one_pattern_per_day and row[1] == last_detected_day):
+            return row
+    return None
+
+
+def _scan_chunk(task):
+    """
+    Speculatively runs the serial scan over cup end bars [start, stop).
+
+    The worker follows the scan's own skip-ahead trajectory from the chunk start
+    as if no pattern had been seen before it. Returns the half-open ranges of
+    bars it visited and the candidate rows found at them, in global indices.
+    """
+    start, stop, lo, hi, avg_candle_size, params = task
+    prices = _shared['prices']
+    index = pd.DatetimeIndex(_shared['timestamps'][lo:hi])
+    if _shared['tz'] is not None:
+        index = index.tz_localize('UTC').tz_convert(_shared['tz'])
+    data = pd.DataFrame({col: prices[c, lo:hi] for c, col in enumerate(_PRICE_COLUMNS[:3])}, index=index)
+    if len(prices) > len(_PRICE_COLUMNS):
+        data['volume'] = prices[len(_PRICE_COLUMNS), lo:hi]
+    detector = PatternDetector(data, atr=prices[3, lo:hi], avg_candle_size=avg_candle_size, **params)
+
+    visited = []
+    rows = []
+    i = start - lo
+    range_start = i
+    last_detected_day = None
+    while i < stop - lo:
+        bar_rows = _day_candidates(detector, i, lo)
+        rows.extend(bar_rows)
+        chosen = _choose(detector, bar_rows, last_detected_day)
+        if chosen is None:
+            i += 1
+            continue
+        _, last_detected_day, _, k, breakout_idx, _ = chosen
+        visited.append((range_start + lo, i + 1 + lo))
+        i = detector._resume_index(k - lo, breakout_idx - lo)
+        range_start = i
+    if range_start < stop - lo:
+        visited.append((range_start + lo, stop))
+    return visited, rows
+
+
+def _merge(detector, results):
+    """
+    Replays the serial scan over the workers' candidate rows.
+
+    Wherever the true trajectory lands on a bar no worker visited (because its
+    speculative start state differed) the bar is scanned here, until the
+    trajectory meets a worker's path again.
+    """
+    visited = sorted(r for ranges, _ in results for r in ranges)
+    range_starts = [r[0] for r in visited]
+    by_bar = {}
+    for _, rows in results:
+        for row in rows:
+            by_bar.setdefault(row[0], []).append(row)
+    bars = sorted(by_bar)
+
+    patterns = []
+    n = len(detector.close)
+    i = detector.min_cup_duration
+    last_detected_day = None
+    while i < n - detector.max_handle_duration - 11:
+        pos = bisect.bisect_right(range_starts, i) - 1
+        if pos >= 0 and i < visited[pos][1]:
+            # Bars a worker visited without candidates are stepped over in one go
+            nxt = bisect.bisect_left(bars, i)
+            if nxt == len(bars) or bars[nxt] >= visited[pos][1]:
+                i = visited[pos][1]
+                continue
+            if bars[nxt] > i:
+                i = bars[nxt]
+                continue
+            bar_rows = by_bar[i]
+        else:
+            bar_rows = _day_candidates(detector, i)
+        chosen = _choose(detector, bar_rows, last_detected_day)
+        if chosen is None:
+            i += 1
+            continue
+        _, day, j, k, breakout_idx, r_squared = chosen
+        patterns.append(detector._make_pattern(j, i, k, breakout_idx, r_squared))
+        last_detected_day = day
+        i = detector._resume_index(k, breakout_idx)
+    return patterns
+
+
+def detect_patterns_parallel(data, n_workers=None, chunk_size=None, **detector_kwargs):
+    """
+    Multi-process equivalent of PatternDetector(data, ...).detect_patterns().
+
+    The cup end range is split into chunks, each extended by
+    max_cup_duration + max_handle_duration + 10 bars of context. Workers read
+    the price and timestamp arrays from memory-mapped files instead of receiving
+    a pickled frame. Each worker follows the serial skip-ahead path from its
+    chunk start; a merge pass then replays the skip-ahead and
+    one-pattern-per-day rules from the true start, rescanning only bars where
+    the paths diverge, so the output is identical to the serial scan.
+
+    Only the greedy, uninstrumented scan is stitched this way: exhaustive,
+    instrument, record_near_misses and cache raise ValueError.
+    """
+    unsupported = [name for name in _UNSUPPORTED_OPTIONS if detector_kwargs.get(name)]
+    if unsupported:
+        raise ValueError(f"The parallel scan does not support {', '.join(unsupported)}")
+    n_workers = n_workers or os.cpu_count() or 1
+    detector = PatternDetector(data, **detector_kwargs)
+    n = len(detector.close)
+    first = detector.min_cup_duration
+    last = n - detector.max_handle_duration - 11
+    if last <= first:
+        return []
+    if chunk_size is None:
+        # A few chunks per worker evens out dense and quiet stretches of the series
+        chunk_size = max(2000, -(-(last - first) // (n_workers * 4)))
+
+    params = {
+        'min_cup_duration': detector.min_cup_duration,
+        'max_cup_duration': detector.max_cup_duration,
+        'min_handle_duration': detector.min_handle_duration,
+        'max_handle_duration': detector.max_handle_duration,
+        'min_r2': detector.min_r2,
+        'skip_days_after_pattern': detector.skip_days_after_pattern,
+        'one_pattern_per_day': detector.one_pattern_per_day,
+        'volume_confirmation': detector.volume_confirmation,
+        'bottom_volume_ratio': detector.bottom_volume_ratio,
+        'handle_volume_ratio': detector.handle_volume_ratio,
+        'breakout_volume_ratio': detector.breakout_volume_ratio,
+        'prune_candidates': detector.prune_candidates,
+        'use_jit': detector.use_jit,
+    }
+    columns = _PRICE_COLUMNS + (['volume'] if detector.volume_confirmation else [])
+    tasks = []
+    for start in range(first, last, chunk_size):
+        stop = min(start + chunk_size, last)
+        lo = max(0, start - detector.max_cup_duration)
+        hi = min(n, stop + detector.max_handle_duration + 10)
+        tasks.append((start, stop, lo, hi, detector.avg_candle_size, params))
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        np.save(os.path.join(shared_dir, 'prices.npy'),
+                np.stack([getattr(detector, col) for col in columns]))
+        np.save(os.path.join(shared_dir, 'timestamps.npy'), detector.timestamps_int)
+        tz = detector.tz
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_attach,
+                                 initargs=(shared_dir, tz)) as pool:
+            results = list(pool.map(_scan_chunk, tasks))
+
+    return _merge(detector, results)
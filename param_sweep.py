@@ -0,0 +1,189 @@
+import os
+import copy
+import time
+import inspect
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from pattern_detector import PatternDetector
+from candle_store import CandleStore, OHLCV_COLUMNS
+
+# Detector parameters a sweep can vary
+SWEEP_PARAMS = ['min_cup_duration', 'max_cup_duration', 'min_handle_duration', 'max_handle_duration',
+                'min_r2', 'skip_days_after_pattern', 'one_pattern_per_day']
+
+METRIC_COLUMNS = ['patterns', 'mean_r_squared', 'mean_cup_depth', 'mean_cup_duration',
+                  'mean_handle_duration', 'seconds']
+
+
+def expand_grid(grid):
+    """
+    Returns a list of parameter dicts: a dict of value lists becomes their
+    cartesian product, a list of dicts is returned as is.
+    """
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    return [dict(config) for config in grid]
+
+
+class ParameterSweep:
+    """
+    Scans one dataset under many detector configurations, sharing the work.
+
+    ATR, the average candle size and the range tables are built once by a
+    detector spanning the widest cup and handle bounds of the grid. For every
+    cup end any configuration can visit, the cup/handle grid of that widest
+    detector (rim, depth, handle and breakout checks, see
+    PatternDetector._handle_grid) and the R² of the cups passing it are
+    computed once, on the first scan. Each configuration then only visits the
+    cup ends where one of those cups reaches its R² threshold, slices its own
+    duration bounds out of the shared grid and applies its skip-ahead and
+    one-pattern-per-day rules, so every configuration returns exactly what
+    PatternDetector(data, **config).detect_patterns() does.
+    """
+
+    def __init__(self, data, grid, atr=None, avg_candle_size=None):
+        self.configs = expand_grid(grid)
+        for config in self.configs:
+            unknown = set(config) - set(SWEEP_PARAMS)
+            if unknown:
+                raise ValueError(f"Cannot sweep {sorted(unknown)}; sweepable parameters are {SWEEP_PARAMS}")
+        defaults = inspect.signature(PatternDetector).parameters
+        self.configs = [{name: config.get(name, defaults[name].default) for name in SWEEP_PARAMS}
+                        for config in self.configs]
+        bounds = {
+            'min_cup_duration': min(c['min_cup_duration'] for c in self.configs),
+            'max_cup_duration': max(c['max_cup_duration'] for c in self.configs),
+            'min_handle_duration': min(c['min_handle_duration'] for c in self.configs),
+            'max_handle_duration': max(c['max_handle_duration'] for c in self.configs),
+        }
+        self.detector = PatternDetector(data, atr=atr, avg_candle_size=avg_candle_size, **bounds)
+        self._grids = None
+        self.patterns = []
+
+    def _build_grids(self):
+        """
+        Computes the grid entry (ks, breakout_idx, accepts, offsets, r_squared)
+        of every cup end any configuration can visit that has a candidate cup;
+        keeps their sorted cup ends and the best R² of each (NaN when a cup
+        has none, which no threshold rejects).
+        """
+        detector = self.detector
+        n = len(detector.close)
+        stop = n - min(c['max_handle_duration'] for c in self.configs) - 11
+        self._grids = {}
+        for i in range(detector.min_cup_duration, stop):
+            grid = detector._handle_grid(i)
+            if grid is None:
+                continue
+            ks, breakout_idx, accepts = grid
+            offsets = np.flatnonzero(accepts.any(axis=0))
+            if len(offsets):
+                r_squared = detector.fit_engine.r_squared_cols(i, offsets)
+                self._grids[i] = (ks, breakout_idx, accepts[:, offsets], offsets, r_squared)
+        self._cup_ends = np.array(sorted(self._grids), dtype=np.int64)
+        self._best_r2 = np.array([np.max(self._grids[i][4]) for i in self._cup_ends.tolist()], dtype=np.float64)
+
+    def _first_candidate(self, config, i, skip_day):
+        """Returns the (j, k, breakout_idx, r_squared) the configuration accepts at cup end i, or None."""
+        ks, breakout_idx, accepts, offsets, r_squared = self._grids[i]
+        detector = self.detector
+        shift = config['min_cup_duration'] - detector.min_cup_duration
+        # The configuration's cups and handle ends within the widest ones
+        cups = ((offsets >= shift) & (offsets <= min(i, config['max_cup_duration']) - detector.min_cup_duration)
+                & ~(r_squared < config['min_r2']))
+        handles = ((ks >= i + config['min_handle_duration'])
+                   & (ks <= min(i + config['max_handle_duration'], len(detector.close) - 11)))
+        if not cups.any() or not handles.any():
+            return None
+        accepts = accepts[handles][:, cups]
+        for col in np.flatnonzero(accepts.any(axis=0)):
+            offset = offsets[cups][col]
+            j = i - detector.min_cup_duration - int(offset)
+            if skip_day is not None and detector.day_ids[j] == skip_day:
+                continue
+            h = int(np.argmax(accepts[:, col]))
+            return j, int(ks[handles][h]), int(breakout_idx[handles][h]), r_squared[cups][col]
+        return None
+
+    def scan(self, config):
+        """Runs the detector's scan under one configuration; returns its patterns."""
+        if self._grids is None:
+            self._build_grids()
+        detector = copy.copy(self.detector)
+        vars(detector).update(config)
+        patterns = []
+        n = len(detector.close)
+        # Cup ends without a cup reaching the threshold yield nothing; the scan steps over them
+        cup_ends = self._cup_ends[~(self._best_r2 < config['min_r2'])]
+        stop = n - config['max_handle_duration'] - 11
+        i = config['min_cup_duration']
+        last_detected_day = None
+        while True:
+            pos = np.searchsorted(cup_ends, i)
+            if pos == len(cup_ends) or cup_ends[pos] >= stop:
+                break
+            i = int(cup_ends[pos])
+            skip_day = last_detected_day if config['one_pattern_per_day'] else None
+            candidate = self._first_candidate(config, i, skip_day)
+            if candidate is None:
+                i += 1
+                continue
+            j, k, breakout_idx, r_squared = candidate
+            patterns.append(detector._make_pattern(j, i, k, breakout_idx, r_squared))
+            last_detected_day = detector.day_ids[j]
+            i = detector._resume_index(k, breakout_idx)
+        return patterns
+
+    def run(self):
+        """
+        Scans every configuration; returns one row per configuration with its
+        parameters and pattern metrics. Patterns are kept in self.patterns.
+        """
+        if self._grids is None:
+            self._build_grids()
+        rows = []
+        self.patterns = []
+        for config in self.configs:
+            started = time.perf_counter()
+            patterns = self.scan(config)
+            seconds = time.perf_counter() - started
+            self.patterns.append(patterns)
+            stats = pd.DataFrame(patterns, columns=['r_squared_cup', 'cup_depth', 'cup_duration', 'handle_duration'])
+            rows.append(dict(
+                config,
+                patterns=len(patterns),
+                mean_r_squared=stats['r_squared_cup'].mean(),
+                mean_cup_depth=stats['cup_depth'].mean(),
+                mean_cup_duration=stats['cup_duration'].mean(),
+                mean_handle_duration=stats['handle_duration'].mean(),
+                seconds=seconds,
+            ))
+        return pd.DataFrame(rows, columns=SWEEP_PARAMS + METRIC_COLUMNS)
+
+
+def sweep_parameters(data, grid, **kwargs):
+    """Returns the per-configuration metrics table of a ParameterSweep over grid."""
+    return ParameterSweep(data, grid, **kwargs).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep detector parameters over one symbol/interval from the candle store.")
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--interval', default='1m')
+    parser.add_argument('--store', default=os.path.join('data', 'store'))
+    parser.add_argument('--report', default='sweep_report.csv')
+    for name in SWEEP_PARAMS[:-1]:
+        cast = float if name == 'min_r2' else int
+        parser.add_argument('--' + name.replace('_', '-'), type=lambda v, cast=cast: [cast(x) for x in v.split(',')],
+                            default=None, help="Comma-separated values")
+    args = parser.parse_args()
+    grid = {name: getattr(args, name) for name in SWEEP_PARAMS[:-1] if getattr(args, name) is not None}
+    data = CandleStore(args.store).load(args.symbol, args.interval, columns=OHLCV_COLUMNS)
+    started = time.perf_counter()
+    table = sweep_parameters(data, grid)
+    table.to_csv(args.report, index=False)
+    print(f"Swept {len(table)} configurations over {len(data)} bars in {time.perf_counter() - started:.1f}s; "
+          f"results saved to {args.report}")
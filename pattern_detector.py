@@ -1,8 +1,82 @@
 
 import pandas as pd
 import numpy as np
-from scipy.optimize import curve_fit
-import talib
+from parabola_fit import ParabolaFitEngine, fit_parabola
+from range_query import SparseTable
+from funnel import ScanFunnel, REJECT_REASONS
+from interval_nms import suppress_overlaps
+import scan_kernel
+
+DAY_NS = 86_400 * 10 ** 9
+
+# Scores exhaustive mode ranks overlapping patterns by
+RANK_BY = {'r_squared', 'depth'}
+
+
+def _window_mean(sums, a, b):
+    """Mean of the values in [a, b] (inclusive; arrays broadcast) from their prefix sums."""
+    return (sums[b + 1] - sums[a]) / (b - a + 1)
+
+# Compact pattern records returned by PatternDetector.detect_records: bar
+# indices, UTC times and prices; durations, handle start and status follow
+# from them (see patterns_from_records)
+PATTERN_DTYPE = np.dtype([
+    ('cup_start_idx', np.int64),
+    ('cup_end_idx', np.int64),
+    ('handle_end_idx', np.int64),
+    ('breakout_candle_idx', np.int64),
+    ('start_time', 'M8[ns]'),
+    ('end_time', 'M8[ns]'),
+    ('r_squared_cup', np.float64),
+    ('cup_fit_coeffs', np.float64, (3,)),
+    ('cup_depth', np.float64),
+    ('handle_depth', np.float64),
+    ('left_rim_price', np.float64),
+    ('right_rim_price', np.float64),
+    ('cup_bottom_price', np.float64),
+    ('handle_high_price', np.float64),
+    ('breakout_price', np.float64),
+])
+
+
+def patterns_from_records(records, tz=None):
+    """
+    Returns the pattern dicts (as PatternDetector.detect_patterns gives them)
+    for an array of PATTERN_DTYPE records; times are converted to tz.
+    """
+    patterns = []
+    for r in records:
+        start_time = pd.Timestamp(r['start_time'].astype(np.int64))
+        end_time = pd.Timestamp(r['end_time'].astype(np.int64))
+        if tz is not None:
+            start_time = start_time.tz_localize('UTC').tz_convert(tz)
+            end_time = end_time.tz_localize('UTC').tz_convert(tz)
+        j, i, k = int(r['cup_start_idx']), int(r['cup_end_idx']), int(r['handle_end_idx'])
+        patterns.append({
+            'start_time': start_time,
+            'end_time': end_time,
+            'cup_start_idx': j,
+            'cup_end_idx': i,
+            'handle_start_idx': i,
+            'handle_end_idx': k,
+            'breakout_candle_idx': int(r['breakout_candle_idx']),
+            'cup_depth': r['cup_depth'],
+            'cup_duration': i - j + 1,
+            'handle_depth': r['handle_depth'],
+            'handle_duration': k - i + 1,
+            'r_squared_cup': r['r_squared_cup'],
+            'cup_fit_coeffs': tuple(float(c) for c in r['cup_fit_coeffs']),  # (a, b, c) with x = 0 at the cup start
+            'left_rim_price': r['left_rim_price'],
+            'right_rim_price': r['right_rim_price'],
+            'cup_bottom_price': r['cup_bottom_price'],
+            'handle_high_price': r['handle_high_price'],
+            'breakout_price': r['breakout_price'],
+            'breakout_candle_timestamp': end_time,
+            'status': 'Valid',
+            'reason': ''
+        })
+    return patterns
+
 
 class PatternDetector:
     def __init__(self, data,
@@ -12,9 +86,24 @@ class PatternDetector:
                  max_handle_duration=50,
                  min_r2=0.85,
                  skip_days_after_pattern=1,
-                 one_pattern_per_day=True):
+                 one_pattern_per_day=True,
+                 atr=None,
+                 avg_candle_size=None,
+                 instrument=False,
+                 record_near_misses=False,
+                 prune_candidates=True,
+                 cache=None,
+                 use_jit=True,
+                 exhaustive=False,
+                 rank_by='r_squared',
+                 volume_confirmation=False,
+                 bottom_volume_ratio=1.0,
+                 handle_volume_ratio=1.0,
+                 breakout_volume_ratio=1.5):
         
-        self.data = data.copy()
+        # Columns are read in place (DataFrame columns, or read-only / memory-mapped
+        # arrays, see _columns), so the detector holds no copy of the input
+        self.data = data
         self.min_cup_duration = min_cup_duration
         self.max_cup_duration = max_cup_duration
         self.min_handle_duration = min_handle_duration
@@ -22,142 +111,638 @@ class PatternDetector:
         self.min_r2 = min_r2
         self.skip_days_after_pattern = skip_days_after_pattern
         self.one_pattern_per_day = one_pattern_per_day
+        # Opt-in funnel counters and timings (see funnel.ScanFunnel); None keeps the scan uninstrumented
+        self.funnel = ScanFunnel(record_near_misses) if instrument or record_near_misses else None
+        # Fit only cups that pass the cheap checks (see _candidate_offsets); the
+        # funnel accounts for every cup, so instrumented scans fit them all
+        self.prune_candidates = prune_candidates
+        # Optional feature_cache.FeatureCache for cup fits and results across runs
+        self.cache = cache
+        # Run uninstrumented scans in the compiled kernel (see scan_kernel) when Numba is installed
+        self.use_jit = use_jit
+        # Report every valid cup, resolving overlaps by rank instead of taking
+        # the first cup and skipping ahead (see _exhaustive_scan)
+        if rank_by not in RANK_BY:
+            raise ValueError(f"rank_by must be one of {sorted(RANK_BY)}, got {rank_by!r}")
+        if exhaustive and self.funnel is not None:
+            raise ValueError("The detection funnel follows the greedy scan; it cannot instrument exhaustive mode")
+        self.exhaustive = exhaustive
+        self.rank_by = rank_by
+        # Optional volume confirmation stage (see _cup_volume_ok, _handle_volume_ok, _breakout_volume_ok)
+        self.volume_confirmation = volume_confirmation
+        self.bottom_volume_ratio = bottom_volume_ratio
+        self.handle_volume_ratio = handle_volume_ratio
+        self.breakout_volume_ratio = breakout_volume_ratio
+
+        times, high, low, close = self._columns(data)
+        # Timestamps in nanoseconds (to match Timestamp.value) and their timezone
+        self.timestamps_int = times
+        self.tz = getattr(data.index, 'tz', None) if isinstance(data, pd.DataFrame) else None
+        # Calendar day of each bar, for the one-pattern-per-day rule
+        if self.tz is None:
+            self.day_ids = times - times % DAY_NS
+        else:
+            self.day_ids = data.index.normalize().as_unit('ns').asi8
+
+        # Precompute average candle size & ATR once (callers scanning a slice of a
+        # longer series pass the full-series values so results match a whole scan)
+        if avg_candle_size is None:
+            avg_candle_size = np.nanmean(high - low) if len(high) else np.nan  # NaN-skipping, as Series.mean
+        self.avg_candle_size = avg_candle_size
+        if atr is None:
+            import talib  # Only needed when the caller has no ATR
+            atr = talib.ATR(high, low, close, timeperiod=14)
+        self.atr = np.asarray(atr, dtype=np.float64)
+
+        # Closed-form R² for every cup window, computed in batches per ending bar
+        self.fit_engine = ParabolaFitEngine(close, self.min_cup_duration, self.max_cup_duration)
+        self._index_arrays(high, low, close, self.atr)
+        if volume_confirmation:
+            if 'volume' not in data:
+                raise ValueError("volume_confirmation needs a 'volume' column")
+            # Prefix sums give the mean volume of any window in O(1)
+            self.volume = np.asarray(data['volume'], dtype=np.float64)
+            self.volume_sums = np.concatenate([[0.0], np.cumsum(self.volume)])
+        if cache is not None:
+            self._load_fits()
+
+    @staticmethod
+    def _columns(data):
+        """
+        Returns (UTC nanosecond times, high, low, close) of the input without
+        copying them where their dtype allows. data is a DataFrame indexed by
+        time, or a mapping of 1-D arrays (e.g. CandleStore.load_arrays, NumPy
+        memmaps) with naive UTC 'open_time' and 'high', 'low', 'close'.
+        """
+        if isinstance(data, pd.DataFrame):
+            times = data.index.as_unit('ns').asi8
+            prices = [data[col].to_numpy(dtype=np.float64) for col in ('high', 'low', 'close')]
+        else:
+            times = np.asarray(data['open_time'])
+            if times.dtype.kind == 'M':
+                times = times.astype('M8[ns]').view(np.int64)
+            prices = [np.asarray(data[col], dtype=np.float64) for col in ('high', 'low', 'close')]
+        return (np.asarray(times, dtype=np.int64), *prices)
+
+    def _index_arrays(self, high, low, close, atr):
+        """Points the scan at price arrays; range tables over them are built on first use."""
+        self.high = high
+        self.low = low
+        self.close = close
+        self.fit_engine.reset(close)
+        # A breakout candle closes above handle_high + 1.5 * ATR (never true
+        # while ATR is NaN); the sum is formed per handle, as written, so the
+        # comparison rounds exactly as the original per-candle check
+        self.breakout_margin = 1.5 * atr
+        self._tables = {}
+
+    def _table(self, name):
+        """
+        Range max/min tables for handle and breakout checks, built once per
+        price arrays. Queries never span more than the handle or the 10-candle
+        breakout window. The compiled scan needs none of them. With a cache,
+        range tables are extended from those of the series' first bars.
+        """
+        table = self._tables.get(name)
+        if table is None:
+            if name in ('high_max', 'low_min'):
+                values, op = (self.high, 'max') if name == 'high_max' else (self.low, 'min')
+                table = self._range_table(values, op)
+            else:
+                # Row b holds the closes (or margins) of bars b..b+9, the window after
+                # handle end b - 1; NaN padding never breaks out
+                values = self.close if name == 'close_windows' else self.breakout_margin
+                table = np.lib.stride_tricks.sliding_window_view(
+                    np.concatenate([values, np.full(9, np.nan)]), 10)
+            self._tables[name] = table
+        return table
+
+    @property
+    def high_max(self):
+        return self._table('high_max')
 
-        # Precompute average candle size & ATR once
-        self.avg_candle_size = (self.data['high'] - self.data['low']).mean()
-        self.data['ATR'] = talib.ATR(
-            self.data['high'],
-            self.data['low'],
-            self.data['close'],
-            timeperiod=14
-        )
+    @property
+    def low_min(self):
+        return self._table('low_min')
 
-        # Precompute timestamp arrays for faster searching
-        self.timestamps = self.data.index.to_numpy()
-        self.timestamps_int = self.data.index.view(np.int64)
+    @property
+    def close_windows(self):
+        return self._table('close_windows')
+
+    @property
+    def margin_windows(self):
+        return self._table('margin_windows')
+
+    def _range_table(self, values, op):
+        """SparseTable over values, reusing and extending the cached levels of their first rows."""
+        max_length = self.max_handle_duration + 1
+        if self.cache is None:
+            return SparseTable(values, op, max_length)
+        kind, params, columns = 'range_table', {'op': op, 'max_length': max_length}, [values]
+        levels, rows = self.cache.get(kind, params, columns, prefix=True)
+        table = SparseTable(values, op, max_length, prefix_levels=levels)
+        if rows < len(values):
+            self.cache.put(kind, params, columns, table.levels)
+        return table
+
+    def _fits_key(self):
+        return 'cup_fits', {'min_span': self.min_cup_duration, 'max_span': self.max_cup_duration}, [self.close]
+
+    def _load_fits(self):
+        """
+        Seeds the fit engine with the cup R² values of earlier runs. An R²
+        only depends on the closes of its window, so fits cached for the
+        first bars of this series are reused when bars were appended since.
+        """
+        kind, params, columns = self._fits_key()
+        self.fit_engine.memo = {}
+        cached, _ = self.cache.get(kind, params, columns, prefix=True)
+        if cached is not None:
+            ends, rows, fitted = cached
+            self.fit_engine.memo = {int(i): (row, mask) for i, row, mask in zip(ends, rows, fitted)}
+
+    def _save_fits(self):
+        memo = self.fit_engine.memo
+        ends = np.array(sorted(memo), dtype=np.int64)
+        rows = np.array([memo[i][0] for i in ends]).reshape(len(ends), len(self.fit_engine.spans))
+        fitted = np.array([memo[i][1] for i in ends], dtype=bool).reshape(rows.shape)
+        kind, params, columns = self._fits_key()
+        self.cache.put(kind, params, columns, (ends, rows, fitted))
+
+    def _patterns_key(self):
+        params = {
+            'min_cup_duration': self.min_cup_duration,
+            'max_cup_duration': self.max_cup_duration,
+            'min_handle_duration': self.min_handle_duration,
+            'max_handle_duration': self.max_handle_duration,
+            'min_r2': self.min_r2,
+            'skip_days_after_pattern': self.skip_days_after_pattern,
+            'one_pattern_per_day': self.one_pattern_per_day,
+            'avg_candle_size': float(self.avg_candle_size),
+            'exhaustive': self.exhaustive,
+            'rank_by': self.rank_by,
+        }
+        columns = [self.timestamps_int, self.high, self.low, self.close, self.atr]
+        if self.volume_confirmation:
+            params.update(bottom_volume_ratio=self.bottom_volume_ratio, handle_volume_ratio=self.handle_volume_ratio,
+                          breakout_volume_ratio=self.breakout_volume_ratio)
+            columns.append(self.volume)
+        return 'pattern_records', params, columns
 
     def _parabolic_curve(self, x, a, b, c):
         return a * x**2 + b * x + c
 
     def _fit_parabolic_cup(self, cup_prices):
-        """Fits a parabolic curve and returns R²."""
-        x = np.arange(len(cup_prices))
-        try:
-            popt, _ = curve_fit(self._parabolic_curve, x, cup_prices)
-            y_pred = self._parabolic_curve(x, *popt)
-            ss_res = np.sum((cup_prices - y_pred) ** 2)
-            ss_tot = np.sum((cup_prices - np.mean(cup_prices)) ** 2)
-            r_squared = 1 - (ss_res / ss_tot)
-            return r_squared, popt
-        except (RuntimeError, ValueError):
-            return -1.0, None
+        """Fits a parabolic curve in closed form and returns R² and (a, b, c)."""
+        return fit_parabola(cup_prices)
 
-    def detect_patterns(self):
-        patterns = []
-        n = len(self.data)
-        # Start from the earliest index which can possibly form a cup
-        i = self.min_cup_duration  
-        last_detected_day = None
+    def _cup_candidates(self, i, skip_days=()):
+        """
+        Yields (j, k, breakout_idx, r_squared) for cups ending at bar i.
 
-        # For speed, grab local copies of columns where possible
-        prices_close = self.data['close'].values
-        atr_vals = self.data['ATR'].values
+        Cup starts j are tried from the shortest cup back to the longest; each
+        yields its first valid handle end k. Cups starting on a day in skip_days are skipped, and
+        skip_days is re-checked after every yield so callers may extend it.
+        """
+        prices_close = self.close
+        prices_high = self.high
+        funnel = self.funnel
+
+        # Bound the cup search indices
+        j_start = max(0, i - self.max_cup_duration)
+        j_end = i - self.min_cup_duration
+        # Cups are addressed by offset i - j - min_cup_duration, shortest first
+        if funnel is not None:
+            funnel.cup_ends += 1
+            funnel.best = None
+            started = funnel.clock()
+        if funnel is None and self.prune_candidates:
+            offsets = self._candidate_offsets(i, skip_days)
+            r_squared_row = self.fit_engine.r_squared_cols(i, offsets)
+        else:
+            offsets = range(j_end - j_start + 1)
+            r_squared_row = self.fit_engine.r_squared_at(i)
+        if funnel is not None:
+            funnel.seconds['fit'] += funnel.clock() - started
+            counted = 0  # Cups before this offset into r_squared_row have been counted
+        for offset, r_squared in zip(offsets, r_squared_row):
+            j = i - self.min_cup_duration - offset
+            if r_squared < self.min_r2:
+                continue
+            # Every handle of a cup starting on an excluded day would be rejected
+            if self.day_ids[j] in skip_days:
+                if funnel is not None:
+                    funnel.reject('skip_day', j=j)
+                continue
+
+            # Rims from cup segment
+            left_rim_price = prices_high[j]
+            right_rim_price = prices_high[i]
+            if abs(left_rim_price - right_rim_price) / ((left_rim_price + right_rim_price) / 2) > 0.10:
+                if funnel is not None:
+                    funnel.reject('rim', j=j, r_squared=r_squared)
+                continue
+
+            cup_bottom_price = prices_close[j:i+1].min()
+            rim_price = max(left_rim_price, right_rim_price)
+            cup_depth = rim_price - cup_bottom_price
+            # Use precomputed avg_candle_size instead of per-index DataFrame lookup
+            if cup_depth < 2 * self.avg_candle_size:
+                if funnel is not None:
+                    funnel.reject('depth', j=j, r_squared=r_squared)
+                continue
+            if self.volume_confirmation and not self._cup_volume_ok(self.volume_sums, j, i):
+                if funnel is not None:
+                    funnel.reject('cup_volume', j=j, r_squared=r_squared)
+                continue
+
+            if funnel is None:
+                handle = self._find_handle(i, rim_price, cup_bottom_price, cup_depth, j)
+            else:
+                funnel.cup = (j, r_squared)
+                started, in_breakout = funnel.clock(), funnel.seconds['breakout']
+                handle = self._find_handle(i, rim_price, cup_bottom_price, cup_depth, j)
+                funnel.seconds['handle_search'] += (funnel.clock() - started) - (funnel.seconds['breakout'] - in_breakout)
+            if handle is not None:
+                if funnel is not None:
+                    counted = self._count_cups(r_squared_row, counted, i - j - self.min_cup_duration + 1)
+                yield (j,) + handle + (r_squared,)
+
+        if funnel is not None:
+            self._count_cups(r_squared_row, counted, j_end - j_start + 1)
+            if funnel.record_near_misses and counted == 0 and funnel.best is not None:
+                _, stage, j, k, r_squared = funnel.best
+                funnel.near_misses.append(self._make_near_miss(j, i, k, r_squared, REJECT_REASONS[stage]))
+
+    def _candidate_offsets(self, i, skip_days=()):
+        """
+        Returns the offsets i - j - min_cup_duration of the cups ending at bar i
+        that can still yield a pattern once fitted.
+
+        A cup is dropped when the scan would reject it whatever its R²: its
+        start is on an excluded day, or its rims, depth or every one of its
+        handles fail (see _handle_grid).
+        """
+        grid = self._handle_grid(i)
+        if grid is None:
+            return np.zeros(0, dtype=np.intp)
+        _, _, accepts = grid
+        keep = accepts.any(axis=0)
+        days = [day for day in skip_days if day is not None]
+        if days:
+            j_end = i - self.min_cup_duration
+            keep &= ~np.isin(self.day_ids[j_end - len(keep) + 1:j_end + 1][::-1], days)
+        return np.flatnonzero(keep)
+
+    def _handle_grid(self, i):
+        """
+        Checks every cup ending at bar i against every handle end at once.
+
+        Returns (ks, breakout_idx, accepts), or None when no handle after i
+        breaks out. ks are the handle ends whose handle breaks out, at bar
+        breakout_idx; accepts[h, c] is True when cup offset c passes the rim
+        and depth checks and accepts handle end ks[h]. Handle highs and lows
+        and the breakout check only depend on k, so they are worked out once
+        per k. Each test negates the scan's own rejection expression, so
+        every cup and handle the scan would accept is kept.
+        """
+        n = len(self.close)
+        j_start = max(0, i - self.max_cup_duration)
+        j_end = i - self.min_cup_duration
+        first_k = i + self.min_handle_duration
+        last_k = min(i + self.max_handle_duration, n - 11)
+        if j_end < j_start or last_k < first_k:
+            return None
+        # Every handle contains bar i, so a breakout must clear high[i]
+        window = slice(first_k + 1, last_k + 11)
+        if not (self.close[window] > self.high[i] + self.breakout_margin[window]).any():
+            return None
+
+        # Handle high/low of every handle end, and the handles that break out
+        handle_high = np.fmax.accumulate(self.high[i:last_k + 1])[self.min_handle_duration:]
+        handle_low = np.fmin.accumulate(self.low[i:last_k + 1])[self.min_handle_duration:]
+        windows = slice(first_k + 1, last_k + 2)
+        above = self.close_windows[windows] > handle_high[:, None] + self.margin_windows[windows]
+        breakout_idx = np.arange(first_k + 1, last_k + 2) + above.argmax(axis=1)
+        breaks_out = above.any(axis=1) & ~(self.close[breakout_idx] <= handle_high)
+        if not breaks_out.any():
+            return None
+        handle_high = handle_high[breaks_out, None]
+        handle_low = handle_low[breaks_out, None]
+
+        # Cups from shortest to longest, as the scan tries them
+        left_rim_price = self.high[j_start:j_end + 1][::-1]
+        right_rim_price = self.high[i]
+        cup_bottom_price = np.minimum.accumulate(self.close[j_start:i + 1][::-1])[self.min_cup_duration:]
+        rim_price = np.where(right_rim_price > left_rim_price, right_rim_price, left_rim_price)
+        cup_depth = rim_price - cup_bottom_price
+        cup_ok = ~(np.abs(left_rim_price - right_rim_price) / ((left_rim_price + right_rim_price) / 2) > 0.10)
+        cup_ok &= ~(cup_depth < 2 * self.avg_candle_size)
+        accepts = (cup_ok
+                   & ~(handle_high > rim_price)
+                   & ~(rim_price - handle_low > 0.40 * cup_depth)
+                   & ~(handle_low < cup_bottom_price))
+        ks = np.arange(first_k, last_k + 1)[breaks_out]
+        breakout_idx = breakout_idx[breaks_out]
+        if self.volume_confirmation:
+            j = np.arange(j_end, j_start - 1, -1)
+            accepts &= (self._cup_volume_ok(self.volume_sums, j, i)
+                        & self._handle_volume_ok(j, i, ks[:, None])
+                        & self._breakout_volume_ok(j, i, breakout_idx[:, None]))
+        return ks, breakout_idx, accepts
+
+    def _count_cups(self, r_squared_row, start, stop):
+        """Adds the cups at offsets start..stop-1 of an R² row to the funnel; returns stop."""
+        window = r_squared_row[start:stop]
+        self.funnel.cups += len(window)
+        self.funnel.rejected['fit'] += int(np.count_nonzero(window < self.min_r2))
+        return stop
+
+    def _find_handle(self, i, rim_price, cup_bottom_price, cup_depth, j=None):
+        """
+        Returns (k, breakout_idx) for the first valid handle [i, k] of a cup, or
+        None. The volume checks need the cup start j.
+        """
+        n = len(self.close)
+        funnel = self.funnel
+        first_k = i + self.min_handle_duration
+        last_k = min(i + self.max_handle_duration, n - 11)
+        for k in range(first_k, last_k + 1):
+            handle_high = self.high_max.query(i, k)
+            handle_low = self.low_min.query(i, k)
+
+            if handle_high > rim_price:
+                if funnel is not None:
+                    funnel.reject('handle_high', k=k)
+                continue
+            handle_retrace = rim_price - handle_low
+            if handle_retrace > 0.40 * cup_depth:
+                if funnel is not None:
+                    funnel.reject('retrace', k=k)
+                continue
+            if handle_low < cup_bottom_price:
+                if funnel is not None:
+                    funnel.reject('handle_low', k=k)
+                continue
+            if self.volume_confirmation and not self._handle_volume_ok(j, i, k):
+                if funnel is not None:
+                    funnel.reject('handle_volume', k=k)
+                continue
+
+            breakout_idx = self._find_breakout(k, handle_high)
+            if breakout_idx is not None and self.volume_confirmation and not self._breakout_volume_ok(j, i, breakout_idx):
+                if funnel is not None:
+                    funnel.reject('breakout_volume', k=k)
+                breakout_idx = None
+            if breakout_idx is not None:
+                if funnel is not None:
+                    funnel.handles += k - first_k + 1
+                return k, breakout_idx  # Only the first valid handle counts for this cup
+        if funnel is not None:
+            funnel.handles += max(0, last_k - first_k + 1)
+        return None
+
+    def _find_breakout(self, k, handle_high):
+        """Returns the breakout bar in the 10 candles after handle end k, or None."""
+        funnel = self.funnel
+        if funnel is not None:
+            started = funnel.clock()
+        # Detect breakout in a fixed 10-candle window after handle end
+        breakout_stop = min(k + 11, len(self.close))
+        above = self.close[k+1:breakout_stop] > handle_high + self.breakout_margin[k+1:breakout_stop]
+        if not above.any():
+            breakout_idx, rejected = None, 'breakout'
+        else:
+            breakout_idx = k + 1 + int(np.argmax(above))
+            # Ensure bullish breakout occurs above handle's upper resistance
+            if self.close[breakout_idx] <= handle_high:
+                breakout_idx, rejected = None, 'breakout_close'
+        if funnel is not None:
+            if breakout_idx is None:
+                funnel.reject(rejected, k=k)
+            funnel.seconds['breakout'] += funnel.clock() - started
+        return breakout_idx
+
+    def _cup_volume_ok(self, sums, j, i):
+        """
+        True where volume declines into the bottom of cup [j, i]: the mean of
+        its middle third is at most bottom_volume_ratio times that of its
+        first third. j and i may be arrays.
+        """
+        third = np.maximum((i - j + 1) // 3, 1)
+        left = _window_mean(sums, j, j + third - 1)
+        bottom = _window_mean(sums, j + third, np.maximum(i - third, j + third))
+        return ~(bottom > self.bottom_volume_ratio * left)
+
+    def _handle_volume_ok(self, j, i, k):
+        """True where handle [i, k] is quiet: its mean volume is at most handle_volume_ratio times the cup's last third."""
+        third = np.maximum((i - j + 1) // 3, 1)
+        right = _window_mean(self.volume_sums, i - third + 1, i)
+        return ~(_window_mean(self.volume_sums, i, k) > self.handle_volume_ratio * right)
+
+    def _breakout_volume_ok(self, j, i, breakout_idx):
+        """True where the breakout volume is at least breakout_volume_ratio times the mean of cup [j, i]."""
+        return ~(self.volume[breakout_idx] < self.breakout_volume_ratio * _window_mean(self.volume_sums, j, i))
+
+    def _validate_volume(self, cup_segment, breakout_candle):
+        """
+        Volume checks of a cup (a frame slice with 'volume') and its breakout
+        candle, outside the scan: declining volume into the cup bottom and the
+        breakout surge. Returns (valid, reason).
+        """
+        volume = np.asarray(cup_segment['volume'], dtype=np.float64)
+        sums = np.concatenate([[0.0], np.cumsum(volume)])
+        if not self._cup_volume_ok(sums, 0, len(volume) - 1):
+            return False, REJECT_REASONS['cup_volume']
+        if breakout_candle['volume'] < self.breakout_volume_ratio * _window_mean(sums, 0, len(volume) - 1):
+            return False, REJECT_REASONS['breakout_volume']
+        return True, ''
+
+    def _make_records(self, rows):
+        """Builds PATTERN_DTYPE records for (j, i, k, breakout_idx, r_squared) rows."""
+        records = np.zeros(len(rows), dtype=PATTERN_DTYPE)
+        for r, (j, i, k, breakout_idx, r_squared) in zip(records, rows):
+            left_rim_price = self.high[j]
+            right_rim_price = self.high[i]
+            cup_bottom_price = self.close[j:i+1].min()
+            # Handle extrema as the range tables give them (NaNs are ignored)
+            handle_high = np.fmax.reduce(self.high[i:k+1])
+            handle_low = np.fmin.reduce(self.low[i:k+1])
+            _, coeffs = self.fit_engine.fit(j, i)
+            r['cup_start_idx'] = j
+            r['cup_end_idx'] = i
+            r['handle_end_idx'] = k
+            r['breakout_candle_idx'] = breakout_idx
+            r['start_time'] = self.timestamps_int[j]
+            r['end_time'] = self.timestamps_int[breakout_idx]
+            r['r_squared_cup'] = r_squared
+            r['cup_fit_coeffs'] = coeffs
+            r['cup_depth'] = max(left_rim_price, right_rim_price) - cup_bottom_price
+            r['handle_depth'] = handle_high - handle_low
+            r['left_rim_price'] = left_rim_price
+            r['right_rim_price'] = right_rim_price
+            r['cup_bottom_price'] = cup_bottom_price
+            r['handle_high_price'] = handle_high
+            r['breakout_price'] = self.close[breakout_idx]
+        return records
+
+    def _make_pattern(self, j, i, k, breakout_idx, r_squared):
+        """Builds the pattern dict for cup [j, i], handle [i, k] and breakout bar."""
+        return patterns_from_records(self._make_records([(j, i, k, breakout_idx, r_squared)]), self.tz)[0]
+
+    def _make_near_miss(self, j, i, k, r_squared, reason):
+        """Builds an 'Invalid' record for a rejected cup [j, i], with handle [i, k] if one was tried."""
+        left_rim_price = self.high[j]
+        right_rim_price = self.high[i]
+        cup_bottom_price = self.close[j:i+1].min()
+        handle_high = handle_low = np.nan
+        if k is not None:
+            handle_high = self.high_max.query(i, k)
+            handle_low = self.low_min.query(i, k)
+        return {
+            'start_time': self._bar_time(j),
+            'end_time': self._bar_time(i if k is None else k),
+            'cup_start_idx': j,
+            'cup_end_idx': i,
+            'handle_start_idx': i,
+            'handle_end_idx': k,
+            'breakout_candle_idx': None,
+            'cup_depth': max(left_rim_price, right_rim_price) - cup_bottom_price,
+            'cup_duration': i - j + 1,
+            'handle_depth': handle_high - handle_low,
+            'handle_duration': None if k is None else k - i + 1,
+            'r_squared_cup': r_squared,
+            'cup_fit_coeffs': None,
+            'left_rim_price': left_rim_price,
+            'right_rim_price': right_rim_price,
+            'cup_bottom_price': cup_bottom_price,
+            'handle_high_price': handle_high,
+            'breakout_price': np.nan,
+            'breakout_candle_timestamp': None,
+            'status': 'Invalid',
+            'reason': reason
+        }
+
+    def _bar_time(self, idx):
+        ts = pd.Timestamp(int(self.timestamps_int[idx]))
+        if self.tz is not None:
+            ts = ts.tz_localize('UTC').tz_convert(self.tz)
+        return ts
+
+    def _resume_index(self, k, breakout_idx):
+        """Returns the bar to resume scanning from after a pattern."""
+        # Skip ahead after a pattern is found using precomputed timestamps
+        skip_time = self.timestamps_int[breakout_idx] + pd.Timedelta(days=self.skip_days_after_pattern).value
+        future_idx = np.searchsorted(self.timestamps_int, np.int64(skip_time))
+        return max(int(future_idx), k + 1)
+
+    def _scan(self, start=None, last_detected_day=None):
+        """
+        The Python scan loop; returns (j, i, k, breakout_idx, r_squared) per
+        pattern in time order. A scan of bars appended to earlier ones
+        continues from cup end start with the day of the last pattern's cup
+        start (see chunked_scan).
+        """
+        rows = []
+        n = len(self.close)
+        # Start from the earliest index which can possibly form a cup
+        i = self.min_cup_duration if start is None else start
 
         # Use a while loop to allow index skipping after a detected pattern
         while i < n - self.max_handle_duration - 11:  # buffer for handle & breakout
-            cup_found = False
-            # Bound the cup search indices
-            j_start = max(0, i - self.max_cup_duration)
-            j_end = i - self.min_cup_duration
-            for j in range(j_end, j_start - 1, -1):
-                cup_segment = self.data.iloc[j:i+1]
-                if len(cup_segment) < self.min_cup_duration:
-                    continue
-
-                cup_prices = cup_segment['close'].values
-                cup_bottom_local = np.argmin(cup_prices)
-                cup_bottom_price = cup_prices[cup_bottom_local]
-
-                r_squared, _ = self._fit_parabolic_cup(cup_prices)
-                if r_squared < self.min_r2:
-                    continue
-
-                # Rims from cup segment
-                left_rim_price = cup_segment['high'].iloc[0]
-                right_rim_price = cup_segment['high'].iloc[-1]
-                if abs(left_rim_price - right_rim_price) / ((left_rim_price + right_rim_price) / 2) > 0.10:
-                    continue
-
-                cup_depth = max(left_rim_price, right_rim_price) - cup_bottom_price
-                # Use precomputed avg_candle_size instead of per-index DataFrame lookup
-                if cup_depth < 2 * self.avg_candle_size:
-                    continue
-
-                # Now search for a valid handle
-                for k in range(i + self.min_handle_duration, min(i + self.max_handle_duration, n - 11) + 1):
-                    handle_segment = self.data.iloc[i:k+1]
-                    handle_high = handle_segment['high'].max()
-                    handle_low = handle_segment['low'].min()
-
-                    if handle_high > max(left_rim_price, right_rim_price):
-                        continue
-                    handle_retrace = max(left_rim_price, right_rim_price) - handle_low
-                    if handle_retrace > 0.40 * cup_depth:
-                        continue
-                    if handle_low < cup_bottom_price:
-                        continue
-
-                    # Detect breakout in a fixed 10-candle window after handle end
-                    breakout_segment = self.data.iloc[k+1:min(k+11, n)]
-                    # Use vectorized comparison on breakout_segment
-                    cond = breakout_segment['close'] > handle_high + 1.5 * breakout_segment['ATR']
-                    if not cond.any():
-                        continue
-
-                    # Ensure bullish breakout occurs above handle's upper resistance
-                    breakout_price = breakout_segment.loc[cond.idxmax(), 'close']
-                    if breakout_price <= handle_high:
-                        continue
-
-                    # Use the index label directly instead of re-indexing
-                    breakout_idx = cond.idxmax()
-                    pattern_day = cup_segment.index[0].date()
-                    if self.one_pattern_per_day and last_detected_day == pattern_day:
-                        continue
-
-                    pattern = {
-                        'start_time': cup_segment.index[0],
-                        'end_time': breakout_idx,
-                        'cup_start_idx': j,
-                        'cup_end_idx': i,
-                        'handle_start_idx': i,
-                        'handle_end_idx': k,
-                        'breakout_candle_idx': self.data.index.get_loc(breakout_idx),
-                        'cup_depth': cup_depth,
-                        'cup_duration': len(cup_segment),
-                        'handle_depth': handle_high - handle_low,
-                        'handle_duration': len(handle_segment),
-                        'r_squared_cup': r_squared,
-                        'left_rim_price': left_rim_price,
-                        'right_rim_price': right_rim_price,
-                        'cup_bottom_price': cup_bottom_price,
-                        'handle_high_price': handle_high,
-                        'breakout_price': breakout_price,
-                        'breakout_candle_timestamp': breakout_idx,
-                        'status': 'Valid',
-                        'reason': ''
-                    }
-                    patterns.append(pattern)
-                    last_detected_day = pattern_day
-                    # Skip ahead after a pattern is found using precomputed timestamps
-                    skip_time = pd.Timestamp(breakout_idx) + pd.Timedelta(days=self.skip_days_after_pattern)
-                    future_idx = np.searchsorted(self.timestamps_int, np.int64(skip_time.value))
-                    i = max(future_idx, k + 1)
-                    cup_found = True
-                    break  # Exit handle loop once valid handle is found
-                if cup_found:
-                    break  # Cup found, move to next candidate starting at new i
-            if not cup_found:
+            skip_days = (last_detected_day,) if self.one_pattern_per_day else ()
+            candidate = next(self._cup_candidates(i, skip_days), None)
+            if candidate is None:
                 i += 1  # If no cup/handle detected, move forward one step
+                continue
 
-        return patterns
\ No newline at end of file
+            j, k, breakout_idx, r_squared = candidate
+            rows.append((j, i, k, breakout_idx, r_squared))
+            last_detected_day = self.day_ids[j]
+            i = self._resume_index(k, breakout_idx)
+        return rows
+
+    def _exhaustive_scan(self):
+        """
+        Finds every valid cup with its first valid handle, then keeps the
+        best-ranked ones that do not overlap (see interval_nms); returns
+        (j, i, k, breakout_idx, r_squared) rows in time order.
+
+        Each cup end is checked against all cup starts and handle ends at once
+        (_handle_grid), and only the cups passing those checks are fitted. The
+        skip-ahead and one-pattern-per-day rules do not apply.
+        """
+        n = len(self.close)
+        candidates = []
+        for i in range(self.min_cup_duration, n - self.max_handle_duration - 11):
+            grid = self._handle_grid(i)
+            if grid is None:
+                continue
+            ks, breakout_idx, accepts = grid
+            offsets = np.flatnonzero(accepts.any(axis=0))
+            if not len(offsets):
+                continue
+            r_squared = self.fit_engine.r_squared_cols(i, offsets)
+            valid = ~(r_squared < self.min_r2)
+            offsets, r_squared = offsets[valid], r_squared[valid]
+            h = accepts[:, offsets].argmax(axis=0)  # First valid handle of each cup
+            j = i - self.min_cup_duration - offsets
+            candidates.append((j, np.full(len(j), i), ks[h], breakout_idx[h], r_squared))
+        if not candidates:
+            return []
+        j, i, k, breakout_idx, r_squared = (np.concatenate(c) for c in zip(*candidates))
+        if self.rank_by == 'r_squared':
+            scores = r_squared
+        else:
+            # Cup depth, as _make_records computes it
+            bottom = np.array([self.close[a:b + 1].min() for a, b in zip(j, i)])
+            scores = np.maximum(self.high[j], self.high[i]) - bottom
+        keep = suppress_overlaps(j, breakout_idx, scores)
+        return [(int(j[c]), int(i[c]), int(k[c]), int(breakout_idx[c]), r_squared[c]) for c in keep]
+
+    def _kernel_usable(self):
+        """True when the greedy scan can run in the compiled kernel."""
+        return (self.funnel is None and self.use_jit and scan_kernel.available() and not self.exhaustive
+                and not self.volume_confirmation)
+
+    def detect_records(self):
+        """
+        Scans for patterns; returns them as an array of PATTERN_DTYPE records
+        in time order (see patterns_from_records for the dict form).
+        """
+        funnel = self.funnel
+        if funnel is not None:
+            started = funnel.clock()
+            fits_before = self.fit_engine.fits
+        # Unchanged bars and parameters give the patterns of the last run
+        use_cache = self.cache is not None and funnel is None
+        if use_cache:
+            cached, _ = self.cache.get(*self._patterns_key())
+            if cached is not None:
+                return cached
+        compiled = self._kernel_usable()
+        if self.exhaustive:
+            rows = self._exhaustive_scan()
+        else:
+            rows = scan_kernel.scan_patterns(self) if compiled else self._scan()
+        records = self._make_records(rows)
+
+        if use_cache:
+            if not compiled:
+                self._save_fits()  # The kernel fits its cups itself
+            self.cache.put(*self._patterns_key(), records)
+        if funnel is not None:
+            funnel.patterns += len(records)
+            funnel.fits += self.fit_engine.fits - fits_before
+            funnel.seconds['total'] += funnel.clock() - started
+        return records
+
+    def detect_patterns(self):
+        """
+        Scans for patterns; returns their records as dicts in time order. With
+        record_near_misses the 'Invalid' near-miss records are merged in.
+        """
+        patterns = patterns_from_records(self.detect_records(), self.tz)
+        if self.funnel is not None and self.funnel.record_near_misses:
+            return sorted(patterns + self.funnel.near_misses, key=lambda p: p['cup_end_idx'])
+        return patterns
@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from reporting import REPORT_COLUMNS
+
+# Report columns kept per pattern, after its id, symbol and interval
+STORED_COLUMNS = [column for column in REPORT_COLUMNS if column != 'pattern_id']
+TIME_COLUMNS = ['start_time', 'end_time', 'breakout_candle_timestamp']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patterns (
+    id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    cup_depth REAL,
+    cup_duration INTEGER,
+    handle_depth REAL,
+    handle_duration INTEGER,
+    r_squared_cup REAL,
+    breakout_candle_timestamp INTEGER,
+    status TEXT,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS patterns_by_start ON patterns (symbol, interval, start_time);
+CREATE INDEX IF NOT EXISTS patterns_by_breakout ON patterns (symbol, interval, breakout_candle_timestamp);
+"""
+
+
+def _to_ns(times):
+    """Times as naive-UTC nanosecond ints (None for missing times); naive values are taken as UTC."""
+    index = pd.DatetimeIndex(pd.to_datetime(pd.Series(times, dtype=object), utc=True))
+    values = index.tz_localize(None).as_unit('ns').asi8
+    return [None if missing else value for missing, value in zip(index.isna().tolist(), values.tolist())]
+
+
+def _hash_ids(symbols, intervals, starts, breakouts, ends):
+    # Near-misses have no breakout; their cup start and handle end identify them
+    return [hashlib.blake2b((f"{symbol}|{interval}|{s}|{b}" if b is not None else
+                             f"{symbol}|{interval}|{s}|near-miss|{e}").encode(), digest_size=8).hexdigest()
+            for symbol, interval, s, b, e in zip(symbols, intervals, starts, breakouts, ends)]
+
+
+def pattern_ids(symbol, interval, start_time, breakout_time, end_time=None):
+    """
+    Content-stable ids of patterns: a hash of the symbol, interval, cup start
+    and breakout candle time, so the same pattern gets the same id in every
+    run, whatever range was scanned. Near-misses (no breakout time) hash
+    their cup start and end_time, the end of the handle tried instead.
+    Times may be arrays.
+    """
+    starts = _to_ns(np.atleast_1d(start_time))
+    breakouts = _to_ns(np.atleast_1d(breakout_time))
+    ends = [None] * len(starts) if end_time is None else _to_ns(np.atleast_1d(end_time))
+    return _hash_ids([symbol] * len(starts), [interval] * len(starts), starts, breakouts, ends)
+
+
+class PatternStore:
+    """
+    SQLite database of detected patterns accumulated across runs, date
+    ranges, symbols and intervals.
+
+    One row per pattern, keyed by pattern_ids: re-scanning a range updates
+    the patterns found before instead of duplicating them. Times are stored
+    as UTC nanoseconds and indexed per (symbol, interval) by cup start and by
+    breakout candle, so range queries read only the matching index entries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._migrate()
+        self.conn.executescript(_SCHEMA)
+
+    def _migrate(self):
+        """Databases created when breakout_candle_timestamp was NOT NULL get the nullable column."""
+        columns = self.conn.execute("PRAGMA table_info(patterns)").fetchall()
+        if not any(name == 'breakout_candle_timestamp' and notnull for _, name, _, notnull, _, _ in columns):
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE patterns RENAME TO patterns_old")
+            self.conn.execute("DROP INDEX IF EXISTS patterns_by_start")
+            self.conn.execute("DROP INDEX IF EXISTS patterns_by_breakout")
+            self.conn.executescript(_SCHEMA)
+            self.conn.execute("INSERT INTO patterns SELECT * FROM patterns_old")
+            self.conn.execute("DROP TABLE patterns_old")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM patterns').fetchone()[0]
+
+    def upsert(self, report, symbol=None, interval=None):
+        """
+        Inserts or updates the rows of a report DataFrame (see
+        reporting.build_report; other columns are ignored) in one transaction.
+        symbol and interval apply to every row; without them the report must
+        have symbol and interval columns (as batch_scan's does). Near-miss rows
+        (no breakout, e.g. build_near_miss_report's) are stored with a NULL
+        breakout_candle_timestamp. Returns the ids of the rows, in order.
+        """
+        if report.empty:
+            return []
+        symbols = report['symbol'].tolist() if symbol is None else [symbol] * len(report)
+        intervals = report['interval'].tolist() if interval is None else [interval] * len(report)
+        missing = pd.Series([None] * len(report), index=report.index, dtype=object)
+        columns = {column: _to_ns(report.get(column, missing)) for column in TIME_COLUMNS}
+        for column in STORED_COLUMNS:
+            if column not in columns:
+                values = report.get(column, missing).astype(object)
+                columns[column] = values.where(values.notna(), None).tolist()
+        for column in ('cup_duration', 'handle_duration'):
+            columns[column] = [None if v is None else int(v) for v in columns[column]]
+        ids = _hash_ids(symbols, intervals, columns['start_time'], columns['breakout_candle_timestamp'],
+                        columns['end_time'])
+
+        names = ['id', 'symbol', 'interval'] + STORED_COLUMNS
+        sql = (f"INSERT INTO patterns ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+               f"ON CONFLICT(id) DO UPDATE SET "
+               + ', '.join(f"{name} = excluded.{name}" for name in STORED_COLUMNS))
+        with self.conn:
+            self.conn.executemany(sql, zip(ids, symbols, intervals, *(columns[column] for column in STORED_COLUMNS)))
+        return ids
+
+    def query(self, symbol=None, interval=None, start=None, end=None, breakout_start=None,
+              breakout_end=None, status=None, min_r2=None, limit=None):
+        """
+        Returns the stored patterns matching every given filter as a DataFrame
+        ordered by symbol, interval and start time: cups starting in
+        [start, end), breakouts in [breakout_start, breakout_end), a status
+        such as 'Valid' and r_squared_cup >= min_r2. Times are naive UTC.
+        """
+        where, params = [], []
+        for name, value in (('symbol', symbol), ('interval', interval), ('status', status)):
+            if value is not None:
+                where.append(f"{name} = ?")
+                params.append(value)
+        for name, low, high in (('start_time', start, end),
+                                ('breakout_candle_timestamp', breakout_start, breakout_end)):
+            if low is not None:
+                where.append(f"{name} >= ?")
+                params.append(_to_ns([low])[0])
+            if high is not None:
+                where.append(f"{name} < ?")
+                params.append(_to_ns([high])[0])
+        if min_r2 is not None:
+            where.append("r_squared_cup >= ?")
+            params.append(float(min_r2))
+        sql = f"SELECT id, symbol, interval, {', '.join(STORED_COLUMNS)} FROM patterns"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY symbol, interval, start_time"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        rows = self.conn.execute(sql, params).fetchall()
+        result = pd.DataFrame(rows, columns=['id', 'symbol', 'interval'] + STORED_COLUMNS)
+        for column in TIME_COLUMNS:
+            result[column] = pd.to_datetime(result[column].astype('Int64'), unit='ns')  # NULL -> NaT
+        return result.astype({'cup_duration': 'Int64', 'handle_duration': 'Int64'})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the pattern database filled by main.py and batch_scan.py.")
+    parser.add_argument('--db', default=os.path.join('data', 'patterns.db'))
+    parser.add_argument('--symbol', default=None)
+    parser.add_argument('--interval', default=None)
+    parser.add_argument('--start', default=None, help="Cups starting at or after this time, e.g. 2024-03-01")
+    parser.add_argument('--end', default=None, help="Cups starting before this time")
+    parser.add_argument('--status', default=None, help="e.g. Valid")
+    parser.add_argument('--min-r2', type=float, default=None)
+    parser.add_argument('--output', default=None, help="CSV file for the matches (default: print them)")
+    args = parser.parse_args()
+    with PatternStore(args.db) as store:
+        matches = store.query(args.symbol, args.interval, args.start, args.end,
+                              status=args.status, min_r2=args.min_r2)
+    if args.output:
+        matches.to_csv(args.output, index=False)
+        print(f"{len(matches)} patterns saved to {args.output}")
+    else:
+        print(matches.to_string(index=False))
@@ -1,21 +1,37 @@
-
-
 import plotly.graph_objects as go
 import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from scipy.optimize import curve_fit
+from parabola_fit import fit_parabola
+
+# Bump when the chart layout changes so cached images are re-rendered
+RENDER_VERSION = 1
+MANIFEST_FILE = '.render_manifest.json'
 
 def _parabolic_curve(x, a, b, c):
     """Parabolic function for cup fitting."""
     return a * x**2 + b * x + c
 
-def plot_pattern(data, pattern_info, pattern_id, output_dir="patterns", interactive=False):
+def _plot_window(data, pattern_info):
     """
-    Plots a detected Cup and Handle pattern and saves it as an image.
-    Shows R² of the parabolic cup fit on the chart.
+    Returns the bars a chart needs (cup start - 20 .. breakout + 20) and the
+    pattern with its indices shifted into that slice.
     """
-    os.makedirs(output_dir, exist_ok=True)
+    lo = max(0, pattern_info['cup_start_idx'] - 20)
+    hi = min(len(data), pattern_info['breakout_candle_idx'] + 21)
+    shifted = dict(pattern_info)
+    for key in ('cup_start_idx', 'cup_end_idx', 'handle_start_idx', 'handle_end_idx', 'breakout_candle_idx'):
+        shifted[key] = pattern_info[key] - lo
+    return data.iloc[lo:hi][['open', 'high', 'low', 'close']], shifted
 
+def build_pattern_figure(data, pattern_info, pattern_id):
+    """
+    Builds the Plotly figure of a detected Cup and Handle pattern.
+    Shows R² of the parabolic cup fit on the chart; the detector's fit is
+    reused when the pattern carries cup_fit_coeffs.
+    """
     # Extract indices
     cup_start_idx = pattern_info['cup_start_idx']
     cup_end_idx = pattern_info['cup_end_idx']
@@ -26,7 +42,7 @@ def plot_pattern(data, pattern_info, pattern_id, output_dir="patterns", interact
     # Define plot range
     plot_start_idx = max(0, cup_start_idx - 20)
     plot_end_idx = min(len(data) - 1, breakout_candle_idx + 20)
-    plot_data = data.iloc[plot_start_idx:plot_end_idx+1].copy()
+    plot_data = data.iloc[plot_start_idx:plot_end_idx+1]
 
     # Create candlestick chart
     fig = go.Figure(data=[go.Candlestick(
@@ -38,19 +54,19 @@ def plot_pattern(data, pattern_info, pattern_id, output_dir="patterns", interact
         name='OHLC'
     )])
 
-    # Plot Cup Arc with R² calculation
+    # Plot Cup Arc
     cup_segment_data = data.iloc[cup_start_idx:cup_end_idx+1]
     cup_prices = cup_segment_data['close'].values
     x_cup = np.arange(len(cup_prices))
 
-    try:
-        popt, _ = curve_fit(_parabolic_curve, x_cup, cup_prices)
-        y_fit = _parabolic_curve(x_cup, *popt)
+    if pattern_info.get('cup_fit_coeffs') is not None:
+        coeffs = pattern_info['cup_fit_coeffs']
+        r_squared = pattern_info['r_squared_cup']
+    else:
+        r_squared, coeffs = fit_parabola(cup_prices)
 
-        # Calculate R²
-        ss_res = np.sum((cup_prices - y_fit) ** 2)
-        ss_tot = np.sum((cup_prices - np.mean(cup_prices)) ** 2)
-        r_squared = 1 - (ss_res / ss_tot)
+    if coeffs is not None:
+        y_fit = _parabolic_curve(x_cup, *coeffs)
 
         # Add Cup Arc line
         fig.add_trace(go.Scatter(
@@ -71,8 +87,7 @@ def plot_pattern(data, pattern_info, pattern_id, output_dir="patterns", interact
             font=dict(color="blue", size=12, family="Arial"),
             yshift=-30
         )
-
-    except (RuntimeError, ValueError):
+    else:
         print(f"Could not fit parabolic curve for pattern {pattern_id} during plotting.")
 
     # Mark Cup Rims
@@ -131,6 +146,15 @@ def plot_pattern(data, pattern_info, pattern_id, output_dir="patterns", interact
         width=1000,
         hovermode="x unified"
     )
+    return fig
+
+def plot_pattern(data, pattern_info, pattern_id, output_dir="patterns", interactive=False):
+    """
+    Plots a detected Cup and Handle pattern and saves it as an image.
+    Shows R² of the parabolic cup fit on the chart.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    fig = build_pattern_figure(data, pattern_info, pattern_id)
 
     # Save images
     filename_png = os.path.join(output_dir, f"cup_handle_{pattern_id}.png")
@@ -141,3 +165,157 @@ def plot_pattern(data, pattern_info, pattern_id, output_dir="patterns", interact
         filename_html = os.path.join(output_dir, f"cup_handle_{pattern_id}.html")
         fig.write_html(filename_html)
         print(f"Saved interactive plot to {filename_html}")
+
+def pattern_fingerprint(window, pattern_info, pattern_id):
+    """Hash of everything a chart is drawn from: the bars in its window, the pattern and the layout version."""
+    h = hashlib.sha1()
+    h.update(f"{RENDER_VERSION}:{pattern_id}".encode())
+    h.update(window.index.asi8.tobytes())
+    h.update(np.ascontiguousarray(window.to_numpy(dtype=np.float64)).tobytes())
+    h.update(json.dumps(pattern_info, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+class KaleidoWriter:
+    """
+    Exports figures through one headless browser kept open for the life of the process.
+
+    The browser is started on first use in whichever process calls the writer
+    (so a pickled writer starts its own in every pool worker) and renders each
+    batch on `tabs` concurrent pages.
+    """
+
+    def __init__(self, tabs=2):
+        self.tabs = tabs
+        self._loop = None
+        self._kaleido = None
+
+    def __getstate__(self):
+        return {'tabs': self.tabs, '_loop': None, '_kaleido': None}
+
+    def _open(self):
+        import asyncio
+        import kaleido
+        from multiprocessing.util import Finalize
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._kaleido = self._loop.run_until_complete(kaleido.Kaleido(n=self.tabs).__aenter__())
+        except BaseException:
+            self._loop.close()
+            self._loop = None
+            raise
+        # Pool workers skip atexit, so the browser is closed by a multiprocessing finalizer
+        Finalize(self, KaleidoWriter.close, args=(self,), exitpriority=10)
+
+    def __call__(self, figures, paths, scale):
+        if self._kaleido is None:
+            self._open()
+        specs = [dict(fig=fig.to_plotly_json(), path=path,
+                      opts=dict(format='png', width=fig.layout.width, height=fig.layout.height, scale=scale))
+                 for fig, path in zip(figures, paths)]
+        self._loop.run_until_complete(self._kaleido.write_fig_from_object(specs, cancel_on_error=True))
+
+    def close(self):
+        if self._kaleido is not None:
+            self._loop.run_until_complete(self._kaleido.__aexit__(None, None, None))
+            self._loop.close()
+            self._kaleido = None
+            self._loop = None
+
+_renderer = {}
+
+def _start_renderer(writer):
+    """Pool initializer: the worker keeps its writer, and so its browser, for its whole lifetime."""
+    _renderer['writer'] = writer
+
+def _render_batch(batch, scale):
+    """Builds and exports a batch of (window, pattern, pattern_id, path) charts."""
+    figures = [build_pattern_figure(window, pattern, pattern_id) for window, pattern, pattern_id, _ in batch]
+    _renderer['writer'](figures, [path for *_, path in batch], scale)
+    return [path for *_, path in batch]
+
+class ChartRenderer:
+    """
+    Renders pattern charts in batches through a pool of warm exporters.
+
+    Each worker starts a headless browser once and exports whole batches of
+    figures through it, instead of paying browser start-up on every image.
+    Workers only receive the bars around each pattern. A manifest in every
+    output directory records the fingerprint of each image's inputs, so
+    unchanged charts are skipped on later runs. Use as a context manager, or
+    call close() when done; one renderer can serve many datasets.
+
+    writer(figures, paths, scale) does the export and must be picklable;
+    it defaults to a KaleidoWriter.
+    """
+
+    def __init__(self, n_workers=None, batch_size=8, scale=2, skip_unchanged=True, writer=None):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.scale = scale
+        self.skip_unchanged = skip_unchanged
+        self.writer = writer if writer is not None else KaleidoWriter()
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if hasattr(self.writer, 'close'):
+            self.writer.close()  # The in-process browser, if n_workers == 1 started one
+
+    def _map(self, batches):
+        if self.n_workers <= 1:
+            _start_renderer(self.writer)
+            return [_render_batch(batch, self.scale) for batch in batches]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_start_renderer,
+                                             initargs=(self.writer,))
+        return list(self._pool.map(_render_batch, batches, [self.scale] * len(batches)))
+
+    def render(self, data, patterns, output_dir="patterns"):
+        """
+        Renders cup_handle_<pattern_id>.png for every pattern (each needs a
+        'pattern_id') and returns the number of images written.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+        manifest = {}
+        if self.skip_unchanged and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        todo = []
+        fingerprints = {}
+        for pattern in patterns:
+            pattern_id = pattern['pattern_id']
+            path = os.path.join(output_dir, f"cup_handle_{pattern_id}.png")
+            window, shifted = _plot_window(data, pattern)
+            fingerprint = pattern_fingerprint(window, shifted, pattern_id)
+            name = os.path.basename(path)
+            if manifest.get(name) == fingerprint and os.path.exists(path):
+                continue
+            fingerprints[name] = fingerprint
+            todo.append((window, shifted, pattern_id, path))
+
+        batches = [todo[n:n + self.batch_size] for n in range(0, len(todo), self.batch_size)]
+        for written in self._map(batches):
+            for path in written:
+                print(f"Saved {path}")
+        print(f"Rendered {len(todo)} charts, {len(patterns) - len(todo)} unchanged")
+
+        manifest.update(fingerprints)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        return len(todo)
+
+def render_patterns(data, patterns, output_dir="patterns", **renderer_kwargs):
+    """Renders all pattern charts of one dataset; see ChartRenderer."""
+    with ChartRenderer(**renderer_kwargs) as renderer:
+        return renderer.render(data, patterns, output_dir)
@@ -0,0 +1,102 @@
+# Heavy dependencies (NumPy and pandas, talib) are imported by the functions
+# using them, so main.py's `--help` and cached runs stay light
+
+# Detector parameters settable from the command line, with their defaults
+DETECTOR_OPTIONS = {
+    'min_cup_duration': 30,
+    'max_cup_duration': 300,
+    'min_handle_duration': 5,
+    'max_handle_duration': 50,
+    'min_r2': 0.85,
+    'skip_days_after_pattern': 1,
+    'bottom_volume_ratio': 1.0,
+    'handle_volume_ratio': 1.0,
+    'breakout_volume_ratio': 1.5,
+}
+
+def _last_stored_atr(store, symbol, interval):
+    """Open time and ATR of the last bar with a stored ATR, or None; read from the newest partitions."""
+    import numpy as np
+    for day in reversed(store.partitions(symbol, interval)):
+        arrays = store.read_partition(symbol, interval, day, columns=['ATR'])
+        valid = np.flatnonzero(~np.isnan(arrays['ATR']))
+        if len(valid):
+            return int(arrays['open_time'][valid[-1]]), float(arrays['ATR'][valid[-1]])
+    return None
+
+def _pending_atr(store, symbol, interval):
+    """
+    (open times, ATR) of the stored bars whose ATR(14) is not stored yet, or
+    None when the column is up to date: the whole series on first use, else
+    the bars appended since, extended from the last stored value (Wilder's
+    recurrence needs only it and the previous close).
+    """
+    import numpy as np
+    import pandas as pd
+    last = _last_stored_atr(store, symbol, interval) if 'ATR' in store.columns(symbol, interval) else None
+    if last is None:
+        import talib
+        arrays = store.load_arrays(symbol, interval, columns=['high', 'low', 'close'])
+        atr = talib.ATR(*(np.asarray(arrays[col]) for col in ('high', 'low', 'close')), timeperiod=14)
+        return np.asarray(arrays['open_time']), atr
+    # talib leaves only the first 14 bars NaN; bars appended later are NaN too
+    from chunked_scan import WilderATR
+    last_time, last_atr = last
+    tail = store.load_arrays(symbol, interval, start=pd.Timestamp(last_time), columns=['high', 'low', 'close'])
+    if len(tail['close']) < 2:
+        return None
+    state = WilderATR.resume(last_atr, tail['close'][0])
+    atr = state.update(*(np.asarray(tail[col][1:]) for col in ('high', 'low', 'close')))
+    return np.asarray(tail['open_time'][1:]), atr
+
+def update_atr(store, symbol, interval):
+    """
+    Brings the stored ATR(14) column up to date with the stored bars. It is
+    computed over the whole series on first use; only the values of bars
+    appended since are computed and written afterwards (see _pending_atr).
+    """
+    import pandas as pd
+    first_use = 'ATR' not in store.columns(symbol, interval)
+    pending = _pending_atr(store, symbol, interval)
+    if pending is None:
+        return
+    times, atr = pending
+    if first_use:
+        store.write_column(symbol, interval, 'ATR', atr)
+        print(f"Preprocessed ATR saved to {store.root}")
+    else:
+        store.write_column(symbol, interval, 'ATR', atr, start=pd.Timestamp(times[0]))
+        print(f"ATR of {len(atr)} new bars saved to {store.root}")
+
+def preprocess_data(store, symbol, interval, start=None, end=None):
+    """
+    Returns (open times, ATR(14)) of the bars in [start, end), ATR being that
+    of the whole stored series (see update_atr); only the requested range of
+    the stored column is read.
+    """
+    import numpy as np
+    update_atr(store, symbol, interval)
+    arrays = store.load_arrays(symbol, interval, start, end, columns=['ATR'])
+    return np.asarray(arrays['open_time']), np.asarray(arrays['ATR'])
+
+def load_atr(store, symbol, interval, start=None, end=None):
+    """
+    Read-only preprocess_data: returns the same (open times, ATR(14)) of the
+    bars in [start, end) but never writes the store; the ATR of bars not
+    stored yet is computed in memory.
+    """
+    import numpy as np
+    pending = _pending_atr(store, symbol, interval)
+    if pending is None:
+        arrays = store.load_arrays(symbol, interval, start, end, columns=['ATR'])
+        return np.asarray(arrays['open_time']), np.asarray(arrays['ATR'])
+    stored = 'ATR' in store.columns(symbol, interval)
+    arrays = store.load_arrays(symbol, interval, start, end, columns=['ATR'] if stored else [])
+    times = np.asarray(arrays['open_time'])
+    atr = np.array(arrays['ATR'], dtype=np.float64) if stored else np.full(len(times), np.nan)
+    # The pending bars are the newest ones, so those of the range are a suffix of it
+    pending_times, pending_atr = pending
+    at = int(np.searchsorted(times, pending_times[0]))
+    first = int(np.searchsorted(pending_times, times[at])) if at < len(times) else 0
+    atr[at:] = pending_atr[first:first + len(times) - at]
+    return times, atr
@@ -0,0 +1,39 @@
+import numpy as np
+
+
+class SparseTable:
+    """
+    O(1) range max/min queries over a fixed array.
+
+    Level p stores the reduction of every run of 2**p values, so any inclusive
+    range [lo, hi] is covered by two overlapping runs. Passing max_length caps
+    the number of levels for callers that only ever query short ranges, which
+    keeps the table at a few copies of the input on very long series.
+
+    prefix_levels are the levels of a table over the first values (e.g. one
+    cached before bars were appended): they are kept and only the runs
+    reaching the later values are reduced, giving the same levels bit for bit.
+    """
+
+    def __init__(self, values, op='max', max_length=None, prefix_levels=None):
+        if op not in ('max', 'min'):
+            raise ValueError(f"op must be 'max' or 'min', got {op!r}")
+        values = np.asarray(values, dtype=np.float64)
+        self._reduce = np.fmax if op == 'max' else np.fmin
+        n = len(values)
+        limit = n if max_length is None else min(n, max_length)
+        n_levels = max(1, int(limit).bit_length())
+        prefix_levels = prefix_levels or []
+        self.levels = [values]
+        for p in range(1, n_levels):
+            prev = self.levels[-1]
+            half = 1 << (p - 1)
+            kept = prefix_levels[p] if p < len(prefix_levels) else prev[:0]
+            a = len(kept)
+            self.levels.append(np.concatenate([kept, self._reduce(prev[a:-half], prev[a + half:])]))
+
+    def query(self, lo, hi):
+        """Returns the max/min of values[lo:hi+1] (NaNs are ignored)."""
+        p = int(hi - lo + 1).bit_length() - 1
+        level = self.levels[p]
+        return self._reduce(level[lo], level[hi - (1 << p) + 1])
@@ -0,0 +1,286 @@
+import os
+import json
+import base64
+import argparse
+import numpy as np
+import pandas as pd
+from parabola_fit import fit_parabola
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: returns the indices of
+    n_out points of (x, y) that keep its visual shape, always including the
+    first and last point.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("LTTB needs at least 3 output points")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Interior points in n_out - 2 buckets; one point is chosen per bucket
+    edges = np.arange(n_out - 1) * (n - 2) // (n_out - 2) + 1
+    # The third vertex of each bucket's triangles: the next bucket's mean, or the last point
+    counts = np.diff(edges)
+    cxs = np.append(np.add.reduceat(x[:n - 1], edges[:-1])[1:] / counts[1:], x[-1])
+    cys = np.append(np.add.reduceat(y[:n - 1], edges[:-1])[1:] / counts[1:], y[-1])
+    out = [0]
+    # Each bucket keeps the point spanning the largest triangle with the last
+    # kept point, which depends on the previous bucket's choice. Buckets are
+    # a few points wide, so plain floats beat NumPy calls per bucket here
+    xs, ys, edges = x.tolist(), y.tolist(), edges.tolist()
+    for b, (cx, cy) in enumerate(zip(cxs.tolist(), cys.tolist())):
+        xa, ya = xs[out[-1]], ys[out[-1]]
+        best, chosen = -1.0, edges[b]
+        for p in range(edges[b], edges[b + 1]):
+            area = abs((xa - cx) * (ys[p] - ya) - (xa - xs[p]) * (cy - ya))
+            if area > best:
+                best, chosen = area, p
+        out.append(chosen)
+    out.append(n - 1)
+    return np.array(out, dtype=np.intp)
+
+
+def _encode(values, dtype):
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+
+def _utc_ns(times):
+    """Naive-UTC nanosecond integers of datetime-like values (tz-aware ones are converted)."""
+    times = pd.DatetimeIndex(pd.to_datetime(times))
+    if times.tz is not None:
+        times = times.tz_convert('UTC').tz_localize(None)
+    return times.as_unit('ns').asi8
+
+
+def _window(data_times, ohlc, row, start, stop, context_bars, context_points):
+    """
+    Encodes the chart window of one report row whose pattern spans bars
+    [start, stop]: every bar from the cup start to its last bar (the
+    breakout, or the handle end of a near-miss) exactly, and up to
+    context_bars of context on either side downsampled with LTTB to
+    context_points each.
+    """
+    lo = max(0, start - context_bars)
+    hi = min(len(data_times), stop + context_bars + 1)
+    close = ohlc[3]
+    left = lo + lttb(data_times[lo:start], close[lo:start], context_points) if start > lo else np.zeros(0, np.intp)
+    right = stop + 1 + lttb(data_times[stop + 1:hi], close[stop + 1:hi], context_points) if hi > stop + 1 \
+        else np.zeros(0, np.intp)
+    bars = np.concatenate([left, np.arange(start, stop + 1), right])
+
+    cup_end = start + int(row['cup_duration']) - 1
+    marks = {'cup_end': cup_end - start}
+    if not pd.isna(row.get('handle_duration')):
+        marks['handle_end'] = cup_end + int(row['handle_duration']) - 1 - start
+    if not pd.isna(row.get('breakout_candle_timestamp')):
+        marks['breakout'] = stop - start
+    _, coeffs = fit_parabola(close[start:cup_end + 1])
+    t0 = data_times[bars[0]]
+    return {
+        # Core bars are [core, core + n_core) of the encoded bars
+        'core': len(left), 'n_core': stop - start + 1, 'marks': marks,
+        'arc': None if coeffs is None else [float(c) for c in coeffs],
+        't0': int(t0 // 10 ** 6),  # ms since the epoch
+        't': _encode((data_times[bars] - t0) // 10 ** 9, '<i4'),  # Seconds after t0
+        'ohlc': [_encode(values[bars], '<f4') for values in ohlc],
+    }
+
+
+def build_gallery(report, data, output_path='gallery.html', context_bars=240, context_points=60,
+                  title="Cup and Handle patterns"):
+    """
+    Writes one self-contained HTML gallery of the patterns in report (a
+    report DataFrame or a path to report.csv) over data (OHLC frame indexed
+    by time, e.g. CandleStore.load). plotly.js is embedded once; each chart
+    is drawn from its encoded window when scrolled into view. Returns the
+    number of charts.
+    """
+    from plotly.offline import get_plotlyjs
+    if isinstance(report, (str, os.PathLike)):
+        report = pd.read_csv(report, dtype={'pattern_id': str})
+    data_times = _utc_ns(data.index)
+    ohlc = [data[col].to_numpy(dtype=np.float64) for col in ('open', 'high', 'low', 'close')]
+
+    # First and last bar of every pattern
+    start_ns, stop_ns = _utc_ns(report['start_time']), _utc_ns(report['end_time'])
+    starts = np.searchsorted(data_times, start_ns)
+    stops = np.searchsorted(data_times, stop_ns)
+    found = (stops < len(data_times)) & (data_times[np.minimum(starts, len(data_times) - 1)] == start_ns) \
+        & (data_times[np.minimum(stops, len(data_times) - 1)] == stop_ns)
+
+    patterns = []
+    for n, row in enumerate(report.to_dict(orient='records')):
+        if not found[n]:
+            print(f"Skipping pattern {row.get('pattern_id', n + 1)}: its bars are not in the data")
+            continue
+        window = _window(data_times, ohlc, row, int(starts[n]), int(stops[n]), context_bars, context_points)
+        window.update({
+            'id': str(row.get('pattern_id', f"{n + 1:02d}")),
+            'start_time': str(row['start_time']),
+            'status': str(row.get('status', '')),
+            'reason': '' if pd.isna(row.get('reason')) else str(row.get('reason')),
+            'r_squared_cup': float(row['r_squared_cup']),
+            'cup_depth': float(row['cup_depth']),
+        })
+        patterns.append(window)
+
+    payload = json.dumps(patterns, separators=(',', ':')).replace('</', '<\\/')
+    html = (_TEMPLATE.replace('{{title}}', title)
+            .replace('{{plotly}}', get_plotlyjs())
+            .replace('{{patterns}}', payload))
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return len(patterns)
+
+
+_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{{title}}</title>
+<style>
+body { font-family: Arial, sans-serif; margin: 0 auto; max-width: 1040px; }
+#controls { position: sticky; top: 0; background: #fff; padding: 8px 0; border-bottom: 1px solid #ddd; z-index: 1; }
+#controls label { margin-right: 12px; }
+.card { margin: 16px 0; }
+.card h3 { font-size: 15px; margin: 0 0 4px; }
+.chart { height: 420px; }
+</style></head><body>
+<h2>{{title}}</h2>
+<div id="controls">
+  <label>Sort <select id="sort">
+    <option value="r_squared_cup">R²</option><option value="cup_depth">Cup depth</option>
+    <option value="start_time">Start time</option></select></label>
+  <label><input type="checkbox" id="desc" checked> descending</label>
+  <label>R² ≥ <input type="number" id="min_r2" step="0.01" value="0" style="width: 60px"></label>
+  <label>Depth ≥ <input type="number" id="min_depth" step="any" value="0" style="width: 80px"></label>
+  <label>Status <select id="status"><option value="">all</option></select></label>
+  <span id="count"></span>
+</div>
+<div id="gallery"></div>
+<script>{{plotly}}</script>
+<script id="patterns" type="application/json">{{patterns}}</script>
+<script>
+const patterns = JSON.parse(document.getElementById('patterns').textContent);
+const gallery = document.getElementById('gallery');
+
+function decode(text, Type) {
+  const bytes = Uint8Array.from(atob(text), c => c.charCodeAt(0));
+  return new Type(bytes.buffer);
+}
+
+function draw(p, div) {
+  const t = Array.from(decode(p.t, Int32Array), s => p.t0 + s * 1000);
+  const [o, h, l, c] = p.ohlc.map(v => decode(v, Float32Array));
+  const core = [p.core, p.core + p.n_core];
+  const pick = (v, a, b) => Array.from(v.slice(a, b));
+  const traces = [
+    {type: 'candlestick', name: 'OHLC', x: t.slice(...core), open: pick(o, ...core),
+     high: pick(h, ...core), low: pick(l, ...core), close: pick(c, ...core)},
+    {type: 'scatter', mode: 'lines', name: 'Context (downsampled)', line: {color: '#999', width: 1},
+     x: t.slice(0, p.core + 1), y: pick(c, 0, p.core + 1)},
+    {type: 'scatter', mode: 'lines', name: 'Context (downsampled)', showlegend: false,
+     line: {color: '#999', width: 1}, x: t.slice(core[1] - 1), y: pick(c, core[1] - 1)},
+  ];
+  const at = i => p.core + i;
+  if (p.arc) {
+    const xs = [], ys = [];
+    for (let i = 0; i <= p.marks.cup_end; i++) {
+      xs.push(t[at(i)]);
+      ys.push(p.arc[0] * i * i + p.arc[1] * i + p.arc[2]);
+    }
+    traces.push({type: 'scatter', mode: 'lines', name: 'Cup Arc (R²=' + p.r_squared_cup.toFixed(3) + ')',
+                 x: xs, y: ys, line: {color: 'blue', width: 2}});
+  }
+  traces.push({type: 'scatter', mode: 'markers', name: 'Cup Rims', marker: {size: 10, color: 'purple'},
+               x: [t[at(0)], t[at(p.marks.cup_end)]], y: [h[at(0)], h[at(p.marks.cup_end)]]});
+  if (p.marks.handle_end !== undefined) {
+    const a = at(p.marks.cup_end), b = at(p.marks.handle_end) + 1;
+    traces.push({type: 'scatter', mode: 'lines', name: 'Handle', line: {color: 'orange', width: 2},
+                 x: t.slice(a, b), y: pick(c, a, b)});
+  }
+  const shapes = [];
+  if (p.marks.breakout !== undefined) {
+    const x = t[at(p.marks.breakout)];
+    shapes.push({type: 'line', xref: 'x', yref: 'paper', x0: x, x1: x, y0: 0, y1: 1,
+                 line: {color: 'green', width: 2, dash: 'dash'}});
+  }
+  Plotly.newPlot(div, traces, {
+    margin: {t: 20, r: 20, b: 40, l: 60}, xaxis: {type: 'date', rangeslider: {visible: false}},
+    yaxis: {title: 'Price'}, template: 'plotly_white', hovermode: 'x unified', shapes: shapes,
+  }, {responsive: true});
+}
+
+// Charts are drawn the first time their card scrolls near the viewport
+const observer = new IntersectionObserver(entries => {
+  for (const entry of entries) {
+    if (!entry.isIntersecting) continue;
+    observer.unobserve(entry.target);
+    draw(entry.target.pattern, entry.target);
+  }
+}, {rootMargin: '400px'});
+
+const statuses = new Set();
+for (const p of patterns) {
+  const card = document.createElement('div');
+  card.className = 'card';
+  const heading = document.createElement('h3');
+  heading.textContent = `Pattern ${p.id} · ${p.start_time} · R² ${p.r_squared_cup.toFixed(3)} · ` +
+                        `depth ${p.cup_depth.toFixed(2)} · ${p.status}` + (p.reason ? ` (${p.reason})` : '');
+  const div = document.createElement('div');
+  div.className = 'chart';
+  div.pattern = p;
+  card.append(heading, div);
+  card.pattern = p;
+  gallery.append(card);
+  observer.observe(div);
+  statuses.add(p.status);
+}
+for (const s of [...statuses].sort()) {
+  const option = document.createElement('option');
+  option.value = option.textContent = s;
+  document.getElementById('status').append(option);
+}
+
+function update() {
+  const key = document.getElementById('sort').value;
+  const sign = document.getElementById('desc').checked ? -1 : 1;
+  const minR2 = parseFloat(document.getElementById('min_r2').value) || 0;
+  const minDepth = parseFloat(document.getElementById('min_depth').value) || 0;
+  const status = document.getElementById('status').value;
+  const cards = [...gallery.children];
+  cards.sort((a, b) => sign * (a.pattern[key] < b.pattern[key] ? -1 : a.pattern[key] > b.pattern[key] ? 1 : 0));
+  let shown = 0;
+  for (const card of cards) {
+    const p = card.pattern;
+    const visible = p.r_squared_cup >= minR2 && p.cup_depth >= minDepth && (!status || p.status === status);
+    card.style.display = visible ? '' : 'none';
+    shown += visible;
+    gallery.append(card);
+  }
+  document.getElementById('count').textContent = `${shown} of ${patterns.length} patterns`;
+}
+for (const id of ['sort', 'desc', 'min_r2', 'min_depth', 'status']) {
+  document.getElementById(id).addEventListener('input', update);
+}
+update();
+</script></body></html>
+"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a single-file HTML gallery of the patterns in a report.")
+    parser.add_argument('--report', default='report.csv')
+    parser.add_argument('--store', default=os.path.join('data', 'store'))
+    parser.add_argument('--symbol', default='BTCUSDT')
+    parser.add_argument('--interval', default='1m')
+    parser.add_argument('--output', default='gallery.html')
+    parser.add_argument('--context-bars', type=int, default=240, help="Bars of context on each side of a pattern")
+    parser.add_argument('--context-points', type=int, default=60,
+                        help="Points the context on each side is downsampled to")
+    args = parser.parse_args()
+
+    from candle_store import CandleStore
+    data = CandleStore(args.store).load(args.symbol, args.interval, columns=['open', 'high', 'low', 'close'])
+    count = build_gallery(args.report, data, args.output, args.context_bars, args.context_points,
+                          title=f"Cup and Handle patterns: {args.symbol} {args.interval}")
+    print(f"Gallery of {count} patterns saved to {args.output}")
@@ -0,0 +1,43 @@
+import pandas as pd
+
+# Columns of the validation summary report, in order
+REPORT_COLUMNS = [
+    'pattern_id', 'start_time', 'end_time', 'cup_depth', 'cup_duration',
+    'handle_depth', 'handle_duration', 'r_squared_cup',
+    'breakout_candle_timestamp', 'status', 'reason'
+]
+
+
+def report_entry(pattern):
+    """Selects the report fields of a detected pattern (which must have a pattern_id)."""
+    return {column: pattern[column] for column in REPORT_COLUMNS}
+
+
+def build_report(patterns, outcomes=None, **extra_columns):
+    """
+    Builds the report DataFrame; extra_columns (e.g. symbol='BTCUSDT') are
+    prepended as constant columns, and the columns of outcomes (one row per
+    pattern, see outcome_evaluator) appended.
+    """
+    report_df = pd.DataFrame([report_entry(p) for p in patterns], columns=REPORT_COLUMNS)
+    if outcomes is not None:
+        report_df = pd.concat([report_df, outcomes.reset_index(drop=True)], axis=1)
+    for i, (column, value) in enumerate(extra_columns.items()):
+        report_df.insert(i, column, value)
+    return report_df
+
+
+# Columns of the near-miss report written when the scan is instrumented
+NEAR_MISS_COLUMNS = [
+    'start_time', 'end_time', 'cup_start_idx', 'cup_end_idx', 'handle_end_idx',
+    'cup_depth', 'cup_duration', 'handle_depth', 'handle_duration', 'r_squared_cup',
+    'status', 'reason'
+]
+
+
+def build_near_miss_report(near_misses):
+    """Builds a DataFrame of rejected near-miss records (status 'Invalid')."""
+    report_df = pd.DataFrame([{column: p[column] for column in NEAR_MISS_COLUMNS} for p in near_misses],
+                             columns=NEAR_MISS_COLUMNS)
+    # Cups rejected before a handle was tried have no handle
+    return report_df.astype({'handle_end_idx': 'Int64', 'handle_duration': 'Int64'})
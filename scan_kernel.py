@@ -0,0 +1,187 @@
+"""
+Compiled scan loop for PatternDetector.detect_patterns.
+
+_scan is written in the subset of Python that Numba compiles: it takes the
+detector's raw arrays and parameters and returns the (j, i, k, breakout)
+bar indices and R² of every pattern, leaving the pattern records to the
+detector. Every check repeats the expression the Python scan uses, in the
+same order of floating point operations (including the fit engine's
+summation order), so both return identical patterns. Numba is optional:
+without it, `available()` is False and the detector keeps its Python scan.
+Numba is only imported, and the scan compiled, on first use, so processes
+that never scan (e.g. runs answered from the feature cache) don't load it.
+"""
+import importlib.util
+import numpy as np
+
+# Placeholder for the compiled scan until its first use; None without Numba
+_NOT_COMPILED = object()
+
+
+def _r_squared(close, j, i, inv_normal):
+    """R² of the parabola fit of close[j..i], as ParabolaFitEngine computes it."""
+    span = i - j
+    y_i = close[i]
+    t0 = 0.0
+    t1 = 0.0
+    t2 = 0.0
+    q = 0.0
+    for t in range(span + 1):
+        y = close[i - t] - y_i
+        tf = float(t)
+        t0 += y
+        t1 += y * tf
+        t2 += y * (tf * tf)
+        q += y * y
+    scale = 1.0 / max(span, 1)
+    m0 = t0
+    m1 = t1 * scale
+    m2 = t2 * (scale * scale)
+    b0 = inv_normal[0, 0] * m0 + inv_normal[0, 1] * m1 + inv_normal[0, 2] * m2
+    b1 = inv_normal[1, 0] * m0 + inv_normal[1, 1] * m1 + inv_normal[1, 2] * m2
+    b2 = inv_normal[2, 0] * m0 + inv_normal[2, 1] * m1 + inv_normal[2, 2] * m2
+    ss_res = max(q - (b0 * m0 + b1 * m1 + b2 * m2), 0.0)
+    ss_tot = q - t0 * t0 / (span + 1)
+    if not (ss_tot > 0 and span >= 2):
+        return -1.0  # Flat windows and windows too short to fit count as failed fits
+    return 1 - ss_res / ss_tot
+
+
+def _scan(close, high, low, breakout_margin, day_ids, times, inv_normal,
+          min_cup, max_cup, min_handle, max_handle, min_r2, skip_ns, one_pattern_per_day, avg_candle_size,
+          start, last_day, have_day):
+    """
+    Runs the scan from cup end start, as if the last pattern's cup started on
+    day last_day (if have_day); returns (rows, r_squared) where each row of
+    rows is (cup start j, cup end i, handle end k, breakout bar) of one pattern.
+    """
+    n = len(close)
+    capacity = n // (min_handle + 1) + 1  # Each pattern moves the scan past its handle
+    rows = np.empty((capacity, 4), dtype=np.int64)
+    r_squared_out = np.empty(capacity)
+    count = 0
+    handle_high = np.empty(max_handle + 1)
+    handle_low = np.empty(max_handle + 1)
+    breakout_at = np.empty(max_handle + 1, dtype=np.int64)
+    handle_ends = np.empty(max_handle + 1, dtype=np.int64)
+
+    i = start
+    while i < n - max_handle - 11:
+        j_start = max(0, i - max_cup)
+        j_end = i - min_cup
+        first_k = i + min_handle
+        last_k = min(i + max_handle, n - 11)
+
+        # Handle ends whose handle breaks out; they only depend on k
+        n_handles = 0
+        hh = high[i]
+        hl = low[i]
+        for k in range(i + 1, last_k + 1):
+            if high[k] > hh or hh != hh:
+                hh = high[k]
+            if low[k] < hl or hl != hl:
+                hl = low[k]
+            if k < first_k:
+                continue
+            b = k + 1
+            while b < k + 11 and not close[b] > hh + breakout_margin[b]:
+                b += 1
+            if b == k + 11 or close[b] <= hh:
+                continue
+            handle_ends[n_handles] = k
+            handle_high[n_handles] = hh
+            handle_low[n_handles] = hl
+            breakout_at[n_handles] = b
+            n_handles += 1
+
+        found = False
+        if n_handles > 0:
+            bottom = close[j_end]
+            for x in range(j_end + 1, i + 1):
+                if bottom == bottom and not (close[x] >= bottom):
+                    bottom = close[x]
+            right = high[i]
+            for j in range(j_end, j_start - 1, -1):
+                if j < j_end and bottom == bottom and not (close[j] >= bottom):
+                    bottom = close[j]
+                if one_pattern_per_day and have_day and day_ids[j] == last_day:
+                    continue
+                left = high[j]
+                if abs(left - right) / ((left + right) / 2) > 0.10:
+                    continue
+                rim = right if right > left else left
+                depth = rim - bottom
+                if depth < 2 * avg_candle_size:
+                    continue
+                h = 0
+                while h < n_handles:
+                    if not (handle_high[h] > rim or rim - handle_low[h] > 0.40 * depth
+                            or handle_low[h] < bottom):
+                        break
+                    h += 1
+                if h == n_handles:
+                    continue
+                r_squared = _r_squared(close, j, i, inv_normal[i - j - min_cup])
+                if r_squared < min_r2:
+                    continue
+                rows[count, 0] = j
+                rows[count, 1] = i
+                rows[count, 2] = handle_ends[h]
+                rows[count, 3] = breakout_at[h]
+                r_squared_out[count] = r_squared
+                count += 1
+                last_day = day_ids[j]
+                have_day = True
+                found = True
+                k = handle_ends[h]
+                resume = np.searchsorted(times, times[breakout_at[h]] + skip_ns)
+                i = max(resume, k + 1)
+                break
+        if not found:
+            i += 1
+    return rows[:count], r_squared_out[:count]
+
+
+_scan_compiled = _NOT_COMPILED if importlib.util.find_spec('numba') is not None else None  # Optional dependency
+
+
+def _compiled():
+    global _r_squared, _scan_compiled
+    if _scan_compiled is _NOT_COMPILED:
+        import numba
+        # Without the GIL, scans in threads (see detection_service) run in parallel
+        _r_squared = numba.njit(cache=True, nogil=True)(_r_squared)
+        _scan_compiled = numba.njit(cache=True, nogil=True)(_scan)
+    return _scan_compiled
+
+
+def available():
+    """True when Numba is installed and the compiled scan can be used."""
+    return _scan_compiled is not None
+
+
+def scan_patterns(detector, compiled=True, start=None, last_detected_day=None):
+    """
+    Runs the scan over a PatternDetector's arrays; returns a list of
+    (j, i, k, breakout_idx, r_squared). start and last_detected_day continue
+    a scan as PatternDetector._scan does. compiled=False runs the same loop
+    as plain Python (slow; for tests and debugging).
+    """
+    scan = _compiled() if compiled else _scan
+    if scan is None:
+        raise RuntimeError("Numba is not installed")
+    engine = detector.fit_engine
+    # inv_normal rows are indexed by i - j - min_cup_duration, as the engine's columns
+    inv_normal = engine._inv_normal[detector.min_cup_duration - engine.min_span:]
+    skip_ns = int(np.timedelta64(detector.skip_days_after_pattern, 'D') / np.timedelta64(1, 'ns'))
+    rows, r_squared = scan(
+        np.ascontiguousarray(detector.close, dtype=np.float64),
+        np.ascontiguousarray(detector.high, dtype=np.float64),
+        np.ascontiguousarray(detector.low, dtype=np.float64),
+        detector.breakout_margin, detector.day_ids, detector.timestamps_int, inv_normal,
+        detector.min_cup_duration, detector.max_cup_duration,
+        detector.min_handle_duration, detector.max_handle_duration,
+        float(detector.min_r2), skip_ns, bool(detector.one_pattern_per_day), float(detector.avg_candle_size),
+        detector.min_cup_duration if start is None else int(start),
+        0 if last_detected_day is None else int(last_detected_day), last_detected_day is not None)
+    return [(int(j), int(i), int(k), int(b), r) for (j, i, k, b), r in zip(rows, r_squared)]
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from pattern_detector import PatternDetector
+from parabola_fit import ParabolaFitEngine
+
+# Detector options the per-candle scan cannot honour: it runs the greedy
+# scan uninstrumented, without the kernel, cache or volume stage
+_UNSUPPORTED_OPTIONS = ['exhaustive', 'volume_confirmation', 'use_jit', 'instrument', 'record_near_misses', 'cache']
+
+
+class StreamingPatternDetector(PatternDetector):
+    """
+    Incremental counterpart to PatternDetector for live candle feeds.
+
+    Keeps a ring buffer of the last max_cup_duration + max_handle_duration + 11
+    bars. A cup ending at bar i is decided as soon as bar
+    i + max_handle_duration + 10, the last one its handle and breakout checks
+    read, has closed (the batch scan also waits for the bar after it), so each
+    push() evaluates exactly one cup end and the work per candle does not grow
+    with history. ATR(14) is updated with Wilder's recurrence, as talib.ATR
+    computes it.
+
+    Detector options are those of PatternDetector, except the ones listed in
+    _UNSUPPORTED_OPTIONS, which raise ValueError.
+
+    The batch scan uses the mean candle size of the whole frame; pass that value
+    as avg_candle_size to reproduce its patterns exactly, otherwise the running
+    mean of the candles seen so far is used.
+    """
+
+    def __init__(self,
+                 min_cup_duration=30,
+                 max_cup_duration=300,
+                 min_handle_duration=5,
+                 max_handle_duration=50,
+                 min_r2=0.85,
+                 skip_days_after_pattern=1,
+                 one_pattern_per_day=True,
+                 avg_candle_size=None,
+                 atr_period=14,
+                 **options):
+        unsupported = [name for name in _UNSUPPORTED_OPTIONS if options.get(name)]
+        if unsupported:
+            raise ValueError(f"The streaming detector does not support {', '.join(unsupported)}")
+        # Options are set up over an empty series; the scan arrays are pointed
+        # at the ring buffer on every push
+        empty = np.zeros(0)
+        super().__init__({'open_time': np.zeros(0, dtype=np.int64), 'high': empty, 'low': empty, 'close': empty},
+                         min_cup_duration=min_cup_duration, max_cup_duration=max_cup_duration,
+                         min_handle_duration=min_handle_duration, max_handle_duration=max_handle_duration,
+                         min_r2=min_r2, skip_days_after_pattern=skip_days_after_pattern,
+                         one_pattern_per_day=one_pattern_per_day, atr=empty, avg_candle_size=avg_candle_size,
+                         **dict(options, use_jit=False))
+        self.fixed_avg_candle_size = avg_candle_size
+        self.atr_period = atr_period
+
+        self.window = max_cup_duration + max_handle_duration + 11
+        # Every bar is written twice, so the last `window` bars are always one
+        # contiguous slice of each buffer
+        self._prices = np.full((4, 2 * self.window), np.nan)  # high, low, close, ATR
+        self._times = np.zeros(2 * self.window, dtype=np.int64)
+        self._days = np.zeros(2 * self.window, dtype=np.int64)
+        self.tz = None
+        self.bar_count = 0
+        self._range_sum = 0.0
+
+        # Wilder ATR state
+        self._prev_close = None
+        self._tr_sum = 0.0
+        self._tr_count = 0
+        self._atr = np.nan
+
+        # Skip-ahead state of the scan
+        self._resume_bar = min_cup_duration
+        self._resume_time = None
+        self.last_detected_day = None
+
+        self.fit_engine = ParabolaFitEngine(empty, min_cup_duration, max_cup_duration, block_size=1)
+
+    def _update_atr(self, high, low):
+        if self._prev_close is None:
+            return np.nan  # No true range for the first candle
+        true_range = max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+        if self._tr_count < self.atr_period:
+            self._tr_sum += true_range
+            self._tr_count += 1
+            if self._tr_count == self.atr_period:
+                self._atr = self._tr_sum / self.atr_period
+        else:
+            self._atr = (self._atr * (self.atr_period - 1) + true_range) / self.atr_period
+        return self._atr
+
+    def _evaluate(self, i):
+        """Runs the scan for cup end bar i over the buffered bars."""
+        t = self.bar_count
+        offset = max(0, t - self.window)
+        start = offset % self.window
+        view = slice(start, start + t - offset)
+        high, low, close, atr = self._prices[:, view]
+        self._index_arrays(high, low, close, atr)
+        self.timestamps_int = self._times[view]
+        self.day_ids = self._days[view]
+        if self.fixed_avg_candle_size is None:
+            self.avg_candle_size = self._range_sum / t
+
+        skip_days = (self.last_detected_day,) if self.one_pattern_per_day else ()
+        candidate = next(self._cup_candidates(i - offset, skip_days), None)
+        if candidate is None:
+            return None
+
+        j, k, breakout_idx, r_squared = candidate
+        pattern = self._make_pattern(j, i - offset, k, breakout_idx, r_squared)
+        for key in ('cup_start_idx', 'cup_end_idx', 'handle_start_idx', 'handle_end_idx', 'breakout_candle_idx'):
+            pattern[key] += offset
+        self.last_detected_day = self.day_ids[j]
+        self._resume_bar = k + offset + 1
+        self._resume_time = self.timestamps_int[breakout_idx] + pd.Timedelta(days=self.skip_days_after_pattern).value
+        return pattern
+
+    def push(self, candle, timestamp=None):
+        """
+        Adds one closed candle and returns the patterns it completes (0 or 1).
+
+        candle needs 'high', 'low' and 'close'; timestamp defaults to its name,
+        so rows from DataFrame.iterrows() can be pushed directly.
+        """
+        ts = pd.Timestamp(candle.name if timestamp is None else timestamp)
+        high, low, close = float(candle['high']), float(candle['low']), float(candle['close'])
+        atr = self._update_atr(high, low)
+        self._prev_close = close
+        self._range_sum += high - low
+        if self.bar_count == 0:
+            self.tz = ts.tz
+        pos = self.bar_count % self.window
+        for p in (pos, pos + self.window):
+            self._prices[:, p] = (high, low, close, atr)
+            self._times[p] = ts.value
+            self._days[p] = ts.normalize().value
+        self.bar_count += 1
+
+        # This candle is the last one the handle and breakout checks of cup end i read
+        patterns = []
+        i = self.bar_count - self.max_handle_duration - 11
+        if i >= self._resume_bar:
+            i_time = self._times[i % self.window]
+            if self._resume_time is None or i_time >= self._resume_time:
+                pattern = self._evaluate(i)
+                if pattern is not None:
+                    patterns.append(pattern)
+        return patterns
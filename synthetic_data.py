@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+PLANTED_COLUMNS = ['cup_start_idx', 'cup_end_idx', 'handle_end_idx', 'breakout_candle_idx']
+
+# Volatility of the calm lead-in before each planted pattern, relative to the walk's
+CALM_VOLATILITY = 0.02
+
+
+def _random_walk(rng, n, start_price, volatility, calm=None, tail_dof=4):
+    """
+    Log-price random walk with fat-tailed (Student t) returns and slowly
+    drifting volatility, its moves damped to CALM_VOLATILITY on the bars
+    flagged in calm; returns open, close and per-bar sigma (undamped).
+    """
+    # Volatility regimes: a detrended random walk in log space around `volatility`
+    log_vol = np.cumsum(rng.normal(0, 0.02, n))
+    log_vol -= np.convolve(log_vol, np.ones(1000) / 1000, mode='same')
+    sigma = volatility * np.exp(np.clip(log_vol, -0.5, 0.5))
+    shocks = rng.standard_t(tail_dof, n) * np.sqrt((tail_dof - 2) / tail_dof)
+    if calm is not None:
+        shocks = np.where(calm, CALM_VOLATILITY * shocks, shocks)
+    log_close = np.log(start_price) + np.cumsum(shocks * sigma)
+    close = np.exp(log_close)
+    open_ = np.r_[start_price, close[:-1]]
+    return open_, close, sigma
+
+
+def _planted_shape(rng, price, sigma):
+    """
+    Returns (closes, cup_len, handle_len) for one cup-and-handle starting at
+    `price`: a parabolic cup, a shallow drifting handle and a breakout bar.
+
+    Depths are 6-10 typical bar moves, like the cups found in real 1m data.
+    Cups are long enough that their right side rises slower than the
+    detector's 1.5 * ATR breakout threshold, so only the planted breakout
+    bar triggers it.
+    """
+    noise = sigma * price
+    cup_len = int(rng.integers(120, 280))
+    handle_len = int(rng.integers(10, 35))
+    depth = noise * rng.uniform(6, 10)
+
+    x = np.linspace(-1, 1, cup_len)
+    cup = price - depth * (1 - x ** 2) + rng.normal(0, 0.5 * noise, cup_len)
+    cup[0] = cup[-1] = price
+
+    # The handle drifts down by 10-20% of the depth and stays under the rim
+    drift = np.linspace(0, rng.uniform(0.10, 0.20) * depth, handle_len + 1)[1:]
+    handle = np.minimum(price - drift + rng.normal(0, 0.3 * noise, handle_len), price - 0.5 * noise)
+
+    # A strong candle clears the handle high by several typical bar moves
+    breakout = price + 5 * noise
+    return np.r_[cup, handle, breakout], cup_len, handle_len
+
+
+def generate_ohlcv(n_bars, n_patterns=None, seed=0, start='2024-01-01', freq='1min',
+                   start_price=42000.0, volatility=0.0008, lead_in=None):
+    """
+    Builds a BTC-like OHLCV random walk with planted cup-and-handle patterns.
+
+    Patterns are planted at random offsets in equal slots of the series (one
+    per slot, default one per 5000 bars). Each is preceded by lead_in calm
+    bars (default one day plus the detector's longest cup, handle and
+    breakout window): too flat for a cup to pass the depth check, so no
+    pattern detected before it, planted or not, has its skip-ahead (see
+    PatternDetector._resume_index) or one-pattern-per-day rule reach into it.
+    Returns (data, planted) where planted is a DataFrame with one row per
+    planted pattern and the PLANTED_COLUMNS bar indices.
+    """
+    rng = np.random.default_rng(seed)
+    if n_patterns is None:
+        n_patterns = n_bars // 5000
+    if lead_in is None:
+        lead_in = int(pd.Timedelta(days=1) / pd.Timedelta(freq)) + 300 + 50 + 10
+    slot = n_bars // max(n_patterns, 1)
+    if n_patterns and slot < lead_in + 1200:
+        raise ValueError(f"{n_patterns} patterns do not fit in {n_bars} bars "
+                         f"(need {lead_in + 1200} bars each)")
+
+    starts = [p * slot + int(rng.integers(lead_in, slot - 800)) for p in range(n_patterns)]
+    calm = np.zeros(n_bars, dtype=bool)
+    for at in starts:
+        calm[at - lead_in:at] = True
+    open_, close, sigma = _random_walk(rng, n_bars, start_price, volatility, calm)
+    planted = []
+    for at in starts:
+        shape, cup_len, handle_len = _planted_shape(rng, close[at - 1], sigma[at])
+        end = at + len(shape)
+        # Splice the shape in and carry the rest of the walk on from its last close
+        tail_scale = shape[-1] / close[end - 1]
+        close[at:end] = shape
+        close[end:] *= tail_scale
+        planted.append((at, at + cup_len - 1, at + cup_len + handle_len - 1, end - 1))
+    open_[1:] = close[:-1]
+
+    # Wicks scale with the local volatility; calm bars keep full-size wicks
+    wick = np.abs(rng.normal(0, 0.3, (2, n_bars))) * sigma * close
+    high = np.maximum(open_, close) + wick[0]
+    low = np.minimum(open_, close) - wick[1]
+    for cup_start, cup_end, handle_end, _ in planted:
+        # Keep handle wicks under the higher rim, as in a textbook handle
+        rim = max(high[cup_start], high[cup_end])
+        high[cup_end + 1:handle_end + 1] = np.minimum(high[cup_end + 1:handle_end + 1], rim)
+
+    volume = rng.lognormal(3.0, 0.6, n_bars) * (1 + np.abs(close - open_) / (sigma * close))
+    for _, _, _, breakout in planted:
+        volume[breakout] *= 5
+
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='open_time')
+    data = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+    return data, pd.DataFrame(planted, columns=PLANTED_COLUMNS)
+
+
+def oscillating_ohlcv(n_bars, seed=3, start='2024-01-01', freq='5min'):
+    """
+    Builds a noisy oscillating series (a random walk plus a sine of about
+    94 bars) that forms many overlapping cups with the detector's short-cup
+    test parameters; the workhorse of the tests comparing scan variants.
+    """
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.3, n_bars)) + 3 * np.sin(np.arange(n_bars) / 15)
+    high = close + rng.uniform(0.05, 0.3, n_bars)
+    low = close - rng.uniform(0.05, 0.3, n_bars)
+    volume = rng.uniform(1, 10, n_bars)
+    index = pd.date_range(start, periods=n_bars, freq=freq, name='open_time')
+    return pd.DataFrame({'open': close, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+
+def match_planted(patterns, planted):
+    """
+    Marks which planted patterns were found; returns a boolean array aligned
+    with planted.
+
+    The scan takes the first cup end that qualifies, which is often a few bars
+    up the planted cup's right side, so a detected pattern matches when its
+    breakout lies within the planted pattern (up to 10 bars after the planted
+    breakout) and its cup covers at least half of the planted cup.
+    """
+    found = np.zeros(len(planted), dtype=bool)
+    if not patterns:
+        return found
+    detected = pd.DataFrame(patterns)[['cup_start_idx', 'cup_end_idx', 'breakout_candle_idx']].to_numpy()
+    detected = detected[np.argsort(detected[:, 2])]
+    for p, (cup_start, cup_end, _, breakout) in enumerate(planted[PLANTED_COLUMNS].to_numpy()):
+        lo = np.searchsorted(detected[:, 2], cup_start, side='left')
+        hi = np.searchsorted(detected[:, 2], breakout + 10, side='right')
+        for j, i, _ in detected[lo:hi]:
+            overlap = min(i, cup_end) - max(j, cup_start) + 1
+            if overlap >= 0.5 * (cup_end - cup_start + 1):
+                found[p] = True
+                break
+    return found
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+import talib
+from batch_scan import run_batch, ScanJob, _parse_job
+from candle_store import CandleStore
+from pattern_detector import PatternDetector
+from pattern_store import PatternStore
+from synthetic_data import oscillating_ohlcv
+
+class TestBatchScan(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CandleStore(self.tmp.name)
+        self.params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7)
+        for seed, symbol in enumerate(['BTCUSDT', 'ETHUSDT']):
+            self.store.append(symbol, '5m', oscillating_ohlcv(1000, seed=seed))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_consolidated_report_matches_per_job_scans(self):
+        jobs = [('BTCUSDT', '5m', None, None), ('ETHUSDT', '5m', '2024-01-01 12:00', '2024-01-03')]
+        report_file = os.path.join(self.tmp.name, 'report.csv')
+        pattern_db = os.path.join(self.tmp.name, 'patterns.db')
+        report, stats = run_batch(jobs, self.store, report_file, n_workers=2, pattern_db=pattern_db, **self.params)
+        self.assertTrue(os.path.exists(report_file))
+        with PatternStore(pattern_db) as db:
+            self.assertEqual(len(db), len(report))
+            self.assertEqual(len(db.query('ETHUSDT', '5m')), (report['symbol'] == 'ETHUSDT').sum())
+        self.assertEqual(list(stats['bars']), [1000, len(self.store.load('ETHUSDT', '5m', jobs[1][2], jobs[1][3]))])
+        self.assertTrue((stats['bars_per_sec'] > 0).all())
+        for symbol, interval, start, end in jobs:
+            # Ranges are scanned with the whole series' ATR, as main.py scans them
+            full = self.store.load(symbol, interval)
+            atr = talib.ATR(full['high'], full['low'], full['close'], timeperiod=14)
+            df = self.store.load(symbol, interval, start, end)
+            expected = PatternDetector(df, atr=atr[df.index].values, **self.params).detect_patterns()
+            rows = report[report['symbol'] == symbol]
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(list(rows['start_time']), [p['start_time'] for p in expected])
+            self.assertEqual(list(rows['r_squared_cup']), [p['r_squared_cup'] for p in expected])
+            self.assertTrue((rows['interval'] == interval).all())
+
+    def test_parse_job(self):
+        self.assertEqual(_parse_job('BTCUSDT,1m'), ScanJob('BTCUSDT', '1m', None, None))
+        self.assertEqual(_parse_job('BTCUSDT,1m,,2024-02-01 12:00'), ScanJob('BTCUSDT', '1m', None, '2024-02-01 12:00'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from candle_store import CandleStore
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CandleStore(self.tmp.name)
+        n = 3 * 1440
+        close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 0.5, n))
+        self.df = pd.DataFrame({
+            'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+            'volume': np.arange(n, dtype=float),
+        }, index=pd.date_range('2024-01-01', periods=n, freq='1min', name='open_time', unit='ns'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_import_csv_and_range_load(self):
+        path = os.path.join(self.tmp.name, 'raw.csv')
+        self.df.to_csv(path)
+        self.assertEqual(self.store.import_csv(path, 'BTCUSDT', '1m', chunksize=1000), len(self.df))
+        self.assertEqual(self.store.partitions('BTCUSDT', '1m'), ['2024-01-01', '2024-01-02', '2024-01-03'])
+        pd.testing.assert_frame_equal(self.store.load('BTCUSDT', '1m'), self.df, check_freq=False)
+        subset = self.store.load('BTCUSDT', '1m', '2024-01-02 12:00', '2024-01-03', columns=['close'])
+        pd.testing.assert_frame_equal(subset, self.df.loc['2024-01-02 12:00':'2024-01-02 23:59', ['close']], check_freq=False)
+        self.assertEqual(self.store.partitions('BTCUSDT', '1m', '2024-01-02 12:00', '2024-01-03'), ['2024-01-02'])
+        # Arrays of one day stay memory-mapped; longer ranges are concatenated
+        arrays = self.store.load_arrays('BTCUSDT', '1m', '2024-01-02 12:00', '2024-01-03', columns=['close'])
+        self.assertIsInstance(arrays['close'], np.memmap)
+        np.testing.assert_array_equal(arrays['close'], subset['close'].values)
+        np.testing.assert_array_equal(arrays['open_time'], subset.index.asi8)
+        arrays = self.store.load_arrays('BTCUSDT', '1m')
+        np.testing.assert_array_equal(arrays['volume'], self.df['volume'].values)
+
+    def test_append_only_new_bars(self):
+        self.store.append('BTCUSDT', '1m', self.df.iloc[:2000])
+        day_one = os.path.join(self.tmp.name, 'BTCUSDT', '1m', '2024-01-01', 'close.bin')
+        before = os.path.getmtime(day_one)
+        # Overlapping fetch: only bars after the last stored one are written
+        self.assertEqual(self.store.append('BTCUSDT', '1m', self.df.iloc[1500:]), len(self.df) - 2000)
+        self.assertEqual(os.path.getmtime(day_one), before, "Closed partitions must not be rewritten")
+        self.assertEqual(self.store.append('BTCUSDT', '1m', self.df.iloc[-10:]), 0)
+        pd.testing.assert_frame_equal(self.store.load('BTCUSDT', '1m'), self.df, check_freq=False)
+        self.assertEqual(self.store.last_timestamp('BTCUSDT', '1m'), self.df.index[-1])
+
+    def test_interrupted_append_and_derived_column(self):
+        self.store.append('BTCUSDT', '1m', self.df.iloc[:100])
+        # Simulate a crash after writing a value column but before open_time
+        with open(os.path.join(self.tmp.name, 'BTCUSDT', '1m', '2024-01-01', 'close.bin'), 'ab') as f:
+            f.write(np.zeros(5).tobytes())
+        self.store.append('BTCUSDT', '1m', self.df.iloc[100:200])
+        pd.testing.assert_frame_equal(self.store.load('BTCUSDT', '1m'), self.df.iloc[:200], check_freq=False)
+
+        self.store.write_column('BTCUSDT', '1m', 'ATR', np.arange(200.0))
+        self.store.append('BTCUSDT', '1m', self.df.iloc[200:210])
+        atr = self.store.load('BTCUSDT', '1m', columns=['ATR'])['ATR'].values
+        np.testing.assert_array_equal(atr[:200], np.arange(200.0))
+        self.assertTrue(np.isnan(atr[200:]).all(), "Derived column is NaN for bars appended later")
+        with self.assertRaises(ValueError):
+            self.store.write_column('BTCUSDT', '1m', 'close', np.zeros(210))
+
+        # Only the partitions from start on are rewritten; earlier bars keep their values
+        self.store.append('BTCUSDT', '1m', self.df.iloc[210:])
+        first_day = os.path.join(self.tmp.name, 'BTCUSDT', '1m', '2024-01-01', 'ATR.bin')
+        before = os.stat(first_day).st_mtime_ns
+        start = self.df.index[1500]
+        self.store.write_column('BTCUSDT', '1m', 'ATR', -np.ones(len(self.df) - 1500), start=start)
+        atr = self.store.load('BTCUSDT', '1m', columns=['ATR'])['ATR'].values
+        np.testing.assert_array_equal(atr[:200], np.arange(200.0))
+        self.assertTrue(np.isnan(atr[200:1500]).all())
+        self.assertTrue((atr[1500:] == -1).all())
+        self.assertEqual(os.stat(first_day).st_mtime_ns, before)
+        with self.assertRaises(ValueError):
+            self.store.write_column('BTCUSDT', '1m', 'ATR', np.zeros(3), start=start)
+
+if __name__ == '__main__':
+    unittest.main()
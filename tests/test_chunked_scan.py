@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+import numpy as np
+import talib
+from candle_store import CandleStore
+from chunked_scan import WilderATR, scan_blocks, scan_store
+from pattern_detector import PatternDetector
+from synthetic_data import generate_ohlcv
+
+def _blocks(df, block_size, atr=None):
+    arrays = {'open_time': df.index.as_unit('ns').asi8, **{col: df[col].values for col in ('high', 'low', 'close', 'volume')}}
+    if atr is not None:
+        arrays['ATR'] = atr
+    for a in range(0, len(df), block_size):
+        yield {col: values[a:a + block_size] for col, values in arrays.items()}
+
+def _fields(patterns):
+    return [(p['start_time'], p['end_time'], p['cup_start_idx'], p['cup_end_idx'], p['handle_end_idx'],
+             p['breakout_candle_idx'], p['r_squared_cup'], p['cup_depth'], p['handle_depth']) for p in patterns]
+
+class TestChunkedScan(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.df, _ = generate_ohlcv(40000, seed=5)
+        cls.df.index = cls.df.index.as_unit('ns')
+        cls.atr = talib.ATR(cls.df['high'].values, cls.df['low'].values, cls.df['close'].values, timeperiod=14)
+        cls.avg_candle_size = np.nanmean(cls.df['high'].values - cls.df['low'].values)
+
+    def test_matches_whole_frame_scan(self):
+        for params in (dict(), dict(use_jit=False), dict(one_pattern_per_day=False, skip_days_after_pattern=0, min_r2=0.7),
+                       dict(volume_confirmation=True)):
+            expected = PatternDetector(self.df, atr=self.atr, **params).detect_patterns()
+            self.assertGreater(len(expected), 10)
+            # Blocks shorter than a cup, and patterns straddling block boundaries
+            for block_size in (97, 5000, len(self.df)):
+                patterns = scan_blocks(_blocks(self.df, block_size, self.atr), avg_candle_size=self.avg_candle_size, **params)
+                self.assertEqual(_fields(patterns), _fields(expected), (params, block_size))
+
+    def test_atr_across_blocks(self):
+        high, low, close = (self.df[col].values for col in ('high', 'low', 'close'))
+        state = WilderATR()
+        atr = np.concatenate([state.update(high[a:a + 777], low[a:a + 777], close[a:a + 777])
+                              for a in range(0, len(close), 777)])
+        np.testing.assert_array_equal(atr, WilderATR().update(high, low, close))
+        self.assertTrue(np.isnan(atr[:14]).all())
+        np.testing.assert_allclose(atr[14:], self.atr[14:], rtol=1e-12)
+        # Without an ATR column the blocks compute it, and find the same patterns
+        patterns = scan_blocks(_blocks(self.df, 3000), avg_candle_size=self.avg_candle_size)
+        self.assertEqual([p['start_time'] for p in patterns],
+                         [p['start_time'] for p in PatternDetector(self.df).detect_patterns()])
+
+    def test_scan_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CandleStore(tmp)
+            store.append('BTCUSDT', '1m', self.df)
+            expected = PatternDetector(self.df).detect_patterns()
+            self.assertEqual([p['start_time'] for p in scan_store(store, 'BTCUSDT', '1m', block_size=4000)],
+                             [p['start_time'] for p in expected])
+            # A range with the ATR main.py saves in the store
+            store.write_column('BTCUSDT', '1m', 'ATR', self.atr)
+            ranged = store.load('BTCUSDT', '1m', '2024-01-10', '2024-01-25')
+            first = self.df.index.get_loc(ranged.index[0])
+            expected = PatternDetector(ranged, atr=self.atr[first:first + len(ranged)]).detect_patterns()
+            patterns = list(scan_store(store, 'BTCUSDT', '1m', '2024-01-10', '2024-01-25', block_size=4000))
+            self.assertGreater(len(expected), 5)
+            self.assertEqual([p['start_time'] for p in patterns], [p['start_time'] for p in expected])
+
+    def test_rejects_exhaustive(self):
+        with self.assertRaises(ValueError):
+            next(scan_blocks(_blocks(self.df, 1000), exhaustive=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+import talib
+from candle_store import CandleStore, OHLCV_COLUMNS
+from batch_scan import ScanJob, _run_job
+from stream_detector import StreamingPatternDetector
+from reporting import report_entry
+from detection_service import DetectionService, DetectionClient, _ResidentScan
+from synthetic_data import oscillating_ohlcv
+
+def _json(rows):
+    return json.loads(json.dumps(rows, default=str))
+
+class TestDetectionService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = oscillating_ohlcv(1500)
+        self.params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20,
+                           min_r2=0.7, skip_days_after_pattern=0)
+        self.store = CandleStore(os.path.join(self.tmp.name, 'store'))
+        self.store.append('TEST', '5m', self.df.iloc[:1000])
+
+    async def asyncSetUp(self):
+        self.service = DetectionService(self.store.root, n_workers=1)
+        await self.service.start()
+        self.client = await DetectionClient.connect(*self.service.address)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.service.close()
+        self.tmp.cleanup()
+
+    async def test_concurrent_scans_and_memo(self):
+        expected, _ = _run_job(self.store.root, ScanJob('TEST', '5m', None, None), self.params)
+        self.assertTrue(expected)
+        # Other clients and requests are answered while scans run in the pool
+        second = await DetectionClient.connect(*self.service.address)
+        results = await asyncio.gather(
+            self.client.call('scan', symbol='TEST', interval='5m', params=self.params),
+            second.call('scan', symbol='TEST', interval='5m', params=self.params),
+            self.client.call('ping'),
+            self.client.call('scan', symbol='TEST', interval='5m', start='2024-01-02', params=self.params),
+        )
+        await second.close()
+        self.assertEqual(results[0], _json(expected))
+        self.assertEqual(results[1], results[0])
+        self.assertEqual(results[2], 'pong')
+        self.assertTrue(all(row['start_time'] >= '2024-01-02' for row in results[3]))
+        stats = await self.client.call('stats')
+        # The identical scan shares the one in flight, or its rows once it has finished
+        self.assertEqual(stats['scans'], 2, "Identical scans are shared")
+        await self.client.call('scan', symbol='TEST', interval='5m', params=self.params)
+        self.assertEqual((await self.client.call('stats'))['cached_scans'], stats['cached_scans'] + 1)
+
+    async def test_append_updates_scans_and_live_detector(self):
+        avg = float((self.df['high'] - self.df['low']).mean())
+        params = dict(self.params, avg_candle_size=avg)
+        watched = await self.client.call('watch', symbol='TEST', interval='5m', params=params)
+        self.assertEqual(watched['bars'], 1000)
+        before = await self.client.call('scan', symbol='TEST', interval='5m', params=self.params)
+
+        live = []
+        for a in range(990, len(self.df), 100):  # Overlapping chunks: stored bars are skipped
+            chunk = self.df.iloc[a:a + 100].reset_index()
+            result = await self.client.call('append', symbol='TEST', interval='5m',
+                                            bars=chunk.to_dict(orient='records'))
+            live.extend(result['patterns'])
+        self.assertEqual((await self.client.call('stats'))['appended'], 500)
+
+        stream = StreamingPatternDetector(**params)
+        expected = []
+        for _, candle in self.df.iterrows():
+            for pattern in stream.push(candle):
+                expected.append(pattern)
+                pattern['pattern_id'] = f"{len(expected):02d}"
+        expected_rows = _json([report_entry(p) for p in expected])
+        self.assertEqual(await self.client.call('patterns', symbol='TEST', interval='5m'), expected_rows)
+        self.assertEqual(live, expected_rows[watched['patterns']:])
+        self.assertGreater(len(live), 0)
+
+        # New bars invalidate memoized scans
+        after = await self.client.call('scan', symbol='TEST', interval='5m', params=self.params)
+        full, _ = _run_job(self.store.root, ScanJob('TEST', '5m', None, None), self.params)
+        self.assertEqual(after, _json(full))
+        self.assertNotEqual(after, before)
+        pd.testing.assert_frame_equal(self.store.load('TEST', '5m', columns=OHLCV_COLUMNS), self.df,
+                                      check_freq=False, check_index_type=False)
+
+    async def test_appended_bars_extend_resident_scans(self):
+        avg = float((self.df['high'] - self.df['low']).mean())
+        params = dict(self.params, avg_candle_size=avg)
+        before = await self.client.call('scan', symbol='TEST', interval='5m', params=params)
+        detector = self.service._results[('TEST', '5m', None, None, json.dumps(params, sort_keys=True))].detector
+        dataset = self.service._datasets[('TEST', '5m')]
+        resident = dataset.arrays
+        resident_close = resident['close'].copy()
+        starts = []
+        greedy = _ResidentScan._greedy
+
+        def spy(scan, start=None, last_detected_day=None):
+            starts.append(start)
+            return greedy(scan, start, last_detected_day)
+        with mock.patch.object(CandleStore, 'load_arrays', side_effect=AssertionError("Store reloaded")), \
+                mock.patch.object(_ResidentScan, '_greedy', spy):
+            for a in range(1000, len(self.df), 100):
+                await self.client.call('append', symbol='TEST', interval='5m',
+                                       bars=self.df.iloc[a:a + 100].reset_index().to_dict(orient='records'))
+            after = await self.client.call('scan', symbol='TEST', interval='5m', params=params)
+        full, _ = _run_job(self.store.root, ScanJob('TEST', '5m', None, None), params)
+        self.assertEqual(after, _json(full))
+        self.assertEqual(after[:len(before)], before)
+        self.assertGreater(len(after), len(before))
+        # The same detector continued from the first cup end the earlier scan had not reached
+        self.assertIs(self.service._results[('TEST', '5m', None, None, json.dumps(params, sort_keys=True))].detector,
+                      detector)
+        self.assertEqual(len(starts), 1)
+        self.assertGreaterEqual(starts[0], 1000 - 20 - 11)
+        # ATR is extended from its last state and saved for the new bars
+        expected_atr = talib.ATR(self.df['high'], self.df['low'], self.df['close'], timeperiod=14).values
+        atr = self.store.load_arrays('TEST', '5m', columns=['ATR'])['ATR']
+        np.testing.assert_allclose(atr, expected_atr, rtol=1e-12)
+        np.testing.assert_array_equal(dataset.arrays['ATR'], atr)
+        # Bars went past the end of the columns, which grew once; earlier views are unchanged
+        self.assertEqual(len(dataset._columns[0]['close']), 2000)
+        np.testing.assert_array_equal(resident['close'], resident_close)
+
+    async def test_scan_waits_for_update_in_progress(self):
+        rows = await self.client.call('scan', symbol='TEST', interval='5m', params=self.params)
+        scan = self.service._results[('TEST', '5m', None, None, json.dumps(self.params, sort_keys=True))]
+        # While an update holds the scan its rows may be half rebuilt, so they are not returned
+        scan.lock.acquire()
+        pending = asyncio.create_task(self.client.call('scan', symbol='TEST', interval='5m', params=self.params))
+        await asyncio.sleep(0.2)
+        self.assertFalse(pending.done())
+        scan.lock.release()
+        self.assertEqual(await pending, rows)
+
+    async def test_errors_are_reported(self):
+        with self.assertRaises(RuntimeError):
+            await self.client.call('bogus')
+        with self.assertRaises(RuntimeError):
+            await self.client.call('patterns', symbol='TEST', interval='5m')
+        self.assertEqual(await self.client.call('ping'), 'pong')
+
+if __name__ == '__main__':
+    unittest.main()
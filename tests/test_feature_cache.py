@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from feature_cache import FeatureCache, fingerprint
+from pattern_detector import PatternDetector
+from synthetic_data import oscillating_ohlcv
+
+class TestFeatureCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'cache')
+        self.df = oscillating_ohlcv(3000)
+        # Fit reuse is a property of the Python scan; the compiled kernel fits cups itself
+        self.params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7,
+                           use_jit=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_exact_and_prefix_lookup(self):
+        cache = FeatureCache(self.root)
+        values = np.arange(100, dtype=np.float64)
+        cache.put('sums', {'window': 3}, [values[:60]], 'first 60')
+        self.assertEqual(cache.get('sums', {'window': 3}, [values[:60]]), ('first 60', 60))
+        self.assertEqual(cache.get('sums', {'window': 3}, [values]), (None, 0))
+        self.assertEqual(cache.get('sums', {'window': 3}, [values], prefix=True), ('first 60', 60))
+        self.assertEqual(cache.get('sums', {'window': 4}, [values[:60]]), (None, 0))
+        changed = values.copy()
+        changed[10] += 1
+        self.assertEqual(cache.get('sums', {'window': 3}, [changed], prefix=True), (None, 0))
+
+        # The longer entry supersedes its prefix, and survives a reopen
+        cache.put('sums', {'window': 3}, [values], 'all 100')
+        reopened = FeatureCache(self.root)
+        self.assertEqual(reopened.get('sums', {'window': 3}, [values[:60]]), (None, 0))
+        self.assertEqual(reopened.get('sums', {'window': 3}, [values], prefix=True), ('all 100', 100))
+        self.assertNotEqual(fingerprint([values]), fingerprint([changed]))
+
+    def test_evicts_least_recently_used(self):
+        cache = FeatureCache(self.root, max_bytes=50_000)
+        blobs = [np.full(2000, float(n)) for n in range(4)]  # ~16 kB each
+        for n, blob in enumerate(blobs):
+            cache.put('blob', {}, [blob], blob)
+            if n == 1:
+                cache.get('blob', {}, [blobs[0]])  # Keep the first one warm
+        self.assertLessEqual(cache.size(), 50_000)
+        self.assertIsNotNone(cache.get('blob', {}, [blobs[0]])[0])
+        self.assertIsNone(cache.get('blob', {}, [blobs[1]])[0])
+        self.assertIsNotNone(cache.get('blob', {}, [blobs[3]])[0])
+
+    def test_detector_reuses_results_and_fits(self):
+        expected = PatternDetector(self.df, **self.params).detect_patterns()
+        head = self.df.iloc[:2500]
+        cold = PatternDetector(head, cache=FeatureCache(self.root), **self.params)
+        self.assertEqual(cold.detect_patterns(), PatternDetector(head, **self.params).detect_patterns())
+        self.assertGreater(cold.fit_engine.fits, 0)
+        warm = PatternDetector(head, cache=FeatureCache(self.root), **self.params)
+        warm.detect_patterns()
+        self.assertEqual(warm.fit_engine.fits, 0, "Unchanged data should not be rescanned")
+
+        # Appended bars: fits of the first 2500 bars are reused
+        fresh = PatternDetector(self.df, **self.params)
+        fresh.detect_patterns()
+        appended = PatternDetector(self.df, cache=FeatureCache(self.root), **self.params)
+        self.assertEqual(appended.detect_patterns(), expected)
+        self.assertLess(appended.fit_engine.fits, fresh.fit_engine.fits / 2)
+
+    def test_range_tables_extended_from_prefix(self):
+        cache = FeatureCache(self.root)
+        head = PatternDetector(self.df.iloc[:2500], cache=cache, **self.params)
+        self.assertEqual(len(head.high_max.levels[0]), 2500)
+        # The levels of the first 2500 bars are kept and only the runs reaching new bars are reduced
+        with mock.patch('range_query.np.concatenate', wraps=np.concatenate) as concatenate:
+            table = PatternDetector(self.df, cache=FeatureCache(self.root), **self.params).high_max
+        kept = [args[0][0] for args, _ in concatenate.call_args_list]
+        self.assertEqual([len(level) for level in kept], [len(level) for level in head.high_max.levels[1:]])
+        expected = PatternDetector(self.df, **self.params).high_max
+        for got, level in zip(table.levels, expected.levels):
+            np.testing.assert_array_equal(got, level)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from candle_store import CandleStore
+from fetch_data import KlineFetcher, is_retryable
+
+class RateLimited(Exception):
+    status_code = 429
+
+    class response:
+        headers = {'Retry-After': '0'}
+
+class BadSymbol(Exception):
+    status_code = 400
+
+class ServerError(Exception):
+    status_code = 503
+
+class FakeClient:
+    """Serves deterministic 1m klines like the futures klines endpoint."""
+    def __init__(self, fail_from=None, rate_limit_first=False, error=ConnectionError("connection reset")):
+        self.fail_from = fail_from
+        self.error = error
+        self.rate_limit_first = rate_limit_first
+        self.requests = []
+
+    def futures_klines(self, symbol, interval, startTime, endTime, limit):
+        self.requests.append((startTime, endTime, limit))
+        if self.rate_limit_first:
+            self.rate_limit_first = False
+            raise RateLimited()
+        if self.fail_from is not None and startTime >= self.fail_from:
+            raise self.error
+        rows = []
+        for t in range(startTime, endTime + 1, 60_000)[:limit]:
+            price = 100 + (t // 60_000) % 50
+            rows.append([t, str(price), str(price + 1), str(price - 1), str(price + 0.5), '10',
+                         t + 59_999, '0', 1, '0', '0', '0'])
+        return rows
+
+class TestKlineFetcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CandleStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _fetcher(self, client, **kwargs):
+        return KlineFetcher(client, self.store, 'BTCUSDT', '1m', page_size=1000,
+                            max_workers=3, backoff=0, sleep=lambda s: None, **kwargs)
+
+    def _assert_complete(self, start, end):
+        df = self.store.load('BTCUSDT', '1m')
+        expected = pd.date_range(start, end, freq='1min', inclusive='left')
+        np.testing.assert_array_equal(df.index.values, expected.values.astype('datetime64[ns]'))
+
+    def test_concurrent_pages_stored_in_order(self):
+        client = FakeClient(rate_limit_first=True)
+        appended = self._fetcher(client).fetch('2024-01-01', '2024-01-03 06:00')
+        self.assertEqual(appended, 2 * 1440 + 360)
+        self._assert_complete('2024-01-01', '2024-01-03 06:00')
+        self.assertTrue(all(limit == 1000 and end - start < 1000 * 60_000 for start, end, limit in client.requests))
+        self.assertFalse(os.path.exists(self._fetcher(client).checkpoint_path))
+
+    def test_resume_after_failure_and_fetch_missing(self):
+        fail_from = pd.Timestamp('2024-01-02').value // 1_000_000
+        fetcher = self._fetcher(FakeClient(fail_from=fail_from), max_retries=1)
+        with self.assertRaises(ConnectionError):
+            fetcher.fetch('2024-01-01', '2024-01-03')
+        self.assertTrue(os.path.exists(fetcher.checkpoint_path))
+        # Pages before the failing one stay committed
+        self.assertEqual(self.store.last_timestamp('BTCUSDT', '1m'), pd.Timestamp('2024-01-02 09:19'))
+
+        client = FakeClient()
+        fetcher = self._fetcher(client)
+        fetcher.resume()
+        self._assert_complete('2024-01-01', '2024-01-03')
+        self.assertGreater(min(start for start, _, _ in client.requests), pd.Timestamp('2024-01-01').value // 1_000_000,
+                           "Resume should not refetch stored bars")
+
+        self.assertEqual(fetcher.fetch_missing('2024-01-03 01:00'), 60)
+        self.assertEqual(fetcher.fetch_missing('2024-01-03 01:00'), 0)
+        self._assert_complete('2024-01-01', '2024-01-03 01:00')
+
+    def test_only_transient_errors_are_retried(self):
+        self.assertTrue(all(is_retryable(e) for e in (RateLimited(), ServerError(), ConnectionError(), TimeoutError())))
+        self.assertFalse(any(is_retryable(e) for e in (BadSymbol(), ValueError("bad json"), KeyError('open'))))
+        for error, attempts in ((BadSymbol(), 1), (ValueError("bad json"), 1), (ServerError(), 4)):
+            client = FakeClient(fail_from=0, error=error)
+            sleeps = []
+            fetcher = KlineFetcher(client, self.store, 'BTCUSDT', '1m', page_size=1000, max_workers=1,
+                                   max_retries=3, backoff=1.0, sleep=sleeps.append)
+            with self.assertRaises(type(error)):
+                fetcher.fetch('2024-01-01', '2024-01-01 10:00')
+            self.assertEqual(len(client.requests), attempts)
+            self.assertEqual(sleeps, [1.0, 2.0, 4.0][:attempts - 1])
+
+if __name__ == '__main__':
+    unittest.main()
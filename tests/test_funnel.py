@@ -0,0 +1,55 @@
+import os
+import json
+import tempfile
+import unittest
+from pattern_detector import PatternDetector
+from funnel import STAGE_NAMES, REJECT_REASONS
+from reporting import build_near_miss_report
+from synthetic_data import oscillating_ohlcv
+
+class TestFunnel(unittest.TestCase):
+    def setUp(self):
+        self.df = oscillating_ohlcv(1200)
+        self.params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7)
+
+    def test_off_by_default(self):
+        self.assertIsNone(PatternDetector(self.df, **self.params).funnel)
+
+    def test_counters_are_consistent(self):
+        plain = PatternDetector(self.df, **self.params).detect_patterns()
+        detector = PatternDetector(self.df, instrument=True, **self.params)
+        patterns = detector.detect_patterns()
+        self.assertEqual(patterns, plain)
+
+        summary = detector.funnel.summary()
+        stages = {row['stage']: row for row in summary['stages']}
+        self.assertEqual([row['stage'] for row in summary['stages']], STAGE_NAMES)
+        self.assertEqual(summary['patterns'], len(plain))
+        # Every cup passing the depth check has at least one handle tried
+        self.assertGreaterEqual(stages['handle_high']['reached'], stages['depth']['passed'])
+        # Only accepted handles pass the last stage
+        self.assertEqual(stages['breakout_close']['passed'], len(plain))
+        self.assertEqual(stages['fit']['reached'], summary['cups_evaluated'])
+        self.assertGreater(summary['parabola_fits'], 0)
+        self.assertGreater(summary['seconds']['total'], 0)
+
+        path = os.path.join(tempfile.mkdtemp(), 'funnel.json')
+        detector.funnel.save(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['stages'], summary['stages'])
+
+    def test_near_misses(self):
+        plain = PatternDetector(self.df, **self.params).detect_patterns()
+        records = PatternDetector(self.df, record_near_misses=True, **self.params).detect_patterns()
+        self.assertEqual([p for p in records if p['status'] == 'Valid'], plain)
+        near_misses = [p for p in records if p['status'] == 'Invalid']
+        self.assertGreater(len(near_misses), 0)
+        self.assertEqual([p['cup_end_idx'] for p in records], sorted(p['cup_end_idx'] for p in records))
+        for p in near_misses:
+            self.assertIn(p['reason'], REJECT_REASONS.values())
+            self.assertNotEqual(p['reason'], REJECT_REASONS['skip_day'])
+        report = build_near_miss_report(near_misses)
+        self.assertEqual(len(report), len(near_misses))
+
+if __name__ == '__main__':
+    unittest.main()
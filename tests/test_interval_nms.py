@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+import numpy as np
+import interval_nms
+from interval_nms import suppress_overlaps
+
+def _naive(starts, stops, scores):
+    order = sorted(range(len(starts)), key=lambda c: (-scores[c], starts[c]))
+    kept = []
+    for c in order:
+        if all(stops[c] < starts[o] or starts[c] > stops[o] for o in kept):
+            kept.append(c)
+    return sorted(kept, key=lambda c: starts[c])
+
+class _CountingTree:
+    """Stands in for the Fenwick tree, counting the entries read and written."""
+
+    def __init__(self, tree, counter):
+        self.tree = tree
+        self.counter = counter
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __getitem__(self, i):
+        self.counter[0] += 1
+        return self.tree[i]
+
+    def __setitem__(self, i, value):
+        self.counter[0] += 1
+        self.tree[i] = value
+
+class TestIntervalNMS(unittest.TestCase):
+    def test_matches_quadratic_suppression(self):
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            m = int(rng.integers(1, 300))
+            starts = rng.integers(0, 2000, m)
+            stops = starts + rng.integers(0, 150, m)
+            scores = rng.random(m).round(2)  # Rounded to exercise ties
+            kept = suppress_overlaps(starts, stops, scores)
+            self.assertEqual(kept.tolist(), _naive(starts.tolist(), stops.tolist(), scores.tolist()))
+            self.assertTrue((starts[kept][1:] > stops[kept][:-1]).all())
+
+    def test_shared_bar_overlaps(self):
+        # Intervals are inclusive, so touching at one bar counts as overlap
+        self.assertEqual(suppress_overlaps([0, 10], [10, 20], [0.9, 0.8]).tolist(), [0])
+        self.assertEqual(suppress_overlaps([0, 11], [10, 20], [0.8, 0.9]).tolist(), [0, 1])
+
+    def test_nan_scores_rank_last(self):
+        self.assertEqual(suppress_overlaps([0, 5], [10, 15], [np.nan, 0.1]).tolist(), [1])
+        self.assertEqual(suppress_overlaps([], [], []).tolist(), [])
+
+    def test_work_per_candidate_grows_logarithmically(self):
+        # Disjoint intervals are all kept, the worst case for the kept set
+        def accesses_per_candidate(m):
+            counter = [0]
+            count_upto, mark = interval_nms._count_upto, interval_nms._mark
+            starts = np.arange(m) * 10
+            scores = np.random.default_rng(m).random(m)
+            with mock.patch.object(interval_nms, '_count_upto',
+                                   lambda tree, i: count_upto(_CountingTree(tree, counter), i)), \
+                    mock.patch.object(interval_nms, '_mark', lambda tree, i: mark(_CountingTree(tree, counter), i)):
+                kept = suppress_overlaps(starts, starts + 5, scores)
+            self.assertEqual(len(kept), m)
+            return counter[0] / m
+        small, large = accesses_per_candidate(1_000), accesses_per_candidate(30_000)
+        # log m grows 1.5x over this range; a kept set searched or shifted linearly grows 30x
+        self.assertLess(large / small, 2)
+
+if __name__ == '__main__':
+    unittest.main()
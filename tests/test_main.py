@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import unittest
+import numpy as np
+import pandas as pd
+import talib
+import main
+from candle_store import CandleStore
+from pattern_detector import PatternDetector
+from synthetic_data import oscillating_ohlcv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARAMS = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7)
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = oscillating_ohlcv(2000, seed=0)
+        self.store = CandleStore(os.path.join(self.tmp.name, 'store'))
+        self.store.append('TEST', '5m', self.df)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, **kwargs):
+        kwargs = dict(dict(symbol='TEST', interval='5m', store_dir=self.store.root, plots=False,
+                           cache_dir=os.path.join(self.tmp.name, 'cache'),
+                           pattern_db=os.path.join(self.tmp.name, 'patterns.db'),
+                           report_file=os.path.join(self.tmp.name, 'report.csv')), **PARAMS, **kwargs)
+        main.main(**kwargs)
+        return kwargs['report_file']
+
+    def test_report_formats_and_range(self):
+        expected = PatternDetector(self.df, **PARAMS).detect_patterns()
+        self.assertTrue(expected)
+        report = pd.read_csv(self._run(), dtype={'pattern_id': str})
+        self.assertEqual(list(report['start_time']), [str(p['start_time']) for p in expected])
+        # ATR is saved with the candles and reused by the next runs
+        atr = talib.ATR(self.df['high'], self.df['low'], self.df['close'], timeperiod=14).values
+        np.testing.assert_array_equal(self.store.load_arrays('TEST', '5m', columns=['ATR'])['ATR'], atr)
+
+        with open(self._run(report_file=os.path.join(self.tmp.name, 'report.json'), report_format='json')) as f:
+            rows = json.load(f)
+        self.assertEqual([row['pattern_id'] for row in rows], list(report['pattern_id']))
+        self.assertEqual([row['r_squared_cup'] for row in rows], list(report['r_squared_cup']))
+
+        # A range is scanned with the full series' ATR
+        start, end = '2024-01-03', '2024-01-06'
+        sliced = self.store.load('TEST', '5m', start, end)
+        ranged = pd.read_csv(self._run(start=start, end=end, use_cache=False))
+        expected = PatternDetector(sliced, atr=atr[self.df.index.get_loc(sliced.index[0]):][:len(sliced)],
+                                   **PARAMS).detect_patterns()
+        self.assertEqual(list(ranged['start_time']), [str(p['start_time']) for p in expected])
+
+        # Every run stored its patterns, each once however many runs found it
+        from pattern_store import PatternStore
+        with PatternStore(os.path.join(self.tmp.name, 'patterns.db')) as db:
+            stored = db.query('TEST', '5m')
+        self.assertEqual(set(stored['start_time'].astype(str)), set(report['start_time']) | set(ranged['start_time']))
+        self.assertEqual(len(stored), len(set(zip(stored['start_time'], stored['breakout_candle_timestamp']))))
+
+    def test_atr_extended_for_appended_bars(self):
+        store = CandleStore(os.path.join(self.tmp.name, 'grown'))
+        store.append('TEST', '5m', self.df.iloc[:1500])
+        main.preprocess_data(store, 'TEST', '5m')
+        store.append('TEST', '5m', self.df.iloc[1500:])
+        reads = []
+        load_arrays = store.load_arrays
+        store.load_arrays = lambda *args, **kwargs: reads.append(load_arrays(*args, **kwargs)) or reads[-1]
+        times, atr = main.preprocess_data(store, 'TEST', '5m', '2024-01-06', '2024-01-07')
+        # Only the new bars (from the last one with an ATR) and the requested range are read
+        self.assertEqual([len(r['open_time']) for r in reads], [501, 288])
+        full = talib.ATR(self.df['high'], self.df['low'], self.df['close'], timeperiod=14)
+        np.testing.assert_allclose(load_arrays('TEST', '5m', columns=['ATR'])['ATR'], full.values, rtol=1e-12)
+        np.testing.assert_array_equal(times, self.df.loc['2024-01-06':'2024-01-06 23:55'].index.as_unit('ns').asi8)
+        np.testing.assert_allclose(atr, full['2024-01-06':'2024-01-06 23:55'].values, rtol=1e-12)
+
+    def test_no_plots_skips_plotting_imports(self):
+        args = ['--symbol', 'TEST', '--interval', '5m', '--store', self.store.root, '--no-plots',
+                '--cache-dir', os.path.join(self.tmp.name, 'cache'),
+                '--pattern-db', os.path.join(self.tmp.name, 'patterns.db'),
+                '--report', os.path.join(self.tmp.name, 'report.csv'),
+                '--min-cup-duration', '20', '--max-cup-duration', '80', '--min-r2', '0.7']
+        code = ("import sys, runpy; sys.argv = ['main.py'] + sys.argv[1:]; "
+                "runpy.run_path('main.py', run_name='__main__'); "
+                "print(sorted(m for m in ('plotly', 'plot_utils') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code] + args, cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.splitlines()[-1], '[]')
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'report.csv')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pattern_detector import PatternDetector
+from synthetic_data import generate_ohlcv
+from multi_timeframe import (resample_pyramid, candidate_regions, refine_regions,
+                             detect_multi_timeframe, build_timeframe_report)
+
+class TestMultiTimeframe(unittest.TestCase):
+    def setUp(self):
+        self.df, self.planted = generate_ohlcv(20_000, seed=2)
+
+    def test_resample_matches_pandas(self):
+        pyramid = resample_pyramid(self.df, ('5m', '15m', '1h'))
+        for interval, rule in [('5m', '5min'), ('15m', '15min'), ('1h', '1h')]:
+            expected = self.df.resample(rule).agg(
+                {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+            frame = pyramid[interval]
+            pd.testing.assert_frame_equal(frame[expected.columns], expected, check_freq=False)
+            # Bucket bounds point at the base bars each coarse bar covers
+            np.testing.assert_array_equal(self.df.index[frame['first_bar']], frame.index)
+            np.testing.assert_array_equal(self.df['close'].values[frame['last_bar']], frame['close'].values)
+
+    def test_refining_everything_is_the_full_scan(self):
+        detector = PatternDetector(self.df)
+        n = len(self.df)
+        self.assertEqual(refine_regions(detector, [(0, n // 2), (n // 2, n)]),
+                         PatternDetector(self.df).detect_patterns())
+
+    def test_regions_cover_full_scan_patterns(self):
+        pyramid = resample_pyramid(self.df, ('5m',))
+        self.assertTrue(np.shares_memory(pyramid['1m']['close'].values, self.df['close'].values), "Base bars are not copied")
+        regions = candidate_regions(pyramid, '5m')
+        self.assertLess(sum(stop - start for start, stop in regions), 0.5 * len(self.df))
+        full = PatternDetector(self.df).detect_patterns()
+        self.assertGreater(len(full), 5)
+        for pattern in full:
+            self.assertTrue(any(start <= pattern['cup_end_idx'] < stop for start, stop in regions),
+                            f"Cup ending at {pattern['cup_end_idx']} not refined")
+        # With every cup end covered the refined scan is the full scan
+        self.assertEqual(refine_regions(PatternDetector(self.df), regions), full)
+
+    def test_patterns_tagged_by_timeframe(self):
+        patterns, stats = detect_multi_timeframe(self.df, intervals=('5m', '15m'))
+        self.assertEqual(stats['base_bars'], len(self.df))
+        self.assertTrue(all(p['timeframe'] in ('1m', '5m', '15m') for p in patterns))
+        self.assertTrue(any(p['source'] == 'refined' for p in patterns))
+        report = build_timeframe_report(patterns)
+        self.assertEqual(list(report.columns[:3]), ['timeframe', 'source', 'pattern_id'])
+        self.assertEqual(len(report), len(patterns))
+        for row in report.itertuples():
+            self.assertTrue(row.pattern_id.startswith(row.timeframe + '-'))
+
+if __name__ == '__main__':
+    unittest.main()
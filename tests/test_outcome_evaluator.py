@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+import pandas as pd
+from outcome_evaluator import evaluate_outcomes, outcome_columns
+from pattern_detector import PatternDetector
+from reporting import build_report, REPORT_COLUMNS
+from synthetic_data import generate_ohlcv
+
+def _pattern(b, entry=100.0, cup_depth=10.0, handle_high=99.0, handle_depth=4.0):
+    return {'breakout_candle_idx': b, 'breakout_price': entry, 'cup_depth': cup_depth,
+            'handle_high_price': handle_high, 'handle_depth': handle_depth}
+
+class TestOutcomeEvaluator(unittest.TestCase):
+    def test_hand_built_outcomes(self):
+        close = np.full(12, 100.0)
+        high = close + 1
+        low = close - 1
+        high[4] = 111.0  # Target of pattern 0 (100 + 10) on its 3rd bar
+        low[6] = 94.0    # Stop (99 - 4 = 95) on the same bar as a target hit for pattern 1
+        high[6] = 112.0
+        close[3] = 101.0
+        patterns = [_pattern(1), _pattern(5), _pattern(10), _pattern(11)]
+        out = evaluate_outcomes(patterns, high, low, close, horizons=(2, 3), window=4)
+        self.assertEqual(list(out.columns), outcome_columns((2, 3)))
+        np.testing.assert_allclose(out['return_2'], [0.01, 0.0, np.nan, np.nan])
+        self.assertEqual(list(out['outcome']), ['target', 'stop', 'open', 'open'])
+        self.assertEqual(list(out['exit_bars']), [3, 1, pd.NA, pd.NA])
+        np.testing.assert_allclose(out['mfe'], [0.11, 0.12, 0.01, np.nan])
+        np.testing.assert_allclose(out['mae'], [-0.01, -0.06, -0.01, np.nan])
+        np.testing.assert_allclose(out['target_price'], 110.0)
+        np.testing.assert_allclose(out['stop_price'], 95.0)
+
+    def test_matches_per_pattern_loop(self):
+        df, _ = generate_ohlcv(30000, seed=2)
+        detector = PatternDetector(df, min_r2=0.6, skip_days_after_pattern=0, one_pattern_per_day=False)
+        patterns = detector.detect_patterns()
+        self.assertGreater(len(patterns), 50)
+        out = evaluate_outcomes(patterns, df['high'], df['low'], df['close'], horizons=(5, 60), window=120)
+        pd.testing.assert_frame_equal(
+            evaluate_outcomes(detector.detect_records(), df['high'], df['low'], df['close'],
+                              horizons=(5, 60), window=120), out)
+        for p, row in zip(patterns, out.itertuples()):
+            b, entry = p['breakout_candle_idx'], p['breakout_price']
+            after = df.iloc[b + 1:b + 121]
+            self.assertEqual(row.mfe, after['high'].max() / entry - 1)
+            self.assertEqual(row.mae, after['low'].min() / entry - 1)
+            if b + 60 < len(df):
+                self.assertEqual(row.return_60, df['close'].iloc[b + 60] / entry - 1)
+            stop_hits = np.flatnonzero(after['low'].values <= row.stop_price)
+            target_hits = np.flatnonzero(after['high'].values >= row.target_price)
+            first_stop = stop_hits[0] if len(stop_hits) else 120
+            first_target = target_hits[0] if len(target_hits) else 120
+            expected = 'open' if min(first_stop, first_target) == 120 else (
+                'stop' if first_stop <= first_target else 'target')
+            self.assertEqual(row.outcome, expected)
+
+    def test_report_columns(self):
+        out = evaluate_outcomes([], np.ones(5), np.ones(5), np.ones(5))
+        self.assertEqual(len(out), 0)
+        report = build_report([], out)
+        self.assertEqual(list(report.columns), REPORT_COLUMNS + outcome_columns())
+
+if __name__ == '__main__':
+    unittest.main()
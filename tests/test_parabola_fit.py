@@ -0,0 +1,58 @@
+import unittest
+import warnings
+import numpy as np
+from scipy.optimize import curve_fit
+from parabola_fit import ParabolaFitEngine, fit_parabola
+
+def _curve_fit_r2(y):
+    x = np.arange(len(y))
+    f = lambda x, a, b, c: a * x**2 + b * x + c
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        popt, _ = curve_fit(f, x, y)
+    y_pred = f(x, *popt)
+    return 1 - np.sum((y - y_pred) ** 2) / np.sum((y - np.mean(y)) ** 2), popt
+
+class TestParabolaFit(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.prices = 42000 + np.cumsum(rng.normal(0, 10, 2000))
+
+    def test_matches_curve_fit(self):
+        engine = ParabolaFitEngine(self.prices, 30, 300)
+        for i, span in [(400, 30), (700, 123), (1999, 300), (301, 300)]:
+            expected, popt = _curve_fit_r2(self.prices[i - span:i + 1])
+            row = engine.r_squared_at(i)
+            self.assertAlmostEqual(row[span - 30], expected, places=8)
+            r_squared, coeffs = engine.fit(i - span, i)
+            self.assertAlmostEqual(r_squared, expected, places=8)
+            np.testing.assert_allclose(coeffs, popt, rtol=1e-4, atol=1e-6)
+
+    def test_block_matches_single_rows(self):
+        engine = ParabolaFitEngine(self.prices, 30, 300)
+        block = engine.r_squared_block(250, 350)
+        self.assertTrue(np.isnan(block[0, -1]), "Windows before the first bar should be NaN")
+        for i, span in [(300, 30), (349, 300)]:
+            expected, _ = _curve_fit_r2(self.prices[i - span:i + 1])
+            self.assertAlmostEqual(block[i - 250, span - 30], expected, places=8)
+
+    def test_selected_columns_match_block(self):
+        engine = ParabolaFitEngine(self.prices, 30, 300)
+        rng = np.random.default_rng(0)
+        for i in (250, 301, 1200, 1999):
+            row = engine.r_squared_at(i).copy()
+            for size in (1, 7, 271):
+                cols = np.sort(rng.choice(271, size, replace=False))
+                np.testing.assert_array_equal(engine.r_squared_cols(i, cols), row[cols])
+        self.assertEqual(len(engine.r_squared_cols(500, [])), 0)
+
+    def test_degenerate_windows(self):
+        self.assertEqual(fit_parabola(np.full(50, 100.0))[0], -1.0, "Flat window should be a failed fit")
+        self.assertEqual(fit_parabola([1.0, 2.0]), (-1.0, None))
+        x = np.arange(100)
+        r_squared, coeffs = fit_parabola(0.01 * x**2 - 0.5 * x + 100)
+        self.assertAlmostEqual(r_squared, 1.0, places=10)
+        np.testing.assert_allclose(coeffs, [0.01, -0.5, 100], atol=1e-8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from pattern_detector import PatternDetector
+from parallel_scan import detect_patterns_parallel
+from synthetic_data import oscillating_ohlcv
+
+class TestParallelScan(unittest.TestCase):
+    def setUp(self):
+        # Noisy oscillating series that forms many overlapping cups
+        self.df = oscillating_ohlcv(1200)
+        self.params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7)
+
+    def _assert_matches_serial(self, **kwargs):
+        params = dict(self.params, **kwargs)
+        serial = PatternDetector(self.df, **params).detect_patterns()
+        parallel = detect_patterns_parallel(self.df, n_workers=2, chunk_size=250, **params)
+        self.assertGreater(len(serial), 3, "Fixture should produce several patterns")
+        self.assertEqual(parallel, serial)
+
+    def test_matches_serial_with_skip(self):
+        self._assert_matches_serial()
+
+    def test_matches_serial_one_per_day(self):
+        self._assert_matches_serial(skip_days_after_pattern=0)
+
+    def test_matches_serial_unrestricted(self):
+        self._assert_matches_serial(skip_days_after_pattern=0, one_pattern_per_day=False)
+
+    def test_matches_serial_with_volume_confirmation(self):
+        self._assert_matches_serial(skip_days_after_pattern=0, one_pattern_per_day=False, volume_confirmation=True,
+                                    breakout_volume_ratio=1.0)
+
+    def test_matches_serial_unpruned(self):
+        self._assert_matches_serial(prune_candidates=False, use_jit=False)
+
+    def test_rejects_unsupported_options(self):
+        for option in ('exhaustive', 'instrument', 'record_near_misses'):
+            with self.assertRaisesRegex(ValueError, option):
+                detect_patterns_parallel(self.df, n_workers=2, **{option: True}, **self.params)
+
+if __name__ == '__main__':
+    unittest.main()
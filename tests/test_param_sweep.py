@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+from pattern_detector import PatternDetector
+from param_sweep import ParameterSweep, expand_grid, sweep_parameters, SWEEP_PARAMS, METRIC_COLUMNS
+from synthetic_data import oscillating_ohlcv
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.df = oscillating_ohlcv(3000)
+
+    def test_expand_grid(self):
+        configs = expand_grid({'min_r2': [0.8, 0.9], 'min_cup_duration': [20, 30, 40]})
+        self.assertEqual(len(configs), 6)
+        self.assertIn({'min_r2': 0.9, 'min_cup_duration': 40}, configs)
+        self.assertEqual(expand_grid([{'min_r2': 0.8}]), [{'min_r2': 0.8}])
+
+    def test_matches_separate_scans(self):
+        grid = {
+            'min_cup_duration': [20, 30],
+            'max_cup_duration': [60, 80],
+            'max_handle_duration': [10, 20],
+            'min_r2': [0.6, 0.8],
+            'skip_days_after_pattern': [0, 1],
+        }
+        grid = expand_grid(grid) + [dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20,
+                                         min_r2=0.6, one_pattern_per_day=False)]
+        sweep = ParameterSweep(self.df, grid)
+        table = sweep.run()
+        self.assertEqual(list(table.columns), SWEEP_PARAMS + METRIC_COLUMNS)
+        self.assertEqual(len(table), len(grid))
+        for n, config in enumerate(grid):
+            expected = PatternDetector(self.df, **config).detect_patterns()
+            self.assertEqual(sweep.patterns[n], expected, f"Configuration {config}")
+            self.assertEqual(table['patterns'][n], len(expected))
+        self.assertGreater(table['patterns'].nunique(), 1)
+
+    def test_grid_points_share_the_scan_work(self):
+        grid = expand_grid({'min_cup_duration': [20, 30, 40, 50, 60], 'max_cup_duration': [60, 80],
+                            'max_handle_duration': [10, 20], 'min_r2': [0.6, 0.7, 0.8, 0.9, 0.95]})
+        sweep = ParameterSweep(self.df, grid)
+        handle_grid = PatternDetector._handle_grid
+        with mock.patch.object(PatternDetector, '_handle_grid', autospec=True, side_effect=handle_grid) as built:
+            sweep.run()
+        self.assertEqual(len(grid), 100)
+        # Each cup end any configuration visits gets its grid once, and each cup window is fitted at most once
+        stop = len(self.df) - 10 - 11
+        self.assertEqual([call.args[1] for call in built.call_args_list], list(range(20, stop)))
+        self.assertLessEqual(sweep.detector.fit_engine.fits, (stop - 20) * (80 - 20 + 1))
+
+    def test_rejects_unknown_parameters(self):
+        with self.assertRaises(ValueError):
+            sweep_parameters(self.df, {'min_r2': [0.8], 'atr': [None]})
+
+if __name__ == '__main__':
+    unittest.main()
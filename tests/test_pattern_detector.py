@@ -1,8 +1,11 @@
 import unittest
 import pandas as pd
 import numpy as np
-from pattern_detector import PatternDetector
+from pattern_detector import PatternDetector, PATTERN_DTYPE, patterns_from_records
+from funnel import REJECT_REASONS
+from interval_nms import suppress_overlaps
 import talib
+from synthetic_data import oscillating_ohlcv
 
 class TestPatternDetector(unittest.TestCase):
     def setUp(self):
@@ -68,7 +71,7 @@ class TestPatternDetector(unittest.TestCase):
         mock_df.loc[mock_df.index[handle_start_idx:handle_end_idx], 'close'] = np.linspace(100, 85, 20)  # Retrace = 15
         mock_df.loc[mock_df.index[handle_start_idx:], 'high'] = mock_df['close'][handle_start_idx:] + 0.5
         mock_df.loc[mock_df.index[handle_start_idx:], 'low'] = mock_df['close'][handle_start_idx:] - 0.5
-        detector = PatternDetector(mock_df)
+        detector = PatternDetector(mock_df, record_near_misses=True)
         patterns = detector.detect_patterns()
         self.assertTrue(any(p['reason'] == "Handle retraces more than 40% of cup depth" for p in patterns),
                         "Should detect handle retrace > 40%")
@@ -109,5 +112,116 @@ class TestPatternDetector(unittest.TestCase):
             self.assertGreater(p['r_squared_cup'], 0.75, f"R² {p['r_squared_cup']} below threshold")
             self.assertEqual(p['status'], 'Valid', "Pattern should be valid")
 
+    def test_pruned_candidates_match_exhaustive_scan(self):
+        df = oscillating_ohlcv(3000)
+        params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7)
+        exhaustive = PatternDetector(df, prune_candidates=False, **params)
+        pruned = PatternDetector(df, **params)
+        n_candidates = 0
+        for i in range(20, len(df) - 31):
+            skip_days = (pruned.day_ids[max(0, i - 50)],)
+            expected = list(exhaustive._cup_candidates(i, skip_days))
+            self.assertEqual(list(pruned._cup_candidates(i, skip_days)), expected, f"Cup end {i}")
+            n_candidates += len(expected)
+        self.assertGreater(n_candidates, 0)
+        self.assertEqual(pruned.detect_patterns(), exhaustive.detect_patterns())
+        self.assertLess(pruned.fit_engine.fits * 10, exhaustive.fit_engine.fits)
+
+    def test_breakout_rounds_as_written(self):
+        # A breakout close sitting on handle_high + 1.5 * ATR, where
+        # close - 1.5 * ATR > handle_high rounds the other way
+        import scan_kernel
+        p = self.detector.detect_patterns()[0]
+        i, k, b = p['cup_end_idx'], p['handle_end_idx'], p['breakout_candle_idx']
+        df = self.mock_df.copy()
+        top = i + int(np.argmax(df['high'].values[i:k + 1]))
+        shift = 113.89 - df['high'].values[top]
+        for col in ('open', 'high', 'low', 'close'):
+            df[col] += shift
+        df.iloc[top, df.columns.get_loc('high')] = 113.89
+        close, atr = 116.04578944241038, 1.437192961606916
+        self.assertTrue(close - 1.5 * atr > 113.89)
+        self.assertFalse(close > 113.89 + 1.5 * atr)
+        df.iloc[b, df.columns.get_loc('close')] = close
+        df.iloc[b, df.columns.get_loc('ATR')] = atr
+        for prune in (True, False):
+            detector = PatternDetector(df, atr=df['ATR'].values, prune_candidates=prune)
+            self.assertEqual(detector._find_breakout(k, 113.89), b + 1)
+            self.assertEqual([r[:4] for r in detector._scan()], [(p['cup_start_idx'], i, k, b + 1)])
+            if prune:
+                self.assertEqual([r[:4] for r in scan_kernel.scan_patterns(detector, compiled=False)],
+                                 [(p['cup_start_idx'], i, k, b + 1)])
+
+    def test_array_input_and_records(self):
+        columns = {'open_time': self.mock_df.index.as_unit('ns').asi8}
+        for col in ('high', 'low', 'close'):
+            columns[col] = self.mock_df[col].to_numpy(copy=True)
+            columns[col].flags.writeable = False
+        detector = PatternDetector(columns)
+        # Read-only inputs are scanned in place
+        self.assertTrue(np.shares_memory(detector.close, columns['close']))
+        prices = self.mock_df[['open', 'high', 'low', 'close']]
+        PatternDetector(prices)
+        self.assertEqual(list(prices.columns), ['open', 'high', 'low', 'close'], "Input frame must not be modified")
+        records = detector.detect_records()
+        self.assertEqual(records.dtype, PATTERN_DTYPE)
+        self.assertGreaterEqual(len(records), 1)
+        expected = self.detector.detect_patterns()
+        self.assertEqual(patterns_from_records(records), expected)
+        self.assertEqual(detector.detect_patterns(), expected)
+
+    def test_exhaustive_mode(self):
+        df = oscillating_ohlcv(3000)
+        params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7)
+        greedy = PatternDetector(df, **params)
+        # Every cup the greedy scan could take at some cup end, with its first handle
+        candidates = {(j, i, k, b): r2 for i in range(20, len(df) - 31)
+                      for j, k, b, r2 in greedy._cup_candidates(i)}
+        for rank_by in ('r_squared', 'depth'):
+            patterns = PatternDetector(df, exhaustive=True, rank_by=rank_by, **params).detect_patterns()
+            self.assertGreater(len(patterns), len(greedy.detect_patterns()))
+            spans = [(p['cup_start_idx'], p['breakout_candle_idx']) for p in patterns]
+            self.assertEqual(spans, sorted(spans))
+            self.assertTrue(all(a[1] < b[0] for a, b in zip(spans, spans[1:])), "Kept patterns must not overlap")
+            # The kept patterns are those suppress_overlaps keeps among all candidates
+            keys = sorted(candidates)
+            if rank_by == 'r_squared':
+                scores = [candidates[key] for key in keys]
+            else:
+                scores = [greedy._make_pattern(*key, candidates[key])['cup_depth'] for key in keys]
+            kept = suppress_overlaps([key[0] for key in keys], [key[3] for key in keys], scores)
+            self.assertEqual([(p['cup_start_idx'], p['cup_end_idx'], p['handle_end_idx'], p['breakout_candle_idx'])
+                              for p in patterns], [keys[c] for c in kept])
+        with self.assertRaises(ValueError):
+            PatternDetector(df, exhaustive=True, instrument=True)
+
+    def test_volume_confirmation_stage(self):
+        patterns = PatternDetector(self.mock_df, volume_confirmation=True).detect_patterns()
+        self.assertEqual(len(patterns), 1, "The mock breakout has a volume surge")
+        # Flat volume never surges on the breakout
+        flat = self.mock_df.assign(volume=100.0)
+        detector = PatternDetector(flat, volume_confirmation=True, record_near_misses=True)
+        patterns = detector.detect_patterns()
+        self.assertFalse([p for p in patterns if p['status'] == 'Valid'])
+        self.assertIn(REJECT_REASONS['breakout_volume'], {p['reason'] for p in patterns})
+        self.assertGreater(detector.funnel.rejected['breakout_volume'], 0)
+
+        df = oscillating_ohlcv(3000)
+        params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20, min_r2=0.7,
+                      volume_confirmation=True, breakout_volume_ratio=1.2)
+        confirmed = PatternDetector(df, **params).detect_patterns()
+        self.assertTrue(confirmed)
+        # Pruning with the vectorized checks keeps every cup the scan accepts
+        self.assertEqual(PatternDetector(df, prune_candidates=False, **params).detect_patterns(), confirmed)
+        for p in confirmed:
+            j, i, k, b = (p[key] for key in ('cup_start_idx', 'cup_end_idx', 'handle_end_idx', 'breakout_candle_idx'))
+            cup = df.iloc[j:i + 1]
+            third = len(cup) // 3
+            self.assertLessEqual(cup['volume'].iloc[third:len(cup) - third].mean(), cup['volume'].iloc[:third].mean())
+            self.assertLessEqual(df['volume'].iloc[i:k + 1].mean(), cup['volume'].iloc[-third:].mean())
+            self.assertGreaterEqual(df['volume'].iloc[b], 1.2 * cup['volume'].mean())
+        with self.assertRaises(ValueError):
+            PatternDetector(df.drop(columns='volume'), volume_confirmation=True)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from pattern_store import PatternStore, pattern_ids
+from reporting import REPORT_COLUMNS
+
+def _report(n, seed=0, start='2024-01-01'):
+    rng = np.random.default_rng(seed)
+    starts = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.choice(200000, n, replace=False)), unit='min')
+    durations = rng.integers(30, 300, n)
+    return pd.DataFrame({
+        'pattern_id': [f"{i:02d}" for i in range(1, n + 1)],
+        'start_time': starts, 'end_time': starts + pd.to_timedelta(durations + 10, unit='min'),
+        'cup_depth': rng.uniform(10, 500, n), 'cup_duration': durations,
+        'handle_depth': rng.uniform(1, 50, n), 'handle_duration': np.full(n, 10),
+        'r_squared_cup': rng.uniform(0.85, 1.0, n),
+        'breakout_candle_timestamp': starts + pd.to_timedelta(durations + 10, unit='min'),
+        'status': 'Valid', 'reason': '',
+    }, columns=REPORT_COLUMNS)
+
+class TestPatternStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = PatternStore(os.path.join(self.tmp.name, 'patterns.db'))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_ids_are_content_stable(self):
+        report = _report(5)
+        ids = pattern_ids('BTCUSDT', '1m', report['start_time'], report['breakout_candle_timestamp'])
+        self.assertEqual(len(set(ids)), 5)
+        # The same times as strings, or in another timezone, give the same ids
+        self.assertEqual(pattern_ids('BTCUSDT', '1m', report['start_time'].astype(str),
+                                     report['breakout_candle_timestamp'].dt.tz_localize('UTC').dt.tz_convert('Asia/Tokyo')), ids)
+        self.assertNotEqual(pattern_ids('ETHUSDT', '1m', report['start_time'], report['breakout_candle_timestamp']), ids)
+
+    def test_upsert_is_idempotent(self):
+        report = _report(300)
+        ids = self.db.upsert(report, 'BTCUSDT', '1m')
+        self.assertEqual(len(self.db), 300)
+        # Re-scanning an overlapping range updates the overlap in place
+        rescan = report.iloc[100:].copy()
+        rescan['r_squared_cup'] = 0.99
+        self.assertEqual(self.db.upsert(rescan, 'BTCUSDT', '1m'), ids[100:])
+        self.assertEqual(self.db.upsert(report.iloc[:100], 'BTCUSDT', '1m'), ids[:100])
+        self.assertEqual(len(self.db), 300)
+        stored = self.db.query('BTCUSDT', '1m')
+        self.assertEqual(list(stored['id']), ids)
+        np.testing.assert_array_equal(stored['r_squared_cup'], [*report['r_squared_cup'][:100], *[0.99] * 200])
+        pd.testing.assert_series_equal(stored['start_time'], report['start_time'].astype('M8[ns]'))
+        # A report with symbol and interval columns (batch_scan's)
+        other = _report(20, seed=1)
+        other.insert(0, 'symbol', 'ETHUSDT')
+        other.insert(1, 'interval', '5m')
+        self.db.upsert(other)
+        self.assertEqual(len(self.db), 320)
+        self.assertEqual(len(self.db.query('ETHUSDT', '5m')), 20)
+
+    def test_query_filters(self):
+        report = _report(2000)
+        report.loc[::7, 'status'] = 'Invalid'
+        self.db.upsert(report, 'BTCUSDT', '1m')
+        self.db.upsert(_report(500, seed=1), 'BTCUSDT', '5m')
+        got = self.db.query('BTCUSDT', '1m', '2024-03-01', '2024-04-01', status='Valid', min_r2=0.9)
+        expected = report[(report['start_time'] >= '2024-03-01') & (report['start_time'] < '2024-04-01')
+                          & (report['status'] == 'Valid') & (report['r_squared_cup'] >= 0.9)]
+        self.assertGreater(len(expected), 10)
+        self.assertEqual(list(got['start_time']), list(expected['start_time']))
+        np.testing.assert_array_equal(got['cup_depth'], expected['cup_depth'])
+        got = self.db.query(breakout_start='2024-02-01', breakout_end='2024-02-02')
+        self.assertTrue(((got['breakout_candle_timestamp'] >= '2024-02-01')
+                         & (got['breakout_candle_timestamp'] < '2024-02-02')).all())
+        self.assertEqual(len(self.db.query('BTCUSDT', '1m', limit=3)), 3)
+        # The range filters are answered from the indexes
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM patterns WHERE symbol = ? AND interval = ? AND start_time >= ?",
+            ('BTCUSDT', '1m', 0)).fetchall()
+        self.assertIn('patterns_by_start', str(plan))
+
+    def test_near_misses_without_breakout(self):
+        report = _report(10)
+        near = report.iloc[:3].copy()
+        near['breakout_candle_timestamp'] = pd.NaT
+        near['status'] = 'Invalid'
+        near['end_time'] = near['start_time'].iloc[0] + pd.to_timedelta([100, 120, 140], unit='min')
+        near['start_time'] = near['start_time'].iloc[0]  # Same cup start, different handle ends
+        ids = self.db.upsert(pd.concat([report, near]), 'BTCUSDT', '1m')
+        self.assertEqual(len(set(ids)), 13)
+        self.assertEqual(self.db.upsert(near, 'BTCUSDT', '1m'), ids[10:])
+        self.assertEqual(len(self.db), 13)
+        stored = self.db.query('BTCUSDT', '1m', status='Invalid')
+        self.assertTrue(stored['breakout_candle_timestamp'].isna().all())
+        self.assertEqual(self.db.conn.execute(
+            "SELECT COUNT(*) FROM patterns WHERE breakout_candle_timestamp IS NULL").fetchone()[0], 3)
+        # Breakout range queries only see patterns that broke out
+        got = self.db.query(breakout_end='2030-01-01')
+        self.assertEqual(list(got['id']), ids[:10])
+        # The near-miss report has no breakout column at all
+        from reporting import build_near_miss_report, NEAR_MISS_COLUMNS
+        rows = near.assign(cup_start_idx=0, cup_end_idx=50, handle_end_idx=60)[NEAR_MISS_COLUMNS].to_dict('records')
+        self.assertEqual(self.db.upsert(build_near_miss_report(rows), 'BTCUSDT', '1m'), ids[10:])
+
+    def test_migrates_not_null_breakout_column(self):
+        path = os.path.join(self.tmp.name, 'old.db')
+        import sqlite3
+        conn = sqlite3.connect(path)
+        conn.executescript(
+            "CREATE TABLE patterns (id TEXT PRIMARY KEY, symbol TEXT NOT NULL, interval TEXT NOT NULL, "
+            "start_time INTEGER NOT NULL, end_time INTEGER NOT NULL, cup_depth REAL, cup_duration INTEGER, "
+            "handle_depth REAL, handle_duration INTEGER, r_squared_cup REAL, "
+            "breakout_candle_timestamp INTEGER NOT NULL, status TEXT, reason TEXT);"
+            "INSERT INTO patterns VALUES ('a', 'BTCUSDT', '1m', 0, 1, 1.0, 30, 1.0, 5, 0.9, 1, 'Valid', '');")
+        conn.close()
+        with PatternStore(path) as db:
+            self.assertEqual(len(db), 1)
+            near = _report(1)
+            near['breakout_candle_timestamp'] = pd.NaT
+            db.upsert(near, 'BTCUSDT', '1m')
+            self.assertEqual(len(db), 2)
+            self.assertIn('patterns_by_breakout', str(db.conn.execute("PRAGMA index_list(patterns)").fetchall()))
+
+if __name__ == '__main__':
+    unittest.main()
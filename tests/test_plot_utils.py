@@ -0,0 +1,71 @@
+import os
+import json
+import tempfile
+import unittest
+import numpy as np
+from pattern_detector import PatternDetector
+from parabola_fit import fit_parabola
+from plot_utils import ChartRenderer, build_pattern_figure, _plot_window
+from synthetic_data import oscillating_ohlcv
+
+def write_json(figures, paths, scale):
+    """Stand-in exporter that needs no browser."""
+    for fig, path in zip(figures, paths):
+        with open(path, 'w') as f:
+            f.write(fig.to_json())
+
+class TestPlotUtils(unittest.TestCase):
+    def setUp(self):
+        self.df = oscillating_ohlcv(1200)
+        self.patterns = PatternDetector(self.df, min_cup_duration=20, max_cup_duration=80,
+                                        max_handle_duration=20, min_r2=0.7).detect_patterns()
+        for n, pattern in enumerate(self.patterns, start=1):
+            pattern['pattern_id'] = f"{n:02d}"
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reuses_detector_fit(self):
+        pattern = self.patterns[0]
+        cup = self.df['close'].values[pattern['cup_start_idx']:pattern['cup_end_idx'] + 1]
+        r_squared, coeffs = fit_parabola(cup)
+        np.testing.assert_allclose(pattern['cup_fit_coeffs'], coeffs, rtol=1e-9)
+        self.assertAlmostEqual(pattern['r_squared_cup'], r_squared, places=9)
+
+        fig = build_pattern_figure(self.df, pattern, '01')
+        arc = next(trace for trace in fig.data if trace.name.startswith('Cup Arc'))
+        x = np.arange(len(cup))
+        np.testing.assert_allclose(arc.y, np.polyval(coeffs, x), rtol=1e-9)
+
+    def test_window_figure_matches_full_figure(self):
+        pattern = self.patterns[1]
+        window, shifted = _plot_window(self.df, pattern)
+        self.assertEqual(build_pattern_figure(window, shifted, '02').to_json(),
+                         build_pattern_figure(self.df, pattern, '02').to_json())
+
+    def test_skips_unchanged_charts(self):
+        out = os.path.join(self.tmp.name, 'patterns')
+        with ChartRenderer(n_workers=2, batch_size=2, writer=write_json) as renderer:
+            self.assertEqual(renderer.render(self.df, self.patterns, out), len(self.patterns))
+            self.assertEqual(renderer.render(self.df, self.patterns, out), 0)
+
+            # Changing a bar inside one chart's window re-renders only that chart
+            changed = self.df.copy()
+            changed.iloc[self.patterns[0]['cup_start_idx'], changed.columns.get_loc('open')] += 1
+            self.assertEqual(renderer.render(changed, self.patterns, out), 1)
+
+            os.remove(os.path.join(out, 'cup_handle_02.png'))
+            self.assertEqual(renderer.render(changed, self.patterns, out), 1)
+
+        with open(os.path.join(out, 'cup_handle_01.png')) as f:
+            self.assertIn('Cup and Handle Pattern 01', json.load(f)['layout']['title']['text'])
+
+    def test_in_process_rendering(self):
+        out = os.path.join(self.tmp.name, 'patterns')
+        with ChartRenderer(n_workers=1, skip_unchanged=False, writer=write_json) as renderer:
+            self.assertEqual(renderer.render(self.df, self.patterns[:2], out), 2)
+            self.assertEqual(renderer.render(self.df, self.patterns[:2], out), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import talib
+from candle_store import CandleStore
+from preprocessing import load_atr, preprocess_data
+from synthetic_data import oscillating_ohlcv
+
+class TestLoadAtr(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = oscillating_ohlcv(1000, seed=0)
+        self.atr = talib.ATR(self.df['high'], self.df['low'], self.df['close'], timeperiod=14)
+        self.store = CandleStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _check(self, start, end):
+        times, atr = load_atr(self.store, 'TEST', '5m', start, end)
+        index = self.atr.index
+        expected = self.atr[(index >= (start or index[0])) & (index < (end or index[-1] + index.freq))]
+        np.testing.assert_array_equal(times, expected.index.as_unit('ns').asi8)
+        np.testing.assert_allclose(atr, expected.values, rtol=1e-12)
+
+    def test_missing_atr_computed_without_writing(self):
+        self.store.append('TEST', '5m', self.df)
+        self._check(None, None)
+        self._check('2024-01-02', '2024-01-03')
+        self.assertNotIn('ATR', self.store.columns('TEST', '5m'))
+
+    def test_appended_bars_computed_without_writing(self):
+        self.store.append('TEST', '5m', self.df.iloc[:600])
+        preprocess_data(self.store, 'TEST', '5m')
+        self.store.append('TEST', '5m', self.df.iloc[600:])
+        # The range straddles the last bar with a stored ATR
+        self._check('2024-01-02', '2024-01-04')
+        self._check('2024-01-03 06:00', None)
+        stored = self.store.load_arrays('TEST', '5m', columns=['ATR'])['ATR']
+        self.assertTrue(np.isnan(stored[600:]).all())
+
+if __name__ == '__main__':
+    unittest.main()
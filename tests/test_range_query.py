@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from range_query import SparseTable
+
+class TestSparseTable(unittest.TestCase):
+    def setUp(self):
+        self.values = np.random.default_rng(7).normal(0, 1, 500)
+
+    def test_matches_slicing(self):
+        high_max = SparseTable(self.values, 'max')
+        low_min = SparseTable(self.values, 'min')
+        for lo, hi in [(0, 0), (0, 499), (13, 77), (250, 251), (498, 499)]:
+            self.assertEqual(high_max.query(lo, hi), self.values[lo:hi+1].max())
+            self.assertEqual(low_min.query(lo, hi), self.values[lo:hi+1].min())
+
+    def test_capped_levels(self):
+        table = SparseTable(self.values, 'max', max_length=51)
+        self.assertEqual(len(table.levels), 6)
+        for lo in range(0, 449, 37):
+            self.assertEqual(table.query(lo, lo + 50), self.values[lo:lo+51].max())
+
+    def test_extends_prefix_levels(self):
+        values = self.values.copy()
+        values[[3, 140]] = np.nan
+        for rows in (1, 40, 300, 500):
+            prefix = SparseTable(values[:rows], 'min', max_length=51)
+            extended = SparseTable(values, 'min', max_length=51, prefix_levels=prefix.levels)
+            full = SparseTable(values, 'min', max_length=51)
+            self.assertEqual(len(extended.levels), len(full.levels))
+            for got, expected in zip(extended.levels, full.levels):
+                np.testing.assert_array_equal(got, expected)
+
+    def test_nan_ignored(self):
+        values = np.array([np.nan, np.nan, 3.0, np.nan, 1.0])
+        table = SparseTable(values, 'max')
+        self.assertEqual(table.query(0, 4), 3.0)
+        self.assertEqual(table.query(1, 4), 3.0)
+        self.assertTrue(np.isnan(table.query(0, 1)))
+        with self.assertRaises(ValueError):
+            SparseTable(values, 'sum')
+
+if __name__ == '__main__':
+    unittest.main()
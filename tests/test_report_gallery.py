@@ -0,0 +1,74 @@
+import os
+import re
+import json
+import base64
+import tempfile
+import unittest
+import numpy as np
+from pattern_detector import PatternDetector
+from reporting import build_report
+from report_gallery import build_gallery, lttb
+from synthetic_data import oscillating_ohlcv
+
+def _decode(text, dtype):
+    return np.frombuffer(base64.b64decode(text), dtype=dtype)
+
+class TestReportGallery(unittest.TestCase):
+    def setUp(self):
+        self.df = oscillating_ohlcv(3000)
+        self.patterns = PatternDetector(self.df, min_cup_duration=20, max_cup_duration=80,
+                                        max_handle_duration=20, min_r2=0.7).detect_patterns()
+        for n, pattern in enumerate(self.patterns, start=1):
+            pattern['pattern_id'] = f"{n:02d}"
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lttb(self):
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        y[437] = 10.0  # A spike must survive downsampling
+        kept = lttb(x, y, 50)
+        self.assertEqual(len(kept), 50)
+        self.assertEqual((kept[0], kept[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(kept) > 0))
+        self.assertIn(437, kept)
+        np.testing.assert_array_equal(lttb(x[:20], y[:20], 50), np.arange(20))
+
+    def test_gallery(self):
+        path = os.path.join(self.tmp.name, 'gallery.html')
+        report_file = os.path.join(self.tmp.name, 'report.csv')
+        build_report(self.patterns).to_csv(report_file, index=False)
+        self.assertEqual(build_gallery(report_file, self.df, path, context_bars=100, context_points=20),
+                         len(self.patterns))
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        # plotly.js is embedded once, however many charts there are
+        self.assertEqual(html.count('<script>'), 2)
+        self.assertGreater(len(self.patterns), 3)
+        payload = json.loads(re.search(r'<script id="patterns" type="application/json">(.*?)</script>',
+                                       html, re.S).group(1))
+        self.assertEqual([p['id'] for p in payload], [p['pattern_id'] for p in self.patterns])
+        times = self.df.index.as_unit('ns').asi8 // 10 ** 6
+        for entry, pattern in zip(payload, self.patterns):
+            t = entry['t0'] + _decode(entry['t'], '<i4').astype(np.int64) * 1000
+            ohlc = [_decode(values, '<f4') for values in entry['ohlc']]
+            core = slice(entry['core'], entry['core'] + entry['n_core'])
+            # Every bar from the cup start to the breakout is kept exactly
+            bars = np.arange(pattern['cup_start_idx'], pattern['breakout_candle_idx'] + 1)
+            np.testing.assert_array_equal(t[core], times[bars])
+            for values, col in zip(ohlc, ('open', 'high', 'low', 'close')):
+                np.testing.assert_array_equal(values[core], self.df[col].values[bars].astype(np.float32))
+            self.assertEqual(entry['marks'], {
+                'cup_end': pattern['cup_end_idx'] - pattern['cup_start_idx'],
+                'handle_end': pattern['handle_end_idx'] - pattern['cup_start_idx'],
+                'breakout': pattern['breakout_candle_idx'] - pattern['cup_start_idx']})
+            np.testing.assert_allclose(entry['arc'], pattern['cup_fit_coeffs'], rtol=1e-9)
+            # Context on either side is downsampled to at most 20 points
+            self.assertLessEqual(entry['core'], 20)
+            self.assertLessEqual(len(t) - core.stop, 20)
+            self.assertTrue(np.all(np.diff(t) > 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+import scan_kernel
+from pattern_detector import PatternDetector
+from synthetic_data import generate_ohlcv
+
+def _rows(patterns):
+    return [(p['cup_start_idx'], p['cup_end_idx'], p['handle_end_idx'], p['breakout_candle_idx'], p['r_squared_cup'])
+            for p in patterns]
+
+class TestScanKernel(unittest.TestCase):
+    def setUp(self):
+        self.df, _ = generate_ohlcv(9000, n_patterns=3, seed=5)
+        # Short cups and handles and no skip-ahead give many overlapping candidates
+        self.loose = dict(min_cup_duration=10, max_cup_duration=120, min_handle_duration=2,
+                          max_handle_duration=20, min_r2=0.6, skip_days_after_pattern=0)
+
+    def test_python_kernel_matches_scan(self):
+        # The kernel loop run as plain Python, so this holds without Numba
+        for params in ({}, self.loose, dict(self.loose, one_pattern_per_day=False)):
+            detector = PatternDetector(self.df[:4000], use_jit=False, **params)
+            expected = _rows(detector.detect_patterns())
+            self.assertTrue(expected)
+            self.assertEqual(scan_kernel.scan_patterns(detector, compiled=False), expected)
+
+    @unittest.skipUnless(scan_kernel.available(), "Numba is not installed")
+    def test_compiled_kernel_matches_scan(self):
+        for params in ({}, self.loose, dict(self.loose, one_pattern_per_day=False)):
+            expected = PatternDetector(self.df, use_jit=False, **params).detect_patterns()
+            patterns = PatternDetector(self.df, **params).detect_patterns()
+            self.assertEqual(_rows(patterns), _rows(expected))
+            self.assertEqual(patterns, expected)
+
+    def test_instrumented_scan_skips_kernel(self):
+        detector = PatternDetector(self.df, instrument=True)
+        patterns = detector.detect_patterns()
+        self.assertGreater(detector.funnel.cup_ends, 0)
+        self.assertEqual(_rows(patterns), _rows(PatternDetector(self.df, use_jit=False).detect_patterns()))
+
+    def test_short_series(self):
+        detector = PatternDetector(self.df[:50])
+        self.assertEqual(scan_kernel.scan_patterns(detector, compiled=False), [])
+        self.assertEqual(detector.detect_patterns(), [])
+
+    def test_missing_numba(self):
+        compiled = scan_kernel._scan_compiled
+        scan_kernel._scan_compiled = None
+        try:
+            self.assertFalse(scan_kernel.available())
+            detector = PatternDetector(self.df[:3000])
+            # The detector falls back to its Python scan
+            self.assertEqual(_rows(detector.detect_patterns()), detector._scan())
+            with self.assertRaises(RuntimeError):
+                scan_kernel.scan_patterns(detector)
+        finally:
+            scan_kernel._scan_compiled = compiled
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+import talib
+from pattern_detector import PatternDetector
+from stream_detector import StreamingPatternDetector
+from synthetic_data import oscillating_ohlcv
+
+class TestStreamingPatternDetector(unittest.TestCase):
+    def setUp(self):
+        self.df = oscillating_ohlcv(1200)
+        self.params = dict(min_cup_duration=20, max_cup_duration=80, max_handle_duration=20,
+                           min_r2=0.7, skip_days_after_pattern=0)
+
+    def test_replay_matches_batch(self):
+        batch = PatternDetector(self.df, **self.params)
+        expected = batch.detect_patterns()
+        stream = StreamingPatternDetector(avg_candle_size=batch.avg_candle_size, **self.params)
+        patterns = []
+        for _, candle in self.df.iterrows():
+            patterns.extend(stream.push(candle))
+        self.assertGreater(len(expected), 3, "Fixture should produce several patterns")
+        self.assertEqual(patterns, expected)
+
+    def test_emits_once_the_last_needed_bar_closes(self):
+        # With one handle length, the first pattern's breakout is the last bar its cup end reads
+        params = dict(self.params, max_handle_duration=5)
+        batch = PatternDetector(self.df, **params)
+        expected = batch.detect_patterns()
+        stream = StreamingPatternDetector(avg_candle_size=batch.avg_candle_size, **params)
+        emitted_at = []
+        for t, (_, candle) in enumerate(self.df.iterrows()):
+            emitted_at.extend(t for _ in stream.push(candle))
+        self.assertEqual(emitted_at, [p['cup_end_idx'] + 5 + 10 for p in expected])
+        self.assertEqual(emitted_at[0], expected[0]['breakout_candle_idx'])
+
+    def test_rejects_unsupported_options(self):
+        for option in ('exhaustive', 'volume_confirmation', 'use_jit', 'instrument'):
+            with self.assertRaisesRegex(ValueError, option):
+                StreamingPatternDetector(**{option: True}, **self.params)
+        stream = StreamingPatternDetector(rank_by='depth', prune_candidates=False, **self.params)
+        self.assertEqual((stream.rank_by, stream.use_jit, stream.volume_confirmation), ('depth', False, False))
+
+    def test_incremental_atr_and_bounded_buffer(self):
+        stream = StreamingPatternDetector(**self.params)
+        atr = []
+        for _, candle in self.df.iterrows():
+            stream.push(candle)
+            atr.append(stream._atr)
+        expected = talib.ATR(self.df['high'], self.df['low'], self.df['close'], timeperiod=14).values
+        np.testing.assert_allclose(atr[14:], expected[14:], rtol=1e-12)
+        self.assertEqual(stream._prices.shape[1], 2 * (80 + 20 + 11))
+
+if __name__ == '__main__':
+    unittest.main()
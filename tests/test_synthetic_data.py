@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+from pattern_detector import PatternDetector
+from synthetic_data import generate_ohlcv, match_planted
+
+class TestSyntheticData(unittest.TestCase):
+    def setUp(self):
+        self.df, self.planted = generate_ohlcv(9000, n_patterns=3, seed=1)
+
+    def test_deterministic_and_consistent(self):
+        df, planted = generate_ohlcv(9000, n_patterns=3, seed=1)
+        self.assertTrue(df.equals(self.df))
+        self.assertTrue(planted.equals(self.planted))
+        self.assertEqual(len(df), 9000)
+        self.assertTrue((df['high'] >= df[['open', 'close']].max(axis=1)).all())
+        self.assertTrue((df['low'] <= df[['open', 'close']].min(axis=1)).all())
+        self.assertTrue((df['open'].values[1:] == df['close'].values[:-1]).all())
+
+    def test_too_many_patterns(self):
+        with self.assertRaises(ValueError):
+            generate_ohlcv(5000, n_patterns=3)
+
+    def test_planted_patterns_are_detectable(self):
+        # Each planted cup is found by the scan started inside it, whatever the
+        # skip-ahead state of a full scan would be
+        detector = PatternDetector(self.df)
+        for row in self.planted.itertuples():
+            patterns = []
+            for i in range(row.cup_start_idx + detector.min_cup_duration, row.breakout_candle_idx):
+                candidate = next(detector._cup_candidates(i), None)
+                if candidate is not None:
+                    j, k, breakout_idx, r_squared = candidate
+                    patterns.append(detector._make_pattern(j, i, k, breakout_idx, r_squared))
+                    break
+            found = match_planted(patterns, self.planted)
+            self.assertEqual(int(found.sum()), 1, f"Planted pattern at {row.cup_start_idx} not found")
+
+    def test_match_planted(self):
+        row = self.planted.iloc[0]
+        hit = {'cup_start_idx': row.cup_start_idx + 5, 'cup_end_idx': row.cup_end_idx - 5,
+               'breakout_candle_idx': row.breakout_candle_idx}
+        early = dict(hit, cup_start_idx=row.cup_start_idx - 400, cup_end_idx=row.cup_start_idx - 100)
+        np.testing.assert_array_equal(match_planted([hit], self.planted), [True, False, False])
+        np.testing.assert_array_equal(match_planted([early], self.planted), [False, False, False])
+        self.assertFalse(match_planted([], self.planted).any())
+
+if __name__ == '__main__':
+    unittest.main()